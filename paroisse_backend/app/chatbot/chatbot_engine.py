@@ -6,7 +6,7 @@ from app.models.quete import Quete
 from app.models.facture import Facture
 from app.models.budget import Budget
 from datetime import datetime
-from sqlalchemy import func
+from app.utils.periode import filtre_mois
 
 
 def repondre_question(message: str, db: Session) -> str:
@@ -31,8 +31,7 @@ def repondre_question(message: str, db: Session) -> str:
         annee_actuelle = datetime.utcnow().year
         quetes = db.query(Quete).filter(
             Quete.deleted_at == None,
-            func.month(Quete.date_quete) == mois_actuel,
-            func.year(Quete.date_quete) == annee_actuelle
+            filtre_mois(Quete.date_quete, annee_actuelle, mois_actuel)
         ).count()
         return f"{quetes} quête(s) ont été enregistrées ce mois-ci."
 
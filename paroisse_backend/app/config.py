@@ -2,3 +2,21 @@
 import os
 
 DATABASE_URL = os.getenv("DATABASE_URL", "mysql+pymysql://root:@localhost/paroisse_db")
+
+# Rapports générés en arrière-plan
+RAPPORTS_DIR = os.getenv("RAPPORTS_DIR", "rapports_generes")
+RAPPORTS_WORKERS = int(os.getenv("RAPPORTS_WORKERS", "2"))
+RAPPORTS_FRAICHEUR_SECONDES = int(os.getenv("RAPPORTS_FRAICHEUR_SECONDES", "300"))
+RAPPORTS_CONSERVATION_HEURES = int(os.getenv("RAPPORTS_CONSERVATION_HEURES", "24"))
+
+# Index de recherche en mémoire (suggestions instantanées), désactivé par défaut
+INDEX_RECHERCHE_MEMOIRE = os.getenv("INDEX_RECHERCHE_MEMOIRE", "0") == "1"
+INDEX_RECHERCHE_MAX_MO = int(os.getenv("INDEX_RECHERCHE_MAX_MO", "64"))
+
+# Alertes de stock : délai de regroupement des mouvements avant évaluation
+ALERTES_STOCK_FENETRE_SECONDES = float(os.getenv("ALERTES_STOCK_FENETRE_SECONDES", "2"))
+
+# En-tête des reçus et factures imprimés
+PAROISSE_NOM = os.getenv("PAROISSE_NOM", "Église Évangélique du Cameroun - Paroisse de Melen")
+PAROISSE_ADRESSE = os.getenv("PAROISSE_ADRESSE", "Melen, Yaoundé - Cameroun")
+PAROISSE_LOGO = os.getenv("PAROISSE_LOGO")  # chemin d'une image (PNG/JPEG), facultatif
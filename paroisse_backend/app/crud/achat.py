@@ -1,5 +1,4 @@
 from typing import Optional
-from sqlalchemy import func
 from sqlalchemy.orm import Session
 from datetime import datetime, date
 from uuid import uuid4
@@ -11,7 +10,9 @@ from app.models.notification import Notification, TypeNotificationEnum
 from app.schemas.achat import AchatCreate, AchatUpdate
 from app.schemas.facture import FactureCreate
 from app.crud.facture import create_facture
-from app.utils.budget import update_budget_reel, verifier_solde_disponible
+from app.utils.budget import update_budget_reel, reporter_modification_budget, verifier_solde_disponible
+from app.utils.pagination import paginer, LIMITE_DEFAUT, LIMITE_MAX
+from app.utils.totaux import total_montant
 
 
 # ✅ Crée le budget "Achat" si manquant pour l'année
@@ -33,11 +34,11 @@ def verifier_ou_creer_budget_achat(db: Session, annee: int, utilisateur_id: int)
             montantApprouve=0,
             statut="Proposé",
             utilisateur_id=utilisateur_id,
-            categorie="Dépense",
+            categorie="Depense",
             sous_categorie="Achat",
         )
         db.add(budget)
-        db.commit()
+        db.flush()
 
 
 # ✅ Création d’un achat (validations fortes + facture + budget + notif)
@@ -51,10 +52,8 @@ def create_achat(db: Session, achat: AchatCreate, utilisateur_id: int):
         if achat.date_achat > datetime.utcnow().date():
             raise Exception("La date de l'achat ne peut pas être dans le futur.")
 
-        # Vérifier/créer budget
-        verifier_ou_creer_budget_achat(db, achat.date_achat.year, utilisateur_id)
-
-        # Vérification du solde disponible (dépense sortante)
+        # Vérification du solde disponible (dépense sortante), avant toute écriture :
+        # la notification de refus est alors la seule chose validée
         if not verifier_solde_disponible(db, achat.date_achat.year, achat.montant):
             notif = Notification(
                 titre="Achat refusé",
@@ -67,6 +66,9 @@ def create_achat(db: Session, achat: AchatCreate, utilisateur_id: int):
             db.commit()
             raise Exception(f"Solde insuffisant pour l'achat ({achat.montant})")
 
+        # Vérifier/créer budget
+        verifier_ou_creer_budget_achat(db, achat.date_achat.year, utilisateur_id)
+
         # Création automatique de la facture
         facture = FactureCreate(
             numero=f"F-{uuid4().hex[:8]}",
@@ -89,7 +91,7 @@ def create_achat(db: Session, achat: AchatCreate, utilisateur_id: int):
         db.flush()  # pour avoir achat_id
 
         # Mise à jour du budget réel
-        update_budget_reel(db, db_achat.date_achat.year, "Achat", utilisateur_id)
+        update_budget_reel(db, db_achat.date_achat.year, "Achat", utilisateur_id, delta=achat.montant)
 
         # Notification succès
         notification = Notification(
@@ -138,18 +140,22 @@ def update_achat(db: Session, achat_id: int, achat: AchatUpdate):
                 f"Solde insuffisant pour augmenter le montant de l'achat à {montant_nouveau}."
             )
 
+    ancienne_annee, ancien_montant = db_achat.date_achat.year, db_achat.montant
+
     # Appliquer modifications
     for attr, value in payload.items():
         setattr(db_achat, attr, value)
 
     try:
-        db.commit()
-
         # Vérifier/créer budget si année changée
         verifier_ou_creer_budget_achat(db, db_achat.date_achat.year, db_achat.utilisateur_id)
 
         # Mettre à jour le budget réel
-        update_budget_reel(db, db_achat.date_achat.year, "Achat", db_achat.utilisateur_id)
+        reporter_modification_budget(
+            db, "Achat", db_achat.utilisateur_id,
+            ancienne_annee, ancien_montant,
+            db_achat.date_achat.year, db_achat.montant
+        )
 
         notif = Notification(
             titre="Achat modifié",
@@ -180,13 +186,12 @@ def soft_delete_achat(db: Session, achat_id: int):
 
     try:
         db_achat.deleted_at = datetime.utcnow()
-        db.commit()
 
         # Vérifier/créer budget
         verifier_ou_creer_budget_achat(db, db_achat.date_achat.year, db_achat.utilisateur_id)
 
-        # Recalcul budget réel
-        update_budget_reel(db, db_achat.date_achat.year, "Achat", db_achat.utilisateur_id)
+        # Report de la variation dans le registre budgétaire
+        update_budget_reel(db, db_achat.date_achat.year, "Achat", db_achat.utilisateur_id, delta=-db_achat.montant)
 
         notif = Notification(
             titre="Achat supprimé",
@@ -220,13 +225,12 @@ def restore_achat(db: Session, achat_id: int):
 
     try:
         db_achat.deleted_at = None
-        db.commit()
 
         # Vérifier/créer budget
         verifier_ou_creer_budget_achat(db, db_achat.date_achat.year, db_achat.utilisateur_id)
 
-        # Recalcul budget réel
-        update_budget_reel(db, db_achat.date_achat.year, "Achat", db_achat.utilisateur_id)
+        # Report de la variation dans le registre budgétaire
+        update_budget_reel(db, db_achat.date_achat.year, "Achat", db_achat.utilisateur_id, delta=db_achat.montant)
 
         notif = Notification(
             titre="Achat restauré",
@@ -245,20 +249,11 @@ def restore_achat(db: Session, achat_id: int):
 
 
 # ✅ Liste + total
-def get_achats(db: Session, include_deleted: bool = False):
+def get_achats(db: Session, include_deleted: bool = False, curseur: str = None, limite: int = LIMITE_DEFAUT):
     query = db.query(Achat)
     if not include_deleted:
         query = query.filter(Achat.deleted_at == None)
-    achats = query.all()
-
-    total_query = db.query(func.coalesce(func.sum(Achat.montant), 0))
-    if not include_deleted:
-        total_query = total_query.filter(Achat.deleted_at == None)
-    montant_total = total_query.scalar()
-
-    for a in achats:
-        a.montant_total = montant_total
-    return achats
+    return paginer(query, Achat.date_achat, Achat.achat_id, curseur, limite)
 
 
 # ✅ Détail + total par utilisateur
@@ -270,15 +265,7 @@ def get_achat(db: Session, achat_id: int, include_deleted: bool = False):
     if not achat_instance:
         return None
 
-    montant_total = (
-        db.query(func.coalesce(func.sum(Achat.montant), 0))
-        .filter(
-            Achat.utilisateur_id == achat_instance.utilisateur_id,
-            Achat.deleted_at == None
-        )
-        .scalar()
-    )
-    achat_instance.montant_total = montant_total
+    achat_instance.montant_total = total_montant(db, "achat", utilisateur_id=achat_instance.utilisateur_id)
     return achat_instance
 
 
@@ -308,8 +295,4 @@ def search_achats(
     if montant_max is not None:
         query = query.filter(Achat.montant <= montant_max)
 
-    results = query.all()
-    montant_total = sum(achat.montant for achat in results)
-    for achat in results:
-        achat.montant_total = montant_total
-    return results
+    return query.order_by(Achat.date_achat.desc(), Achat.achat_id.desc()).limit(LIMITE_MAX).all()
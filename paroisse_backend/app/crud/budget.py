@@ -1,16 +1,11 @@
 from typing import Optional
 from sqlalchemy.orm import Session
 from datetime import datetime
-from sqlalchemy import func
 
 from app.models.budget import Budget
-from app.models.don import Don
-from app.models.offrande import Offrande
-from app.models.quete import Quete
-from app.models.achat import Achat
-from app.models.salaire import Salaire
 from app.models.notification import Notification, TypeNotificationEnum
 from app.schemas.budget import BudgetCreate, BudgetUpdate
+from app.utils.budget import calculer_tresorerie
 
 
 def create_budget(db: Session, budget: BudgetCreate):
@@ -67,38 +62,8 @@ def restore_budget(db: Session, budget_id: int):
 
 
 def verifier_solde_et_notifier(annee: int, db: Session, utilisateur_id: Optional[int] = None):
-    # Recettes
-    total_dons = db.query(func.coalesce(func.sum(Don.montant), 0)).filter(
-        func.extract('year', Don.date_don) == annee,
-        Don.deleted_at.is_(None)
-    ).scalar()
-
-    total_offrandes = db.query(func.coalesce(func.sum(Offrande.montant), 0)).filter(
-        func.extract('year', Offrande.date) == annee,
-        Offrande.deleted_at.is_(None)
-    ).scalar()
-
-    total_quetes = db.query(func.coalesce(func.sum(Quete.montant), 0)).filter(
-        func.extract('year', Quete.date_quete) == annee,
-        Quete.deleted_at.is_(None)
-    ).scalar()
-
-    total_recettes = total_dons + total_offrandes + total_quetes
-
-    # Dépenses
-    total_achats = db.query(func.coalesce(func.sum(Achat.montant), 0)).filter(
-        func.extract('year', Achat.date_achat) == annee,
-        Achat.deleted_at.is_(None)
-    ).scalar()
-
-    total_salaires = db.query(func.coalesce(func.sum(Salaire.montant), 0)).filter(
-        func.extract('year', Salaire.date_paiement) == annee,
-        Salaire.deleted_at.is_(None)
-    ).scalar()
-
-    total_depenses = total_achats + total_salaires
-
-    solde = total_recettes - total_depenses
+    tresorerie = calculer_tresorerie(db, annee)
+    solde = tresorerie["solde"]
 
     if solde < 0:
         notif = Notification(
@@ -110,7 +75,7 @@ def verifier_solde_et_notifier(annee: int, db: Session, utilisateur_id: Optional
         db.add(notif)
         db.commit()
 
-    return solde
+    return tresorerie
 
 
 def search_budgets(
@@ -1,11 +1,12 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from datetime import datetime
 from app.models.facture import Facture
 from app.models.achat import Achat
 from app.schemas.facture import FactureCreate, FactureUpdate
+from app.utils.totaux import total_montant
+from app.utils.recherche import requete_recherche
+from app.utils.pagination import paginer, LIMITE_DEFAUT, LIMITE_MAX
 from typing import List, Optional
-from sqlalchemy import or_
 
 def create_facture(db: Session, facture: FactureCreate):
     db_facture = Facture(
@@ -16,24 +17,16 @@ def create_facture(db: Session, facture: FactureCreate):
         utilisateur_id=facture.utilisateur_id
     )
     db.add(db_facture)
-    db.commit()
-    db.refresh(db_facture)
+    # Pas de commit : l'appelant valide la facture avec le reste de son écriture
+    db.flush()
     return db_facture
 
 
-def get_factures(db: Session, include_deleted=False, skip: int = 0, limit: int = 100):
+def get_factures(db: Session, include_deleted=False, curseur: str = None, limite: int = LIMITE_DEFAUT):
     query = db.query(Facture)
     if not include_deleted:
         query = query.filter(Facture.deleted_at == None)
-    factures = query.offset(skip).limit(limit).all()
-
-    montant_total = db.query(func.coalesce(func.sum(Facture.montant), 0))\
-        .filter(Facture.deleted_at == None if not include_deleted else True).scalar()
-
-    for f in factures:
-        f.montant_total = montant_total
-
-    return factures
+    return paginer(query, Facture.date_facture, Facture.facture_id, curseur, limite)
 
 
 def get_facture(db: Session, facture_id: int, include_deleted=False):
@@ -44,9 +37,7 @@ def get_facture(db: Session, facture_id: int, include_deleted=False):
     if not facture:
         return None
 
-    montant_total = db.query(func.coalesce(func.sum(Facture.montant), 0))\
-        .filter(Facture.deleted_at == None).scalar()
-    facture.montant_total = montant_total
+    facture.montant_total = total_montant(db, "facture")
 
     return facture
 
@@ -112,15 +103,6 @@ def search_factures(
     skip: int = 0,
     limit: int = 50
 ) -> List[Facture]:
-    q = db.query(Facture)
-    if not include_deleted:
-        q = q.filter(Facture.deleted_at == None)
-    # Recherche sur numero OU description (ilike = insensible à la casse)
-    q = q.filter(
-        or_(
-            Facture.numero.ilike(f"%{query}%"),
-            Facture.description.ilike(f"%{query}%")
-        )
-    )
-    q = q.order_by(Facture.date_facture.desc())
-    return q.offset(skip).limit(limit).all()
+    # Recherche sur numero OU description, plus filtres montant/date
+    q, _ = requete_recherche(db, "facture", query, include_deleted)
+    return q.offset(skip).limit(min(limit, LIMITE_MAX)).all()
@@ -6,6 +6,7 @@ from app.schemas.notification import NotificationCreate
 from datetime import datetime
 from app.utils.email import send_email
 from fastapi import BackgroundTasks
+from app.utils.pagination import paginer, LIMITE_DEFAUT
 
 
 def create_notification(
@@ -85,13 +86,18 @@ def create_notification_and_send_email(
     return db_notif
 
 
-def get_notifications(db: Session, utilisateur_id: Optional[int] = None):
+def get_notifications(
+    db: Session,
+    utilisateur_id: Optional[int] = None,
+    curseur: str = None,
+    limite: int = LIMITE_DEFAUT
+):
     query = db.query(Notification).filter(Notification.deleted_at == None)
     if utilisateur_id:
         query = query.filter(
             (Notification.utilisateur_id == utilisateur_id) | (Notification.utilisateur_id == None)
         )
-    return query.order_by(Notification.created_at.desc()).all()
+    return paginer(query, Notification.created_at, Notification.notification_id, curseur, limite)
 
 
 def mark_as_read(db: Session, notification_id: int):
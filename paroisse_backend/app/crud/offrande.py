@@ -1,11 +1,13 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from datetime import date, datetime
 from app.models.offrande import Offrande
 from app.schemas.offrande import OffrandeCreate, OffrandeUpdate
-from app.utils.budget import update_budget_reel
+from app.utils.budget import update_budget_reel, reporter_modification_budget
 from app.models.notification import Notification, TypeNotificationEnum
-from app.utils.recu import generate_recu
+from app.utils.ecritures import enregistrer_ecriture
+from app.utils.totaux import total_montant
+from app.utils.recherche import requete_recherche
+from app.utils.pagination import paginer, LIMITE_DEFAUT, LIMITE_MAX
 
 from datetime import date, datetime
 
@@ -21,63 +23,27 @@ def create_offrande(db: Session, offrande: OffrandeCreate, utilisateur_id: int):
         description=offrande.description,
         utilisateur_id=utilisateur_id
     )
-    db.add(db_offrande)
-
     try:
-        db.flush()  # pour récupérer db_offrande.offrande_id
-
-        # Génération du reçu lié à l’offrande
-        generate_recu(
-            db=db,
-            montant=offrande.montant,
+        return enregistrer_ecriture(
+            db, db_offrande,
             source="Offrande",
-            reference_id=db_offrande.offrande_id,
-            utilisateur_id=utilisateur_id
-        )
-
-        # Mise à jour du budget réel
-        update_budget_reel(
-            session=db,
-            annee=date_offrande.year,
-            intitule="Offrande",
-            utilisateur_id=utilisateur_id
-        )
-
-        # Création notification
-        notification = Notification(
-            titre="Offrande enregistrée",
-            message=f"Offrande de {offrande.montant} FCFA enregistrée avec succès.",
-            type=TypeNotificationEnum.success,
-            utilisateur_id=utilisateur_id
+            reference="offrande_id",
+            montant=offrande.montant,
+            date_ecriture=date_offrande,
+            utilisateur_id=utilisateur_id,
+            titre_notification="Offrande enregistrée",
+            message_notification=f"Offrande de {offrande.montant} FCFA enregistrée avec succès."
         )
-        db.add(notification)
-
-        db.commit()
-
     except Exception as e:
-        db.rollback()
         raise Exception(f"Erreur lors de la création de l'offrande : {str(e)}")
 
-    db.refresh(db_offrande)
-    return db_offrande
-
 
-def get_offrandes(db: Session, skip: int = 0, limit: int = 100, include_deleted: bool = False):
+def get_offrandes(db: Session, include_deleted: bool = False, curseur: str = None, limite: int = LIMITE_DEFAUT):
     query = db.query(Offrande)
     if not include_deleted:
         query = query.filter(Offrande.deleted_at == None)
 
-    offrandes = query.offset(skip).limit(limit).all()
-
-    # Calcul du montant total pour toutes les offrandes non supprimées
-    montant_total = db.query(func.coalesce(func.sum(Offrande.montant), 0))\
-        .filter(Offrande.deleted_at == None if not include_deleted else True).scalar()
-
-    # Injection du montant total dans chaque instance
-    for o in offrandes:
-        o.montant_total = montant_total
-
-    return offrandes
+    return paginer(query, Offrande.date, Offrande.offrande_id, curseur, limite)
 
 
 def get_offrande(db: Session, offrande_id: int, include_deleted: bool = False):
@@ -89,10 +55,7 @@ def get_offrande(db: Session, offrande_id: int, include_deleted: bool = False):
     if not offrande_instance:
         return None
 
-    montant_total = db.query(func.coalesce(func.sum(Offrande.montant), 0))\
-        .filter(Offrande.deleted_at == None if not include_deleted else True).scalar()
-
-    offrande_instance.montant_total = montant_total
+    offrande_instance.montant_total = total_montant(db, "offrande")
     return offrande_instance
 
 def update_offrande(
@@ -105,6 +68,8 @@ def update_offrande(
     if not offrande:
         return None
 
+    ancienne_annee, ancien_montant = offrande.date.year, offrande.montant
+
     for field, value in offrande_update.dict(exclude_unset=True).items():
         setattr(offrande, field, value)
 
@@ -112,8 +77,6 @@ def update_offrande(
     offrande.utilisateur_id = utilisateur_id
 
     try:
-        db.commit()
-
         # Vérification et conversion de la date
         date_obj = offrande.date if hasattr(offrande, 'date') else None
         if isinstance(date_obj, datetime):
@@ -123,13 +86,17 @@ def update_offrande(
         else:
             raise Exception("La date de l'offrande est invalide ou manquante.")
 
-        # Mise à jour du budget avec l'utilisateur connecté
-        update_budget_reel(
-            session=db,
-            annee=annee,
-            intitule="Offrande",
-            utilisateur_id=utilisateur_id
-        )
+        # Une offrande dans la corbeille ne compte pas dans le registre
+        if offrande.deleted_at is None:
+            reporter_modification_budget(
+                session=db,
+                intitule="Offrande",
+                utilisateur_id=utilisateur_id,
+                ancienne_annee=ancienne_annee,
+                ancien_montant=ancien_montant,
+                nouvelle_annee=annee,
+                nouveau_montant=offrande.montant
+            )
 
         # Optionnel : notifier la modification
         notification = Notification(
@@ -168,14 +135,14 @@ def soft_delete_offrande(db: Session, offrande_id: int):
             except Exception as e:
                 raise Exception(f"Format de date invalide : {offrande.date}")
 
-        db.commit()
-
         update_budget_reel(
             session=db,
             annee=offrande.date.year,
             intitule="Offrande",
-            utilisateur_id=offrande.utilisateur_id
+            utilisateur_id=offrande.utilisateur_id,
+            delta=-offrande.montant
         )
+        db.commit()
     except Exception as e:
         db.rollback()
         raise Exception(f"Erreur suppression logique Offrande : {str(e)}")
@@ -201,14 +168,14 @@ def restore_offrande(db: Session, offrande_id: int):
             except Exception as e:
                 raise Exception(f"Format de date invalide : {offrande.date}")
 
-        db.commit()
-
         update_budget_reel(
             session=db,
             annee=offrande.date.year,
             intitule="Offrande",
-            utilisateur_id=offrande.utilisateur_id
+            utilisateur_id=offrande.utilisateur_id,
+            delta=offrande.montant
         )
+        db.commit()
     except Exception as e:
         db.rollback()
         raise Exception(f"Erreur restauration Offrande : {str(e)}")
@@ -221,25 +188,6 @@ def search_offrandes(
     keyword: str,
     include_deleted: bool = False
 ):
-    query = db.query(Offrande)
-
-    if not include_deleted:
-        query = query.filter(Offrande.deleted_at == None)
-
-    # Recherche sur description ou type
-    keyword_pattern = f"%{keyword}%"
-    query = query.filter(
-        (Offrande.description.ilike(keyword_pattern)) |
-        (Offrande.type.ilike(keyword_pattern))
-    )
-
-    results = query.order_by(Offrande.date.desc()).all()
-
-    # Ajout du montant total (facultatif)
-    montant_total = db.query(func.coalesce(func.sum(Offrande.montant), 0))\
-        .filter(Offrande.deleted_at == None if not include_deleted else True).scalar()
-
-    for offrande in results:
-        offrande.montant_total = montant_total
-
-    return results
+    # Recherche sur description ou type, plus filtres montant/date
+    query, _ = requete_recherche(db, "offrande", keyword, include_deleted)
+    return query.limit(LIMITE_MAX).all()
@@ -1,25 +1,32 @@
+import logging
 from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
-from datetime import datetime
-from app.models.pret import Pret
+from datetime import date, datetime
+from app.models.materiel import Materiel
+from app.models.pret import Pret, PretLigne
 from app.schemas.pret import PretCreate, PretUpdate
 from app.crud import stock_materiel as crud_stock
 from app.schemas.stock_materiel import StockMaterielCreate
 from app.models.stock_materiel import TypeMouvementStockEnum
 from fastapi import HTTPException
+from app.utils.disponibilite import paliers, prets_actifs
+from app.utils.pagination import paginer, LIMITE_DEFAUT, LIMITE_MAX
+
+logger = logging.getLogger(__name__)
 
 
 def verifier_chevauchement(db: Session, pret: PretCreate):
+    # Une infrastructure ne se prête qu'à un bénéficiaire à la fois ; le matériel,
+    # lui, est limité par la quantité disponible sur la période (verifier_quantites).
+    if not pret.infrastructure_id:
+        return
+
     query = db.query(Pret).filter(
         Pret.deleted_at == None,
         Pret.date_retour_effective == None,  # Le prêt est encore actif
+        Pret.infrastructure_id == pret.infrastructure_id
     )
 
-    if pret.materiel_id:
-        query = query.filter(Pret.materiel_id == pret.materiel_id)
-    if pret.infrastructure_id:
-        query = query.filter(Pret.infrastructure_id == pret.infrastructure_id)
-
     conflit = query.filter(
         and_(
             Pret.date_pret <= pret.date_retour_prevue,
@@ -30,30 +37,157 @@ def verifier_chevauchement(db: Session, pret: PretCreate):
     if conflit:
         raise HTTPException(
             status_code=400,
-            detail="Le matériel ou l’infrastructure est déjà prêté pendant cette période."
+            detail="L’infrastructure est déjà prêtée pendant cette période."
         )
 
+def quantites_pret(pret, sorties_seulement: bool = False) -> dict:
+    """
+    Quantité prêtée par matériel. Pour une demande (PretCreate) : materiel_id/
+    quantite et lignes, regroupés. Pour un prêt enregistré : ses lignes (celles
+    déjà sorties du stock avec sorties_seulement), ou un exemplaire de
+    materiel_id, sorti à la création, pour les prêts antérieurs aux lignes.
+    """
+    if isinstance(pret, Pret):
+        if not pret.lignes:
+            return {pret.materiel_id: 1} if pret.materiel_id else {}
+        return {
+            ligne.materiel_id: ligne.quantite
+            for ligne in pret.lignes
+            if ligne.sortie_effectuee or not sorties_seulement
+        }
+
+    quantites = {}
+    if pret.materiel_id:
+        quantites[pret.materiel_id] = pret.quantite
+    for ligne in pret.lignes:
+        quantites[ligne.materiel_id] = quantites.get(ligne.materiel_id, 0) + ligne.quantite
+    return quantites
+
+
+def verifier_quantites(db: Session, pret: PretCreate, quantites: dict):
+    """
+    Chaque matériel doit rester disponible en quantité sur toute la période :
+    parc (stock courant + quantités déjà sorties par les prêts en cours) moins
+    le pic des quantités prêtées par les prêts qui la chevauchent. Les stocks
+    sont verrouillés : deux prêts simultanés du même matériel se suivent.
+    """
+    if not quantites:
+        return
+
+    existants = {
+        m_id for (m_id,) in db.query(Materiel.materiel_id).filter(
+            Materiel.materiel_id.in_(list(quantites)),
+            Materiel.deleted_at.is_(None)
+        )
+    }
+    inconnus = sorted(set(quantites) - existants)
+    if inconnus:
+        raise HTTPException(status_code=400, detail=f"Matériel {inconnus[0]} introuvable.")
+
+    stocks = crud_stock.verrouiller_stocks(db, existants)
+    erreurs = []
+    for materiel_id, quantite in sorted(quantites.items()):
+        prets = prets_actifs(db, "materiel", materiel_id)
+        parc = stocks[materiel_id].quantite + sum(q for *_, q, sortie in prets if sortie)
+        pic = max(pretee for *_, pretee in paliers(
+            [(debut, fin, q) for _, debut, fin, q, _ in prets], pret.date_pret, pret.date_retour_prevue
+        ))
+        if quantite > parc - pic:
+            erreurs.append(
+                f"Matériel {materiel_id} : la quantité demandée ({quantite}) dépasse la quantité "
+                f"disponible ({max(parc - pic, 0)}) du {pret.date_pret} au {pret.date_retour_prevue}."
+            )
+    if erreurs:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=" ".join(erreurs))
+
+
+def _sorties(pret: Pret, quantites: dict):
+    return [
+        StockMaterielCreate(
+            materiel_id=materiel_id,
+            quantite=quantite,
+            type_mouvement=TypeMouvementStockEnum.sortie,
+            description=f"Prêt matériel ID {pret.pret_id} à {pret.beneficiaire}"
+        )
+        for materiel_id, quantite in quantites.items()
+    ]
+
+
+def _appliquer_mouvements(db: Session, mouvements):
+    if not mouvements:
+        return
+    lignes, succes = crud_stock.appliquer_mouvements_stock(db, mouvements)
+    if not succes:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=" ".join(l["erreur"] for l in lignes if l["erreur"]))
+
+
 def create_pret(db: Session, pret: PretCreate):
     verifier_chevauchement(db, pret)
+    quantites = quantites_pret(pret)
+    verifier_quantites(db, pret, quantites)
 
-    db_pret = Pret(**pret.dict())
+    # Le matériel sort du stock au début du prêt : maintenant s'il a commencé,
+    # sinon à sa date, par sortir_prets_commences
+    commence = pret.date_pret <= date.today()
+    db_pret = Pret(**pret.dict(exclude={"quantite", "lignes"}))
+    db_pret.lignes = [
+        PretLigne(materiel_id=materiel_id, quantite=quantite, sortie_effectuee=commence)
+        for materiel_id, quantite in quantites.items()
+    ]
     db.add(db_pret)
-    db.commit()
-    db.refresh(db_pret)
 
-    # Enregistrement mouvement de stock si matériel
-    if pret.materiel_id:
-        mouvement_sortie = StockMaterielCreate(
-            materiel_id=pret.materiel_id,
-            quantite=1,
-            type_mouvement=TypeMouvementStockEnum.sortie,
-            description=f"Prêt matériel ID {db_pret.pret_id} à {pret.beneficiaire}"
-        )
-        crud_stock.create_mouvement_stock(db, mouvement_sortie)
+    # Prêt, lignes, mouvements de sortie et stock courant : une seule transaction
+    try:
+        db.flush()
+        mouvements = _sorties(db_pret, quantites) if commence else []
+        _appliquer_mouvements(db, mouvements)
+        db.commit()
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise Exception(f"Erreur lors de l'enregistrement du prêt : {str(e)}")
 
+    db.refresh(db_pret)
+    crud_stock.signaler_stocks_modifies(mouvements)
     return db_pret
 
 
+def sortir_prets_commences(db: Session, aujourd_hui: date = None) -> int:
+    """
+    Écrit les sorties de stock des prêts enregistrés à l'avance dont la date de
+    début est atteinte. Une transaction par prêt : un stock insuffisant ne
+    retient que ce prêt, repris au passage suivant. Retourne le nombre de prêts sortis.
+    """
+    aujourd_hui = aujourd_hui or date.today()
+    prets = db.query(Pret).filter(
+        Pret.deleted_at == None,
+        Pret.date_retour_effective == None,
+        Pret.date_pret <= aujourd_hui,
+        Pret.lignes.any(PretLigne.sortie_effectuee.is_(False))
+    ).order_by(Pret.date_pret, Pret.pret_id).all()
+
+    sortis = 0
+    for pret in prets:
+        lignes = [ligne for ligne in pret.lignes if not ligne.sortie_effectuee]
+        mouvements = _sorties(pret, {ligne.materiel_id: ligne.quantite for ligne in lignes})
+        resultats, succes = crud_stock.appliquer_mouvements_stock(db, mouvements)
+        if not succes:
+            db.rollback()
+            logger.warning(
+                "Sortie du prêt %s reportée : %s", pret.pret_id, " ".join(r["erreur"] for r in resultats if r["erreur"])
+            )
+            continue
+        for ligne in lignes:
+            ligne.sortie_effectuee = True
+        db.commit()
+        crud_stock.signaler_stocks_modifies(mouvements)
+        sortis += 1
+    return sortis
+
+
 def get_pret(db: Session, pret_id: int, include_deleted: bool = False):
     query = db.query(Pret).filter(Pret.pret_id == pret_id)
     if not include_deleted:
@@ -61,11 +195,11 @@ def get_pret(db: Session, pret_id: int, include_deleted: bool = False):
     return query.first()
 
 
-def get_prets(db: Session, include_deleted: bool = False):
+def get_prets(db: Session, include_deleted: bool = False, curseur: str = None, limite: int = LIMITE_DEFAUT):
     query = db.query(Pret)
     if not include_deleted:
         query = query.filter(Pret.deleted_at == None)
-    return query.order_by(Pret.date_pret.desc()).all()
+    return paginer(query, Pret.date_pret, Pret.pret_id, curseur, limite)
 
 
 def update_pret(db: Session, pret_id: int, pret_update: PretUpdate):
@@ -78,19 +212,31 @@ def update_pret(db: Session, pret_id: int, pret_update: PretUpdate):
     for key, value in pret_update.dict(exclude_unset=True).items():
         setattr(pret, key, value)
 
-    db.commit()
-    db.refresh(pret)
+    # Si retour matériel pour la première fois : une entrée par ligne sortie du
+    # stock (rien pour un prêt annulé avant son début), dans la même transaction
+    mouvements = []
+    if pret.date_retour_effective and prev_date_retour_effective is None:
+        mouvements = [
+            StockMaterielCreate(
+                materiel_id=materiel_id,
+                quantite=quantite,
+                type_mouvement=TypeMouvementStockEnum.entree,
+                description=f"Retour prêt matériel ID {pret.pret_id} par {pret.beneficiaire}"
+            )
+            for materiel_id, quantite in quantites_pret(pret, sorties_seulement=True).items()
+        ]
 
-    # Si retour matériel pour la première fois
-    if pret.materiel_id and pret.date_retour_effective and prev_date_retour_effective is None:
-        mouvement_entree = StockMaterielCreate(
-            materiel_id=pret.materiel_id,
-            quantite=1,
-            type_mouvement=TypeMouvementStockEnum.entree,
-            description=f"Retour prêt matériel ID {pret.pret_id} par {pret.beneficiaire}"
-        )
-        crud_stock.create_mouvement_stock(db, mouvement_entree)
+    try:
+        _appliquer_mouvements(db, mouvements)
+        db.commit()
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise Exception(f"Erreur lors de la mise à jour du prêt : {str(e)}")
 
+    db.refresh(pret)
+    crud_stock.signaler_stocks_modifies(mouvements)
     return pret
 
 
@@ -128,4 +274,4 @@ def search_prets(db: Session, keyword: str, include_deleted: bool = False):
         )
     )
 
-    return query.order_by(Pret.date_pret.desc()).all()
+    return query.order_by(Pret.date_pret.desc()).limit(LIMITE_MAX).all()
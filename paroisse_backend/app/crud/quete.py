@@ -1,14 +1,15 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_, cast, String
 from datetime import datetime, date
 
 from app.models.quete import Quete
 from app.models.budget import Budget
-from app.models.notification import Notification, TypeNotificationEnum
 from app.models.utilisateur import Utilisateur
 from app.schemas.quete import QueteCreate, QueteUpdate
-from app.utils.recu import generate_recu
-from app.utils.budget import update_budget_reel
+from app.utils.ecritures import enregistrer_ecriture
+from app.utils.budget import update_budget_reel, reporter_modification_budget
+from app.utils.totaux import total_montant
+from app.utils.recherche import requete_recherche
+from app.utils.pagination import paginer, LIMITE_DEFAUT, LIMITE_MAX
 from sqlalchemy.exc import SQLAlchemyError
 
 def verifier_ou_creer_budget_quete(db: Session, annee: int, utilisateur_id: int):
@@ -29,7 +30,7 @@ def verifier_ou_creer_budget_quete(db: Session, annee: int, utilisateur_id: int)
             sous_categorie="Quête"
         )
         db.add(budget)
-        db.commit()
+        db.flush()
 
 def create_quete(db: Session, quete_data: QueteCreate, utilisateur_id: int):
     db_quete = Quete(
@@ -38,53 +39,26 @@ def create_quete(db: Session, quete_data: QueteCreate, utilisateur_id: int):
         date_quete=quete_data.date_quete or datetime.utcnow(),
         utilisateur_id=utilisateur_id
     )
-    db.add(db_quete)
     try:
-        db.flush()
-
-        generate_recu(
-            db=db,
-            montant=quete_data.montant,
+        # Le budget "Quête" de l'année est créé au besoin par update_budget_reel
+        return enregistrer_ecriture(
+            db, db_quete,
             source="Quête",
-            reference_id=db_quete.quete_id,
-            utilisateur_id=utilisateur_id
-        )
-
-        date_quete = db_quete.date_quete
-        verifier_ou_creer_budget_quete(db, date_quete.year, utilisateur_id)
-
-        update_budget_reel(db, date_quete.year, "Quête", utilisateur_id)
-
-        notification = Notification(
-            titre="Quête enregistrée",
-            message=f"Quête de {quete_data.montant} FCFA enregistrée avec succès.",
-            type=TypeNotificationEnum.success,
-            utilisateur_id=utilisateur_id
+            reference="quete_id",
+            montant=quete_data.montant,
+            date_ecriture=db_quete.date_quete,
+            utilisateur_id=utilisateur_id,
+            titre_notification="Quête enregistrée",
+            message_notification=f"Quête de {quete_data.montant} FCFA enregistrée avec succès."
         )
-        db.add(notification)
-
-        db.commit()
     except Exception as e:
-        db.rollback()
         raise Exception(f"Erreur lors de la création de la quête : {e}")
 
-    db.refresh(db_quete)
-    return db_quete
-
-def get_quetes(db: Session, include_deleted=False, skip=0, limit=100):
+def get_quetes(db: Session, include_deleted=False, curseur: str = None, limite: int = LIMITE_DEFAUT):
     query = db.query(Quete)
     if not include_deleted:
         query = query.filter(Quete.deleted_at == None)
-    quetes = query.offset(skip).limit(limit).all()
-
-    total = db.query(func.coalesce(func.sum(Quete.montant), 0))
-    if not include_deleted:
-        total = total.filter(Quete.deleted_at == None)
-    montant_total = total.scalar()
-
-    for q in quetes:
-        q.montant_total = montant_total
-    return quetes
+    return paginer(query, Quete.date_quete, Quete.quete_id, curseur, limite)
 
 def get_quete(db: Session, quete_id: int, include_deleted=False):
     query = db.query(Quete).filter(Quete.quete_id == quete_id)
@@ -94,9 +68,7 @@ def get_quete(db: Session, quete_id: int, include_deleted=False):
     if not quete_instance:
         return None
 
-    montant_total = db.query(func.coalesce(func.sum(Quete.montant), 0))\
-        .filter(Quete.utilisateur_id == quete_instance.utilisateur_id, Quete.deleted_at == None).scalar()
-    quete_instance.montant_total = montant_total
+    quete_instance.montant_total = total_montant(db, "quete", utilisateur_id=quete_instance.utilisateur_id)
     return quete_instance
 
 def update_quete(db: Session, quete_id: int, quete_update: QueteUpdate):
@@ -104,6 +76,8 @@ def update_quete(db: Session, quete_id: int, quete_update: QueteUpdate):
     if not db_quete:
         return None
 
+    ancienne_annee, ancien_montant = db_quete.date_quete.year, db_quete.montant
+
     for key, value in quete_update.dict(exclude_unset=True).items():
         setattr(db_quete, key, value)
 
@@ -113,11 +87,14 @@ def update_quete(db: Session, quete_id: int, quete_update: QueteUpdate):
         if not utilisateur_existant:
             raise Exception("Utilisateur introuvable")
 
-        db.commit()
-
         date_quete = db_quete.date_quete
         verifier_ou_creer_budget_quete(db, date_quete.year, db_quete.utilisateur_id)
-        update_budget_reel(db, date_quete.year, "Quête", db_quete.utilisateur_id)
+        reporter_modification_budget(
+            db, "Quête", db_quete.utilisateur_id,
+            ancienne_annee, ancien_montant,
+            date_quete.year, db_quete.montant
+        )
+        db.commit()
 
     except SQLAlchemyError as e:
         db.rollback()
@@ -136,11 +113,11 @@ def soft_delete_quete(db: Session, quete_id: int):
 
     try:
         db_quete.deleted_at = datetime.utcnow()
-        db.commit()
 
         date_quete = db_quete.date_quete
         verifier_ou_creer_budget_quete(db, date_quete.year, db_quete.utilisateur_id)
-        update_budget_reel(db, date_quete.year, "Quête", db_quete.utilisateur_id)
+        update_budget_reel(db, date_quete.year, "Quête", db_quete.utilisateur_id, delta=-db_quete.montant)
+        db.commit()
 
     except Exception as e:
         db.rollback()
@@ -155,11 +132,11 @@ def restore_quete(db: Session, quete_id: int):
 
     try:
         db_quete.deleted_at = None
-        db.commit()
 
         date_quete = db_quete.date_quete
         verifier_ou_creer_budget_quete(db, date_quete.year, db_quete.utilisateur_id)
-        update_budget_reel(db, date_quete.year, "Quête", db_quete.utilisateur_id)
+        update_budget_reel(db, date_quete.year, "Quête", db_quete.utilisateur_id, delta=db_quete.montant)
+        db.commit()
 
     except Exception as e:
         db.rollback()
@@ -168,25 +145,5 @@ def restore_quete(db: Session, quete_id: int):
     return db_quete
 
 def search_quetes(db: Session, keyword: str, include_deleted=False):
-    query = db.query(Quete)
-    if not include_deleted:
-        query = query.filter(Quete.deleted_at == None)
-
-    keyword_like = f"%{keyword}%"
-    query = query.filter(
-        or_(
-            Quete.libelle.ilike(keyword_like),
-            cast(Quete.date_quete, String).ilike(keyword_like),
-            cast(Quete.montant, String).ilike(keyword_like)
-        )
-    )
-    results = query.order_by(Quete.date_quete.desc()).all()
-
-    montant_total = db.query(func.coalesce(func.sum(Quete.montant), 0))
-    if not include_deleted:
-        montant_total = montant_total.filter(Quete.deleted_at == None)
-    total = montant_total.scalar()
-
-    for q in results:
-        q.montant_total = total
-    return results
+    query, _ = requete_recherche(db, "quete", keyword, include_deleted)
+    return query.limit(LIMITE_MAX).all()
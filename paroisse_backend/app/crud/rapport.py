@@ -1,16 +1,33 @@
+import copy
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import func, select, literal, union_all, case
 from datetime import datetime
 from app.models.rapport import Rapport
 from app.models.utilisateur import Utilisateur
+from app.models.don import Don
+from app.models.offrande import Offrande
+from app.models.quete import Quete
+from app.models.achat import Achat
+from app.models.salaire import Salaire
+from app.models.facture import Facture
+from app.models.budget import Budget
+from app.models.registre_budget import RegistreBudget
+from app.models.materiel import Materiel
+from app.models.infrastructure import Infrastructure
+from app.models.pret import Pret
+from app.crud.pret import quantites_pret
+from app.utils.cache import CacheLRU
+from app.utils.periode import bornes_annee, filtre_annee
+from app.utils.pagination import paginer, LIMITE_DEFAUT, LIMITE_MAX
+from app.utils.recherche import requete_recherche
 
 # --- FONCTIONS CRUD DE BASE ---
 
-def get_rapports(db: Session, include_deleted: bool = False):
+def get_rapports(db: Session, include_deleted: bool = False, curseur: str = None, limite: int = LIMITE_DEFAUT):
     query = db.query(Rapport)
     if not include_deleted:
         query = query.filter(Rapport.deleted_at == None)
-    return query.order_by(Rapport.date_rapport.desc()).all()
+    return paginer(query, Rapport.date_rapport, Rapport.rapport_id, curseur, limite)
 
 def get_rapport(db: Session, rapport_id: int):
     return db.query(Rapport).filter(Rapport.rapport_id == rapport_id).first()
@@ -67,18 +84,12 @@ def restore_rapport(db: Session, rapport_id: int):
     return rapport
 
 def search_rapports(db: Session, query: str = None, type: str = None):
-    q = db.query(Rapport).filter(Rapport.deleted_at == None)
-
-    if query:
-        q = q.filter(or_(
-            Rapport.titre.ilike(f"%{query}%"),
-            Rapport.contenu.ilike(f"%{query}%")
-        ))
-
+    q = db.query(Rapport)
     if type:
         q = q.filter(Rapport.type == type)
 
-    return q.order_by(Rapport.date_rapport.desc()).all()
+    q, _ = requete_recherche(db, "rapport", query or "", query=q)
+    return q.limit(LIMITE_MAX).all()
 
 # --- CRÉATION PAR TYPE (version sans restriction de rôle) ---
 
@@ -100,30 +111,104 @@ def create_rapport_audit(db: Session, rapport, utilisateur_id: int):
 
 # --- RAPPORTS FINANCIERS / ADMINISTRATIFS / MATERIELS / AUDIT ---
 
+# Familles de sources : clé du détail -> (modèle, colonne date, filtres supplémentaires)
+SOURCES_RECETTES = {
+    "dons": (Don, Don.date_don, ()),
+    "offrandes": (Offrande, Offrande.date, ()),
+    "quetes": (Quete, Quete.date_quete, ()),
+}
+
+SOURCES_DEPENSES = {
+    "achats": (Achat, Achat.date_achat, ()),
+    "salaires": (Salaire, Salaire.date_paiement, ()),
+    # Les factures générées pour un achat sont déjà comptées dans les achats
+    "factures": (Facture, Facture.date_facture, (~Facture.achats.any(),)),
+}
+
+_cache_rapport_financier = CacheLRU(maxsize=32)
+
+
+def _totaux_mensuels(db: Session, sources: dict, annee: int):
+    """Une seule requête groupée (UNION ALL) par famille : (source, mois, total)."""
+    sous_requetes = []
+    for cle, (modele, colonne_date, filtres) in sources.items():
+        mois = func.extract('month', colonne_date)
+        sous_requetes.append(
+            select(
+                literal(cle).label("source"),
+                mois.label("mois"),
+                func.coalesce(func.sum(modele.montant), 0).label("total")
+            ).where(
+                modele.deleted_at.is_(None),
+                filtre_annee(colonne_date, annee),
+                *filtres
+            ).group_by(mois)
+        )
+    return db.execute(union_all(*sous_requetes)).all()
+
+
+def filigrane_financier(db: Session, annee: int):
+    """
+    Filigrane de dernière modification des données financières d'une année,
+    lu en un aller-retour : versions du registre budgétaire (incrémentées à chaque
+    écriture de don/offrande/quête/achat/salaire), budgets et factures.
+    """
+    debut, fin = bornes_annee(annee)
+    factures_annee = (Facture.date_facture >= debut, Facture.date_facture < fin)
+    ligne = db.execute(select(
+        select(func.coalesce(func.sum(RegistreBudget.version), 0))
+        .where(RegistreBudget.annee == annee).scalar_subquery(),
+        select(func.max(Budget.updated_at)).where(Budget.annee == annee).scalar_subquery(),
+        select(func.coalesce(func.sum(Budget.montantApprouve), 0)).where(Budget.annee == annee).scalar_subquery(),
+        select(func.max(Facture.updated_at)).where(*factures_annee).scalar_subquery(),
+        select(func.count()).select_from(Facture).where(*factures_annee).scalar_subquery(),
+    )).one()
+    return tuple(ligne)
+
+
 def generer_rapport_financier_annuel(db: Session, annee: int, utilisateur_id: int):
-    # Données simulées (remplacer par vos calculs réels)
-    recettes = {
-        "details": {
-            "dons": 1000000,
-            "offrandes": 500000,
-            "quetes": 300000
-        },
-        "total": 1800000
-    }
+    filigrane = filigrane_financier(db, annee)
+    rapport = _cache_rapport_financier.get((annee, filigrane))
+    if rapport is None:
+        rapport = _calculer_rapport_financier(db, annee)
+        _cache_rapport_financier.set((annee, filigrane), rapport)
+    return copy.deepcopy(rapport)
 
-    depenses = {
-        "details": {
-            "achats": 400000,
-            "salaires": 300000,
-            "factures": 250000
-        },
-        "total": 950000
+
+def _calculer_rapport_financier(db: Session, annee: int):
+    mensuel = {
+        f"{m:02d}": {"recettes": 0.0, "depenses": 0.0, "solde": 0.0}
+        for m in range(1, 13)
     }
 
-    budget_previsionnel = 2000000
-    budget_reel = recettes["total"] - depenses["total"]
-    ecart = budget_previsionnel - (recettes["total"] + depenses["total"])
+    def agreger(sources, famille):
+        details = {cle: 0.0 for cle in sources}
+        for source, mois, total in _totaux_mensuels(db, sources, annee):
+            details[source] += float(total)
+            mensuel[f"{int(mois):02d}"][famille] += float(total)
+        return {"details": details, "total": sum(details.values())}
+
+    recettes = agreger(SOURCES_RECETTES, "recettes")
+    depenses = agreger(SOURCES_DEPENSES, "depenses")
+
+    for valeurs in mensuel.values():
+        valeurs["solde"] = valeurs["recettes"] - valeurs["depenses"]
+
+    # Budget prévisionnel : recettes approuvées moins dépenses approuvées
+    budget_previsionnel = db.query(func.coalesce(func.sum(
+        case(
+            (Budget.categorie == "Recette", Budget.montantApprouve),
+            else_=-Budget.montantApprouve
+        )
+    ), 0)).filter(
+        Budget.annee == annee,
+        Budget.deleted_at.is_(None)
+    ).scalar()
+    budget_previsionnel = float(budget_previsionnel)
+
     solde = recettes["total"] - depenses["total"]
+    budget_reel = solde
+    ecart = budget_reel - budget_previsionnel
 
     return {
         "annee": annee,
@@ -134,7 +219,8 @@ def generer_rapport_financier_annuel(db: Session, annee: int, utilisateur_id: in
             "reel": budget_reel,
             "ecart": ecart
         },
-        "solde": solde
+        "solde": solde,
+        "mensuel": mensuel
     }
 
 def generer_rapport_administratif(db: Session, date_debut: datetime = None, date_fin: datetime = None):
@@ -157,45 +243,104 @@ def generer_rapport_administratif(db: Session, date_debut: datetime = None, date
         ]
     }
 
+# --- GRAND LIVRE (exports volumineux) ---
+
+TAILLE_LOT_GRAND_LIVRE = 1000
+
+# Feuille -> (colonnes lues, en-têtes, modèle, colonne date)
+GRAND_LIVRE = [
+    ("Dons", (Don.don_id, Don.date_don, Don.donateur, Don.type, Don.montant, Don.commentaire),
+     ["ID", "Date", "Donateur", "Type", "Montant (FCFA)", "Commentaire"], Don, Don.date_don),
+    ("Offrandes", (Offrande.offrande_id, Offrande.date, Offrande.type, Offrande.description, Offrande.montant),
+     ["ID", "Date", "Type", "Description", "Montant (FCFA)"], Offrande, Offrande.date),
+    ("Quêtes", (Quete.quete_id, Quete.date_quete, Quete.libelle, Quete.montant),
+     ["ID", "Date", "Libellé", "Montant (FCFA)"], Quete, Quete.date_quete),
+    ("Achats", (Achat.achat_id, Achat.date_achat, Achat.libelle, Achat.fournisseur, Achat.montant),
+     ["ID", "Date", "Libellé", "Fournisseur", "Montant (FCFA)"], Achat, Achat.date_achat),
+    ("Salaires", (Salaire.salaire_id, Salaire.date_paiement, Salaire.employe_id, Salaire.montant),
+     ["ID", "Date paiement", "Employé ID", "Montant (FCFA)"], Salaire, Salaire.date_paiement),
+]
+
+
+def iterer_grand_livre(db: Session, annee_debut: int, annee_fin: int):
+    """
+    Produit, pour chaque source, (titre, en-têtes, lignes) où les lignes sont lues
+    par lots via un curseur côté serveur (yield_per) : la mémoire reste bornée
+    quel que soit le nombre d'écritures exportées.
+    """
+    debut, _ = bornes_annee(annee_debut)
+    _, fin = bornes_annee(annee_fin)
+
+    for titre, colonnes, entetes, modele, colonne_date in GRAND_LIVRE:
+        query = db.query(*colonnes).filter(
+            modele.deleted_at.is_(None),
+            colonne_date >= debut,
+            colonne_date < fin
+        ).order_by(colonne_date, colonnes[0]).yield_per(TAILLE_LOT_GRAND_LIVRE)
+        yield titre, entetes, (tuple(ligne) for ligne in query)
+
+
+def _compter_par_etat(db: Session, modele):
+    lignes = db.query(modele.etat, func.count())\
+        .filter(modele.deleted_at.is_(None))\
+        .group_by(modele.etat).all()
+    etats = {
+        (etat.value if etat is not None else "inconnu"): nombre
+        for etat, nombre in lignes
+    }
+    return {"total": sum(etats.values()), "etat": etats}
+
+
+def _format_date(valeur):
+    return valeur.strftime("%Y-%m-%d") if valeur else None
+
+
 def generer_rapport_materiel(db: Session, date_debut: datetime = None, date_fin: datetime = None):
-    # Données fictives à remplacer par vos propres requêtes ou jointures
-    return {
-        "materiels": {
-            "total": 50,
-            "etat": {
-                "bon": 30,
-                "moyen": 15,
-                "endommagé": 5
-            },
-            "pret": [
-                {
-                    "materiel": "Chaise",
-                    "beneficiaire": "Jean",
-                    "date_pret": "2025-04-01",
-                    "date_retour_prevue": "2025-04-10",
-                    "date_retour_effective": None,
-                    "etat_retour": "bon"
-                }
-            ]
-        },
-        "infrastructures": {
-            "total": 10,
-            "etat": {
-                "bon": 6,
-                "moyen": 3,
-                "endommagé": 1
-            },
-            "pret": [
-                {
-                    "infrastructure": "Salle paroissiale",
-                    "beneficiaire": "Marie",
-                    "date_pret": "2025-03-10",
-                    "date_retour_prevue": "2025-03-15",
-                    "date_retour_effective": "2025-03-14",
-                    "etat_retour": "moyen"
-                }
-            ]
+    materiels = _compter_par_etat(db, Materiel)
+    infrastructures = _compter_par_etat(db, Infrastructure)
+
+    # Prêts couvrant la période : lignes chargées en une requête (selectin), nom
+    # de l'infrastructure par jointure, noms des matériels en une requête
+    query = db.query(Pret, Infrastructure.nom)\
+        .outerjoin(Infrastructure, Pret.infrastructure_id == Infrastructure.infrastructure_id)\
+        .filter(Pret.deleted_at.is_(None))
+
+    if date_fin:
+        query = query.filter(Pret.date_pret <= date_fin.date())
+    if date_debut:
+        query = query.filter(
+            func.coalesce(Pret.date_retour_effective, Pret.date_retour_prevue) >= date_debut.date()
+        )
+    else:
+        # Sans période : seuls les prêts encore en cours
+        query = query.filter(Pret.date_retour_effective.is_(None))
+
+    prets = query.order_by(Pret.date_pret.desc()).all()
+    # Mêmes règles qu'à la création : une ligne par matériel prêté, avec sa quantité
+    quantites = {p.pret_id: quantites_pret(p) for p, _ in prets}
+    ids_materiels = {m_id for q in quantites.values() for m_id in q}
+    noms_materiels = dict(
+        db.query(Materiel.materiel_id, Materiel.nom).filter(Materiel.materiel_id.in_(ids_materiels))
+    ) if ids_materiels else {}
+
+    materiels["pret"] = []
+    infrastructures["pret"] = []
+    for p, infrastructure_nom in prets:
+        pret = {
+            "beneficiaire": p.beneficiaire,
+            "date_pret": _format_date(p.date_pret),
+            "date_retour_prevue": _format_date(p.date_retour_prevue),
+            "date_retour_effective": _format_date(p.date_retour_effective),
+            "etat_retour": p.etat_retour
         }
+        for materiel_id, quantite in quantites[p.pret_id].items():
+            materiels["pret"].append({"materiel": noms_materiels.get(materiel_id), "quantite": quantite, **pret})
+        if p.infrastructure_id:
+            infrastructures["pret"].append({"infrastructure": infrastructure_nom, **pret})
+
+    return {
+        "materiels": materiels,
+        "infrastructures": infrastructures
     }
 
 def generer_rapport_audit_compile(db: Session, date_debut: datetime, date_fin: datetime):
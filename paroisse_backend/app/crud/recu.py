@@ -1,22 +1,23 @@
-from sqlalchemy import func
 from sqlalchemy.orm import Session
 from datetime import datetime
 from app.models.recu import Recu
 from app.schemas.recu import RecuCreate
-from sqlalchemy import or_, cast, String
+from app.utils.pagination import paginer, LIMITE_DEFAUT, LIMITE_MAX
+from app.utils.periode import filtre_annee
+from app.utils.totaux import total_montant
+from app.utils.recherche import requete_recherche
+from app.utils.recu import creer_recus, recu_de_source
 
 def create_recu(db: Session, recu: RecuCreate):
-    db_recu = Recu(**recu.dict())
-    db.add(db_recu)
-    db.commit()
-    db.refresh(db_recu)
-    return db_recu
+    # Reçu manuel : numéroté comme les autres, sans écriture source.
+    # Pas de commit : l'appelant valide le reçu avec le reste de son écriture
+    return creer_recus(db, [recu.dict(exclude={"utilisateur_id"})], recu.utilisateur_id)[0]
 
-def get_recus(db: Session, include_deleted=False):
+def get_recus(db: Session, include_deleted=False, curseur: str = None, limite: int = LIMITE_DEFAUT):
     query = db.query(Recu)
     if not include_deleted:
         query = query.filter(Recu.deleted_at == None)
-    return query.all()
+    return paginer(query, Recu.date_emission, Recu.recu_id, curseur, limite)
 
 def get_recu(db: Session, recu_id: int, include_deleted=False):
     query = db.query(Recu).filter(Recu.recu_id == recu_id)
@@ -25,9 +26,7 @@ def get_recu(db: Session, recu_id: int, include_deleted=False):
     recu_instance = query.first()
     if not recu_instance:
         return None
-    montant_total = db.query(func.coalesce(func.sum(Recu.montant), 0))\
-        .filter(Recu.utilisateur_id == recu_instance.utilisateur_id, Recu.deleted_at == None).scalar()
-    recu_instance.montant_total = montant_total
+    recu_instance.montant_total = total_montant(db, "recu", utilisateur_id=recu_instance.utilisateur_id)
     return recu_instance
 
 def soft_delete_recu(db: Session, recu_id: int):
@@ -45,32 +44,32 @@ def restore_recu(db: Session, recu_id: int):
     return recu
 
 
-from sqlalchemy import or_, cast, String, func
+def get_recu_de_source(db: Session, source_type: str, source_id: int, include_deleted=False):
+    return recu_de_source(db, source_type, source_id, include_deleted)
 
-def search_recus(db: Session, keyword: str, include_deleted: bool = False):
-    keyword_like = f"%{keyword}%"
-    query = db.query(Recu)
 
+def get_recus_a_imprimer(
+    db: Session,
+    ids: list = None,
+    annee: int = None,
+    source_type: str = None,
+    include_deleted=False,
+    limite: int = None
+):
+    # Sélection pour l'impression en lot, dans l'ordre de numérotation
+    query = db.query(Recu)
+    if ids:
+        query = query.filter(Recu.recu_id.in_(ids))
+    if annee:
+        query = query.filter(filtre_annee(Recu.date_emission, annee))
+    if source_type:
+        query = query.filter(Recu.source_type == source_type)
     if not include_deleted:
         query = query.filter(Recu.deleted_at == None)
+    query = query.order_by(Recu.date_emission, Recu.recu_id)
+    return query.limit(min(limite or LIMITE_MAX, LIMITE_MAX)).all()
 
-    query = query.filter(
-        or_(
-            Recu.description.ilike(keyword_like),
-            cast(Recu.montant, String).ilike(keyword_like),
-            cast(Recu.date_emission, String).ilike(keyword_like),
-            cast(Recu.utilisateur_id, String).ilike(keyword_like)
-        )
-    )
-
-    results = query.order_by(Recu.date_emission.desc()).all()
 
-    montant_total = db.query(func.coalesce(func.sum(Recu.montant), 0))
-    if not include_deleted:
-        montant_total = montant_total.filter(Recu.deleted_at == None)
-    total = montant_total.scalar()
-
-    for r in results:
-        r.montant_total = total
-
-    return results
+def search_recus(db: Session, keyword: str, include_deleted: bool = False):
+    query, _ = requete_recherche(db, "recu", keyword, include_deleted)
+    return query.limit(LIMITE_MAX).all()
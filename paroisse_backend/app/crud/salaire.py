@@ -1,13 +1,14 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func, or_, cast, String
+from sqlalchemy.orm import Session, contains_eager
+from sqlalchemy import or_, cast, String
 from datetime import datetime
 from app.models.salaire import Salaire
 from app.models.notification import Notification, TypeNotificationEnum
 from app.models.employe import Employe
 from app.schemas.salaire import SalaireCreate, SalaireUpdate
-from app.schemas.recu import RecuCreate
-from app.crud.recu import create_recu
+from app.utils.recu import generate_recu
 from app.utils.budget import update_budget_reel, verifier_solde_disponible
+from app.utils.pagination import paginer, LIMITE_DEFAUT, LIMITE_MAX
+from app.utils.totaux import total_montant
 
 def create_salaire(db: Session, salaire: SalaireCreate, utilisateur_id: int):
     if salaire.montant <= 0:
@@ -38,16 +39,18 @@ def create_salaire(db: Session, salaire: SalaireCreate, utilisateur_id: int):
         db.flush()
 
         # Création automatique du reçu
-        recu_data = RecuCreate(
+        generate_recu(
+            db=db,
             montant=salaire.montant,
-            description=f"Paiement du salaire (Employé ID: {salaire.employe_id})",
-            date_emission=datetime.utcnow(),
-            utilisateur_id=utilisateur_id
+            source="Salaire",
+            reference_id=db_salaire.salaire_id,
+            utilisateur_id=utilisateur_id,
+            date_emission=db_salaire.date_paiement,
+            description=f"Paiement du salaire (Employé ID: {salaire.employe_id})"
         )
-        create_recu(db, recu_data)
 
         # Mise à jour du budget réel
-        update_budget_reel(db, db_salaire.date_paiement.year, "Salaire", utilisateur_id)
+        update_budget_reel(db, db_salaire.date_paiement.year, "Salaire", utilisateur_id, delta=salaire.montant)
 
         # Notification succès
         notif = Notification(
@@ -67,24 +70,19 @@ def create_salaire(db: Session, salaire: SalaireCreate, utilisateur_id: int):
     return db_salaire
 
 
-def get_salaires(db: Session, include_deleted: bool = False):
-    query = db.query(Salaire).join(Employe)
+def get_salaires(db: Session, include_deleted: bool = False, curseur: str = None, limite: int = LIMITE_DEFAUT):
+    # Employé chargé par la jointure elle-même : pas de requête par salaire
+    query = db.query(Salaire).join(Employe).options(contains_eager(Salaire.employe))
     if not include_deleted:
         query = query.filter(Salaire.deleted_at == None)
-    salaires = query.all()
-
-    montant_total_query = db.query(func.coalesce(func.sum(Salaire.montant), 0))
-    if not include_deleted:
-        montant_total_query = montant_total_query.filter(Salaire.deleted_at == None)
-    montant_total = montant_total_query.scalar()
+    salaires, next_cursor = paginer(query, Salaire.date_paiement, Salaire.salaire_id, curseur, limite)
 
     for s in salaires:
-        s.montant_total = montant_total
         s.employe_nom = s.employe.nom
         s.employe_prenom = s.employe.prenom
         s.employe_poste = s.employe.poste
 
-    return salaires
+    return salaires, next_cursor
 
 
 def get_salaire(db: Session, salaire_id: int, include_deleted: bool = False):
@@ -95,9 +93,7 @@ def get_salaire(db: Session, salaire_id: int, include_deleted: bool = False):
     if not salaire_instance:
         return None
 
-    montant_total = db.query(func.coalesce(func.sum(Salaire.montant), 0))\
-        .filter(Salaire.utilisateur_id == salaire_instance.utilisateur_id, Salaire.deleted_at == None).scalar()
-    salaire_instance.montant_total = montant_total
+    salaire_instance.montant_total = total_montant(db, "salaire", utilisateur_id=salaire_instance.utilisateur_id)
     return salaire_instance
 
 
@@ -112,8 +108,7 @@ def soft_delete_salaire(db: Session, salaire_id: int):
 
     try:
         db_salaire.deleted_at = datetime.utcnow()
-        db.commit()
-        update_budget_reel(db, db_salaire.date_paiement.year, "Salaire", db_salaire.utilisateur_id)
+        update_budget_reel(db, db_salaire.date_paiement.year, "Salaire", db_salaire.utilisateur_id, delta=-db_salaire.montant)
 
         notif = Notification(
             titre="Salaire supprimé",
@@ -141,8 +136,7 @@ def restore_salaire(db: Session, salaire_id: int):
 
     try:
         db_salaire.deleted_at = None
-        db.commit()
-        update_budget_reel(db, db_salaire.date_paiement.year, "Salaire", db_salaire.utilisateur_id)
+        update_budget_reel(db, db_salaire.date_paiement.year, "Salaire", db_salaire.utilisateur_id, delta=db_salaire.montant)
 
         notif = Notification(
             titre="Salaire restauré",
@@ -175,4 +169,4 @@ def search_salaires(db: Session, keyword: str, include_deleted: bool = False):
         )
     ).order_by(Salaire.date_paiement.desc())
 
-    return query.all()
+    return query.limit(LIMITE_MAX).all()
@@ -1,9 +1,16 @@
+from fastapi import HTTPException
 from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, exists, func, insert
+from app.models.materiel import Materiel
+from app.models.pret import Pret, PretLigne
 from app.models.stock_materiel import StockMateriel, TypeMouvementStockEnum
+from app.models.stock_courant import StockCourant
 from app.schemas.stock_materiel import StockMaterielCreate
 from datetime import datetime
-from typing import Optional
-from app.utils.stock_alerts import verifier_alertes_stock
+from typing import Iterable, List, Optional
+from app.utils.amorcage import inserer_ou_relire
+from app.utils.pagination import paginer, LIMITE_DEFAUT
+from app.utils.stock_alerts import signaler_stock_modifie
 
 def create_mouvement_stock(db: Session, mouvement: StockMaterielCreate) -> StockMateriel:
     db_mouvement = StockMateriel(
@@ -14,28 +21,318 @@ def create_mouvement_stock(db: Session, mouvement: StockMaterielCreate) -> Stock
         date_mouvement=datetime.utcnow()
     )
     db.add(db_mouvement)
-    db.commit()
+
+    try:
+        delta = mouvement.quantite if mouvement.type_mouvement == TypeMouvementStockEnum.entree else -mouvement.quantite
+        # Contrôle de la sortie sur le stock verrouillé : lu avant le verrou,
+        # deux sorties concurrentes pourraient chacune passer et vider le stock.
+        stock = appliquer_mouvement_stock(db, mouvement.materiel_id, delta)
+        if stock.quantite < 0:
+            disponible = stock.quantite + mouvement.quantite
+            db.rollback()
+            raise HTTPException(
+                status_code=400,
+                detail=f"La quantité sortie ({mouvement.quantite}) ne peut pas dépasser la quantité en stock ({disponible})."
+            )
+        db.commit()
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise Exception(f"Erreur lors de l'enregistrement du mouvement de stock : {str(e)}")
+
     db.refresh(db_mouvement)
 
-    # Déclenchement automatique des alertes après chaque mouvement
-    verifier_alertes_stock(db)
+    # Alertes évaluées en arrière-plan, regroupées par matériel
+    signaler_stock_modifie(db_mouvement.materiel_id)
 
     return db_mouvement
 
+def create_mouvements_stock_batch(db: Session, mouvements: List[StockMaterielCreate]):
+    """
+    Enregistre plusieurs mouvements en une transaction : validation de toutes
+    les lignes, un seul INSERT en lot, une mise à jour du stock courant par
+    matériel et un seul signal d'alerte par matériel. Tout ou rien : si une
+    ligne est invalide, aucune n'est enregistrée.
+    Retourne (lignes, succès) ; chaque ligne porte son statut et le stock après
+    application (ou l'erreur).
+    """
+    try:
+        lignes, succes = appliquer_mouvements_stock(db, mouvements)
+        if not succes:
+            db.rollback()
+            return lignes, False
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise Exception(f"Erreur lors de l'enregistrement des mouvements de stock : {str(e)}")
+
+    signaler_stocks_modifies(mouvements)
+    return lignes, True
+
+
+def appliquer_mouvements_stock(db: Session, mouvements: List[StockMaterielCreate]):
+    """
+    Valide puis écrit les mouvements et le stock courant, sans commit : l'appelant
+    valide dans la même transaction que ses propres écritures (ex. un prêt), puis
+    appelle signaler_stocks_modifies(). Si une ligne est invalide, rien n'est
+    écrit et l'appelant doit annuler la transaction.
+    """
+    materiel_ids = {m.materiel_id for m in mouvements}
+    existants = {
+        m_id for (m_id,) in db.query(Materiel.materiel_id).filter(
+            Materiel.materiel_id.in_(materiel_ids),
+            Materiel.deleted_at.is_(None)
+        )
+    }
+
+    stocks = verrouiller_stocks(db, materiel_ids & existants)
+    quantites = {m_id: stock.quantite for m_id, stock in stocks.items()}
+
+    # Validation dans l'ordre des lignes : une sortie voit les entrées qui la précèdent
+    lignes, succes = [], True
+    for index, mouvement in enumerate(mouvements):
+        erreur = None
+        if mouvement.materiel_id not in existants:
+            erreur = f"Matériel {mouvement.materiel_id} introuvable."
+        elif mouvement.quantite <= 0:
+            erreur = "La quantité doit être positive."
+        elif mouvement.type_mouvement == TypeMouvementStockEnum.sortie and mouvement.quantite > quantites[mouvement.materiel_id]:
+            erreur = (
+                f"La quantité sortie ({mouvement.quantite}) ne peut pas dépasser "
+                f"la quantité en stock ({quantites[mouvement.materiel_id]})."
+            )
+        else:
+            delta = mouvement.quantite if mouvement.type_mouvement == TypeMouvementStockEnum.entree else -mouvement.quantite
+            quantites[mouvement.materiel_id] += delta
+
+        succes = succes and erreur is None
+        lignes.append({
+            "index": index,
+            "materiel_id": mouvement.materiel_id,
+            "type_mouvement": mouvement.type_mouvement,
+            "quantite": mouvement.quantite,
+            "statut": "erreur" if erreur else "ok",
+            "stock_apres": None if erreur else quantites[mouvement.materiel_id],
+            "erreur": erreur,
+        })
+
+    if not succes:
+        for ligne in lignes:
+            if ligne["statut"] == "ok":
+                ligne["statut"], ligne["stock_apres"] = "annule", None
+        return lignes, False
+
+    maintenant = datetime.utcnow()
+    db.execute(insert(StockMateriel), [
+        {
+            "materiel_id": m.materiel_id,
+            "quantite": m.quantite,
+            "type_mouvement": m.type_mouvement,
+            "description": m.description,
+            "date_mouvement": maintenant,
+        }
+        for m in mouvements
+    ])
+    for m_id, stock in stocks.items():
+        stock.quantite = quantites[m_id]
+    db.flush()
+
+    return lignes, True
+
+
+def signaler_stocks_modifies(mouvements):
+    """Après commit : un signal d'alerte par matériel touché."""
+    for m_id in {m.materiel_id for m in mouvements}:
+        signaler_stock_modifie(m_id)
+
+
 def get_mouvements_stock(
     db: Session, 
-    skip: int = 0, 
-    limit: int = 100, 
+    curseur: Optional[str] = None, 
+    limite: int = LIMITE_DEFAUT, 
     search: Optional[str] = None
 ):
-    query = db.query(StockMateriel).order_by(StockMateriel.date_mouvement.desc())
+    query = db.query(StockMateriel)
     if search:
         search_term = f"%{search}%"
         query = query.filter(StockMateriel.description.ilike(search_term))
-    return query.offset(skip).limit(limit).all()
+    return paginer(query, StockMateriel.date_mouvement, StockMateriel.stock_id, curseur, limite)
+
+# Quantité signée d'un mouvement : +quantité pour une entrée, -quantité pour une sortie
+_quantite_signee = case(
+    (StockMateriel.type_mouvement == TypeMouvementStockEnum.entree, StockMateriel.quantite),
+    else_=-StockMateriel.quantite
+)
+
+
+def calculer_stock_materiel(
+    db: Session,
+    materiel_id: Optional[int] = None,
+    materiel_ids: Optional[Iterable[int]] = None
+) -> dict:
+    """Stock recalculé depuis l'historique des mouvements : {materiel_id: quantité}."""
+    query = db.query(StockMateriel.materiel_id, func.coalesce(func.sum(_quantite_signee), 0))
+    if materiel_id is not None:
+        query = query.filter(StockMateriel.materiel_id == materiel_id)
+    if materiel_ids is not None:
+        query = query.filter(StockMateriel.materiel_id.in_(list(materiel_ids)))
+    return {m_id: int(total) for m_id, total in query.group_by(StockMateriel.materiel_id).all()}
+
+
+def appliquer_mouvement_stock(db: Session, materiel_id: int, delta: int):
+    """
+    Reporte un mouvement sur le stock courant du matériel. Aucun commit :
+    l'appelant valide le mouvement et le stock dans la même transaction.
+    """
+    def relire():
+        return db.query(StockCourant).filter(
+            StockCourant.materiel_id == materiel_id
+        ).with_for_update().first()
+
+    stock, cree = relire(), False
+    if not stock:
+        # Premier mouvement suivi pour ce matériel : on initialise depuis
+        # l'historique, qui inclut déjà le mouvement courant une fois flushé ;
+        # si une autre transaction a créé la ligne entre-temps, le delta s'y applique.
+        db.flush()
+        stock, cree = inserer_ou_relire(db, StockCourant, {
+            "materiel_id": materiel_id,
+            "quantite": calculer_stock_materiel(db, materiel_id).get(materiel_id, 0),
+        }, relire)
+    if not cree:
+        stock.quantite = (stock.quantite or 0) + delta
+
+    db.flush()
+    return stock
+
+
+def verrouiller_stocks(db: Session, materiel_ids) -> dict:
+    """
+    Stocks courants des matériels, verrouillés pour la transaction en une
+    requête ; les lignes manquantes sont initialisées depuis l'historique.
+    """
+    if not materiel_ids:
+        return {}
+
+    stocks = {
+        s.materiel_id: s for s in db.query(StockCourant).filter(
+            StockCourant.materiel_id.in_(list(materiel_ids))
+        ).with_for_update()
+    }
+
+    manquants = set(materiel_ids) - set(stocks)
+    if manquants:
+        historiques = calculer_stock_materiel(db, materiel_ids=manquants)
+        for m_id in manquants:
+            stocks[m_id], _ = inserer_ou_relire(
+                db,
+                StockCourant,
+                {"materiel_id": m_id, "quantite": historiques.get(m_id, 0)},
+                lambda m_id=m_id: db.query(StockCourant).filter(StockCourant.materiel_id == m_id).with_for_update().one()
+            )
+
+    return stocks
+
 
 def get_stock_actuel_par_materiel(db: Session, materiel_id: int) -> int:
-    mouvements = db.query(StockMateriel).filter(StockMateriel.materiel_id == materiel_id).all()
-    total_entree = sum(m.quantite for m in mouvements if m.type_mouvement == TypeMouvementStockEnum.entree)
-    total_sortie = sum(m.quantite for m in mouvements if m.type_mouvement == TypeMouvementStockEnum.sortie)
-    return total_entree - total_sortie
+    quantite = db.query(StockCourant.quantite).filter(StockCourant.materiel_id == materiel_id).scalar()
+    if quantite is not None:
+        return quantite
+    # Matériel sans stock courant (aucun mouvement depuis la mise en place) : recalcul
+    return calculer_stock_materiel(db, materiel_id).get(materiel_id, 0)
+
+
+def quantites_sorties(db: Session) -> dict:
+    """
+    Quantités sorties du stock par les prêts en cours : {materiel_id: quantité}.
+    Un prêt antérieur aux lignes a sorti un exemplaire de son matériel.
+    """
+    actifs = and_(Pret.deleted_at.is_(None), Pret.date_retour_effective.is_(None))
+    sorties = dict(
+        db.query(PretLigne.materiel_id, func.sum(PretLigne.quantite))
+        .join(Pret, Pret.pret_id == PretLigne.pret_id)
+        .filter(actifs, PretLigne.sortie_effectuee.is_(True))
+        .group_by(PretLigne.materiel_id)
+        .all()
+    )
+    anciens = db.query(Pret.materiel_id, func.count(Pret.pret_id)).filter(
+        actifs,
+        Pret.materiel_id.isnot(None),
+        ~exists().where(PretLigne.pret_id == Pret.pret_id)
+    ).group_by(Pret.materiel_id)
+    for materiel_id, nombre in anciens:
+        sorties[materiel_id] = sorties.get(materiel_id, 0) + nombre
+    return {m_id: int(quantite) for m_id, quantite in sorties.items()}
+
+
+def initialiser_stock_materiels(db: Session) -> List[dict]:
+    """
+    Migration vers les prêts en quantité : avant eux, un matériel valait un
+    exemplaire et ses prêts ne consultaient pas le stock. Chaque matériel dont
+    le parc (stock + quantités sorties par les prêts en cours) est nul reçoit
+    une entrée "Stock initial" qui le porte à un exemplaire. À exécuter une fois,
+    puis saisir les vraies quantités par des entrées de stock. Commit unique.
+    """
+    materiel_ids = [m_id for (m_id,) in db.query(Materiel.materiel_id).filter(Materiel.deleted_at.is_(None))]
+    stocks = calculer_stock_materiel(db, materiel_ids=materiel_ids)
+    sorties = quantites_sorties(db)
+
+    mouvements = [
+        StockMaterielCreate(
+            materiel_id=m_id,
+            quantite=1 - parc,
+            type_mouvement=TypeMouvementStockEnum.entree,
+            description="Stock initial (un exemplaire par matériel)"
+        )
+        for m_id in materiel_ids
+        if (parc := stocks.get(m_id, 0) + sorties.get(m_id, 0)) <= 0
+    ]
+    if not mouvements:
+        return []
+
+    try:
+        appliquer_mouvements_stock(db, mouvements)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise Exception(f"Erreur lors de l'initialisation du stock : {str(e)}")
+
+    signaler_stocks_modifies(mouvements)
+    return [{"materiel_id": m.materiel_id, "quantite": m.quantite} for m in mouvements]
+
+
+def reconcilier_stock_courant(db: Session, corriger: bool = True):
+    """
+    Compare le stock courant à l'historique des mouvements et retourne les
+    écarts constatés. Avec corriger=True, le stock courant est réaligné.
+    """
+    reels = calculer_stock_materiel(db)
+    stocks = {s.materiel_id: s for s in db.query(StockCourant).all()}
+
+    ecarts = []
+    for materiel_id in sorted(set(reels) | set(stocks)):
+        reel = reels.get(materiel_id, 0)
+        stock = stocks.get(materiel_id)
+        enregistre = stock.quantite if stock else None
+
+        if enregistre == reel:
+            continue
+
+        ecarts.append({
+            "materiel_id": materiel_id,
+            "stock_courant": enregistre,
+            "reel": reel,
+            "ecart": reel - (enregistre or 0)
+        })
+
+        if corriger:
+            if not stock:
+                stock = StockCourant(materiel_id=materiel_id)
+                db.add(stock)
+            stock.quantite = reel
+
+    if corriger and ecarts:
+        db.commit()
+
+    return ecarts
@@ -4,7 +4,7 @@ from sqlalchemy import or_
 from datetime import datetime
 from app.models.utilisateur import Utilisateur
 from app.schemas.utilisateur import UtilisateurCreate, UtilisateurUpdate
-from app.utils.security import hash_password
+from app.utils.security import hash_password, invalider_utilisateur_courant
 
 def create_utilisateur(db: Session, utilisateur: UtilisateurCreate):
     hashed_pwd = hash_password(utilisateur.mot_de_passe)
@@ -63,6 +63,7 @@ def update_utilisateur(db: Session, utilisateur_id: int, utilisateur_update: Uti
         setattr(utilisateur, key, value)
 
     db.commit()
+    invalider_utilisateur_courant(utilisateur_id)
     db.refresh(utilisateur)
     return utilisateur
 
@@ -72,6 +73,7 @@ def soft_delete_utilisateur(db: Session, utilisateur_id: int):
     if utilisateur and utilisateur.deleted_at is None:
         utilisateur.deleted_at = datetime.utcnow()
         db.commit()
+        invalider_utilisateur_courant(utilisateur_id)
     return utilisateur
 
 def restore_utilisateur(db: Session, utilisateur_id: int):
@@ -79,6 +81,7 @@ def restore_utilisateur(db: Session, utilisateur_id: int):
     if utilisateur and utilisateur.deleted_at is not None:
         utilisateur.deleted_at = None
         db.commit()
+        invalider_utilisateur_courant(utilisateur_id)
     return utilisateur
 
 def get_utilisateur_by_email(db: Session, email: str):
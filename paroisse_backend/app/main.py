@@ -1,7 +1,8 @@
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 
-from app.database import engine, Base
+from app.config import INDEX_RECHERCHE_MEMOIRE
+from app.database import engine, Base, SessionLocal
 import app.models  # Assure le chargement des modèles
 
 # Création de l'application FastAPI
@@ -32,6 +33,8 @@ from app.routers.sous_commission_financiere import router as sous_commission_fin
 from app.routers.utilisateur import router as utilisateur_router
 from app.routers.reunion import router as reunion_router
 from app.routers.pret import router as pret_router
+from app.routers.recherche import router as recherche_router
+from app.routers.importation import router as importation_router
 
 # Nouveaux modules
 from app.routers.stock_alerts import router as stock_alerts
@@ -42,16 +45,30 @@ from app.routers.infrastructure import router as infrastructures
 
 # Tâches planifiées (scheduler)
 from app.scheduler import start_scheduler
+from app.utils.index_memoire import lancer_reconstruction
+from app.utils.recherche import assurer_index_fulltext
+from app.utils.stock_alerts import file_alertes_stock
 scheduler = start_scheduler()
 
 # Exécuté au démarrage
 @app.on_event("startup")
 def startup_event():
     Base.metadata.create_all(bind=engine)
+    # Tables créées avant leurs index FULLTEXT : create_all ne les ajoute pas
+    with engine.begin() as connection:
+        assurer_index_fulltext(connection)
+    if INDEX_RECHERCHE_MEMOIRE:
+        lancer_reconstruction(SessionLocal)
     for route in app.routes:
         print(route.path)
 
 
+# Exécuté à l'arrêt : les alertes de stock en attente sont évaluées avant de quitter
+@app.on_event("shutdown")
+def shutdown_event():
+    file_alertes_stock.vider()
+
+
 # Route racine
 @app.get("/")
 def read_root():
@@ -79,6 +96,8 @@ app.include_router(quete_router, prefix="/api/quetes", tags=["Quêtes"])
 app.include_router(recu_router, prefix="/api/recus", tags=["Reçus"])
 app.include_router(sous_commission_financiere_router, prefix="/api/sous-commission-financiere", tags=["Sous Commission Financière"])
 app.include_router(rapport_router, prefix="/api/rapports", tags=["Rapports"])
+app.include_router(recherche_router, prefix="/api", tags=["Recherche"])
+app.include_router(importation_router, prefix="/api", tags=["Import"])
 app.include_router(salaire_router, prefix="/api/salaires", tags=["Salaires"])
 app.include_router(stock_materiel, prefix="/api/stock", tags=["StockMateriel"])
 app.include_router(stock_alerts, prefix="/api/stock-alerts", tags=["Stock Alerts"])
@@ -16,8 +16,11 @@ from .offrande import Offrande
 from .don import Don
 from .achat import Achat
 from .decision import Decision
-from .pret import Pret
+from .pret import Pret, PretLigne
 from .maintenance import Maintenance
 from .notification import Notification, TypeNotificationEnum
 from .budget import Budget
 from .stock_materiel import StockMateriel
+from .stock_courant import StockCourant
+from .registre_budget import RegistreBudget
+from .sequence_recu import SequenceRecu
@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
 
 class Achat(Base):
     __tablename__ = "Achat"
+    __table_args__ = (
+        # Agrégats annuels : deleted_at IS NULL AND date_achat dans [début, fin)
+        Index("ix_achat_deleted_at_date_achat", "deleted_at", "date_achat"),
+    )
 
     achat_id = Column(Integer, primary_key=True, index=True)
     libelle = Column(String(255), nullable=False)
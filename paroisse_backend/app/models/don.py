@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, String, Text
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, String, Text, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 from datetime import datetime
@@ -6,6 +6,12 @@ from sqlalchemy.sql import func
 
 class Don(Base):
     __tablename__ = "don"  # généralement en minuscules pour la table
+    __table_args__ = (
+        # Agrégats annuels : deleted_at IS NULL AND date_don dans [début, fin)
+        Index("ix_don_deleted_at_date_don", "deleted_at", "date_don"),
+        # Recherche plein texte (MATCH ... AGAINST), MySQL uniquement
+        Index("ft_don_texte", "donateur", "type", "commentaire", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
 
     don_id = Column(Integer, primary_key=True, index=True)
     donateur = Column(String(255), nullable=False)  # ajout du champ donateur (nom du donateur)
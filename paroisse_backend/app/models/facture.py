@@ -1,7 +1,7 @@
 # app/models/facture.py
 
 from typing import Optional
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -9,6 +9,12 @@ from datetime import datetime
 
 class Facture(Base):
     __tablename__ = "Facture"
+    __table_args__ = (
+        # Liste paginée : filtre deleted_at puis parcours (date_facture, facture_id)
+        Index("ix_facture_deleted_at_date_facture", "deleted_at", "date_facture", "facture_id"),
+        # Recherche plein texte (MATCH ... AGAINST), MySQL uniquement
+        Index("ft_facture_texte", "numero", "description", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
 
     facture_id = Column(Integer, primary_key=True, index=True)
     numero = Column(String(100), nullable=False, unique=True)
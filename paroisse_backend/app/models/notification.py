@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Enum, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -14,6 +14,10 @@ class TypeNotificationEnum(str, enum.Enum):
 
 class Notification(Base):
     __tablename__ = "Notification"
+    __table_args__ = (
+        # Pagination par curseur : deleted_at IS NULL, tri (created_at, notification_id) décroissant
+        Index("ix_notification_deleted_at_created_at", "deleted_at", "created_at", "notification_id"),
+    )
 
     notification_id = Column(Integer, primary_key=True, index=True)
     titre = Column(String(255), nullable=False)
@@ -1,10 +1,16 @@
-from sqlalchemy import Column, Integer, String, Date, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Date, Float, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
 
 class Offrande(Base):
     __tablename__ = "Offrande"
+    __table_args__ = (
+        # Agrégats annuels : deleted_at IS NULL AND date dans [début, fin)
+        Index("ix_offrande_deleted_at_date", "deleted_at", "date"),
+        # Recherche plein texte (MATCH ... AGAINST), MySQL uniquement
+        Index("ft_offrande_texte", "type", "description", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
 
     offrande_id = Column(Integer, primary_key=True, index=True)
     date = Column(Date, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, DateTime
+from sqlalchemy import Boolean, Column, Integer, String, Date, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 from sqlalchemy.sql import func
@@ -6,6 +6,13 @@ from sqlalchemy.sql import func
 
 class Pret(Base):
     __tablename__ = "pret"
+    __table_args__ = (
+        # Pagination par curseur : deleted_at IS NULL, tri (date_pret, pret_id) décroissant
+        Index("ix_pret_deleted_at_date_pret", "deleted_at", "date_pret", "pret_id"),
+        # Chevauchements et calendrier de disponibilité par ressource
+        Index("ix_pret_materiel_periode", "materiel_id", "date_pret", "date_retour_prevue"),
+        Index("ix_pret_infrastructure_periode", "infrastructure_id", "date_pret", "date_retour_prevue"),
+    )
 
     pret_id = Column(Integer, primary_key=True, index=True)
     beneficiaire = Column(String(255), nullable=False)
@@ -26,3 +33,23 @@ class Pret(Base):
 
     materiel = relationship("Materiel", back_populates="prets")
     infrastructure = relationship("Infrastructure", back_populates="prets")
+    lignes = relationship("PretLigne", back_populates="pret", cascade="all, delete-orphan", lazy="selectin")
+
+
+class PretLigne(Base):
+    __tablename__ = "PretLigne"
+    __table_args__ = (
+        Index("ix_pret_ligne_materiel_id", "materiel_id", "pret_id"),
+    )
+
+    # Matériel prêté et quantité ; un prêt peut en compter plusieurs (ex. 40 chaises + 2 enceintes)
+    ligne_id = Column(Integer, primary_key=True, index=True)
+    pret_id = Column(Integer, ForeignKey("pret.pret_id"), nullable=False, index=True)
+    materiel_id = Column(Integer, ForeignKey("Materiel.materiel_id"), nullable=False)
+    quantite = Column(Integer, nullable=False, default=1)
+    # Sortie de stock écrite au début du prêt : à la création si date_pret est
+    # passée, sinon par la tâche quotidienne (app.crud.pret.sortir_prets_commences)
+    sortie_effectuee = Column(Boolean, nullable=False, default=False)
+
+    pret = relationship("Pret", back_populates="lignes")
+    materiel = relationship("Materiel")
@@ -1,10 +1,16 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
 
 class Quete(Base):
     __tablename__ = "Quete"
+    __table_args__ = (
+        # Agrégats annuels : deleted_at IS NULL AND date_quete dans [début, fin)
+        Index("ix_quete_deleted_at_date_quete", "deleted_at", "date_quete"),
+        # Recherche plein texte (MATCH ... AGAINST), MySQL uniquement
+        Index("ft_quete_texte", "libelle", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
 
     quete_id = Column(Integer, primary_key=True, index=True)
     libelle = Column(String(255), nullable=False)
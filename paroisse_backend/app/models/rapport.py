@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Date, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -12,6 +12,12 @@ class RapportTypeEnum(enum.Enum):
 
 class Rapport(Base):
     __tablename__ = "Rapport"
+    __table_args__ = (
+        # Pagination par curseur : deleted_at IS NULL, tri (date_rapport, rapport_id) décroissant
+        Index("ix_rapport_deleted_at_date_rapport", "deleted_at", "date_rapport", "rapport_id"),
+        # Recherche plein texte (MATCH ... AGAINST), MySQL uniquement
+        Index("ft_rapport_texte", "titre", "contenu", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
 
     rapport_id = Column(Integer, primary_key=True, index=True)
     titre = Column(String(255), nullable=False)
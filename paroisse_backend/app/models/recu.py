@@ -1,12 +1,23 @@
-from sqlalchemy import Column, Float, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Float, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
 
 class Recu(Base):
     __tablename__ = "Recu"
+    __table_args__ = (
+        # Pagination par curseur : deleted_at IS NULL, tri (date_emission, recu_id) décroissant
+        Index("ix_recu_deleted_at_date_emission", "deleted_at", "date_emission", "recu_id"),
+        # Recherche plein texte (MATCH ... AGAINST), MySQL uniquement
+        Index("ft_recu_texte", "description", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+        # Reçu d'une écriture donnée (don, offrande, quête, salaire)
+        Index("ix_recu_source", "source_type", "source_id"),
+    )
 
     recu_id = Column(Integer, primary_key=True, index=True)
+    numero = Column(String(20), nullable=True, unique=True)  # "R-2025-000042", séquence annuelle sans trou
+    source_type = Column(String(20), nullable=True)  # don, offrande, quete, salaire ; None pour un reçu manuel
+    source_id = Column(Integer, nullable=True)
     date_emission = Column(DateTime, default=func.now())
     montant = Column(Integer, nullable=False)
     description = Column(String(255), nullable=True)
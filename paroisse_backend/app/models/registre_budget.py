@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, UniqueConstraint
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class RegistreBudget(Base):
+    __tablename__ = "RegistreBudget"
+    __table_args__ = (
+        UniqueConstraint("annee", "intitule", name="uq_registre_budget_annee_intitule"),
+    )
+
+    registre_id = Column(Integer, primary_key=True, index=True)
+    annee = Column(Integer, nullable=False)
+    intitule = Column(String(100), nullable=False)  # don, offrande, quete, achat, salaire
+    montant = Column(Float, nullable=False, default=0.0)  # Solde courant, maintenu par deltas
+    version = Column(Integer, nullable=False, default=0)  # Incrémentée à chaque écriture (filigrane des rapports)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
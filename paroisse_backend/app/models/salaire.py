@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, Float, Date, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, Float, Date, ForeignKey, DateTime, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
 
 class Salaire(Base):
     __tablename__ = "Salaire"
+    __table_args__ = (
+        # Agrégats annuels : deleted_at IS NULL AND date_paiement dans [début, fin)
+        Index("ix_salaire_deleted_at_date_paiement", "deleted_at", "date_paiement"),
+    )
 
     salaire_id = Column(Integer, primary_key=True, index=True)
     employe_id = Column(Integer, ForeignKey("Employe.employe_id"), nullable=False)
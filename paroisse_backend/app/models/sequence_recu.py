@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class SequenceRecu(Base):
+    __tablename__ = "SequenceRecu"
+
+    # Dernier numéro de reçu attribué pour l'année. Incrémenté dans la
+    # transaction qui crée les reçus : un rollback rend aussi les numéros.
+    annee = Column(Integer, primary_key=True, autoincrement=False)
+    dernier_numero = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, ForeignKey, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class StockCourant(Base):
+    __tablename__ = "StockCourant"
+
+    # Quantité disponible par matériel, maintenue par deltas à chaque mouvement
+    # (entrées - sorties) dans la même transaction que le mouvement lui-même.
+    materiel_id = Column(Integer, ForeignKey("Materiel.materiel_id"), primary_key=True)
+    quantite = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
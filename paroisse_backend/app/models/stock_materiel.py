@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, Enum, String
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Enum, String, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -10,6 +10,10 @@ class TypeMouvementStockEnum(str, enum.Enum):
 
 class StockMateriel(Base):
     __tablename__ = "StockMateriel"
+    __table_args__ = (
+        # Historique paginé : parcours (date_mouvement, stock_id) décroissant
+        Index("ix_stockmateriel_date_mouvement", "date_mouvement", "stock_id"),
+    )
 
     stock_id = Column(Integer, primary_key=True, index=True)
     materiel_id = Column(Integer, ForeignKey("Materiel.materiel_id"), nullable=False)
@@ -0,0 +1,26 @@
+# numeroter_recus.py
+#
+# Attribue un numéro annuel (R-AAAA-NNNNNN) aux reçus créés avant la
+# numérotation et renseigne leur source quand la description le permet.
+# À lancer une fois, au déploiement :
+#   python -m app.numeroter_recus
+
+from app.database import SessionLocal
+from app.utils.recu import numeroter_recus_existants
+
+
+def numeroter_recus():
+    db = SessionLocal()
+    try:
+        nombre = numeroter_recus_existants(db)
+        print(f"{nombre} reçu(s) numéroté(s)." if nombre else "Tous les reçus sont déjà numérotés.")
+        return nombre
+    except Exception as e:
+        db.rollback()
+        print(f"Erreur lors de la numérotation des reçus : {e}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    numeroter_recus()
@@ -0,0 +1,38 @@
+# reconcilier_budget.py
+#
+# Reconstruit le registre budgétaire depuis les tables sources et affiche les écarts.
+#   python -m app.reconcilier_budget            -> toutes les années, corrige
+#   python -m app.reconcilier_budget 2025       -> une année
+#   python -m app.reconcilier_budget --dry-run  -> rapport seul
+
+import sys
+
+from app.database import SessionLocal
+from app.utils.budget import reconcilier_registre_budget
+
+
+def reconcilier_budget(annee=None, corriger=True):
+    db = SessionLocal()
+    try:
+        ecarts = reconcilier_registre_budget(db, annee=annee, corriger=corriger)
+        if not ecarts:
+            print("Registre budgétaire cohérent : aucun écart.")
+            return ecarts
+
+        for e in ecarts:
+            registre = "absent" if e["registre"] is None else f"{e['registre']:.2f}"
+            print(f"{e['annee']} {e['intitule']:<10} registre={registre} reel={e['reel']:.2f} ecart={e['ecart']:+.2f}")
+        print(f"{len(ecarts)} écart(s) {'corrigé(s)' if corriger else 'détecté(s)'}.")
+        return ecarts
+    except Exception as e:
+        db.rollback()
+        print(f"Erreur lors de la réconciliation du budget : {e}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    dry_run = "--dry-run" in args
+    annees = [int(a) for a in args if a.isdigit()]
+    reconcilier_budget(annee=annees[0] if annees else None, corriger=not dry_run)
@@ -0,0 +1,34 @@
+# reconcilier_stock.py
+#
+# Reconstruit le stock courant depuis l'historique des mouvements et affiche les écarts.
+#   python -m app.reconcilier_stock            -> corrige
+#   python -m app.reconcilier_stock --dry-run  -> rapport seul
+
+import sys
+
+from app.database import SessionLocal
+from app.crud.stock_materiel import reconcilier_stock_courant
+
+
+def reconcilier_stock(corriger=True):
+    db = SessionLocal()
+    try:
+        ecarts = reconcilier_stock_courant(db, corriger=corriger)
+        if not ecarts:
+            print("Stock courant cohérent : aucun écart.")
+            return ecarts
+
+        for e in ecarts:
+            stock = "absent" if e["stock_courant"] is None else e["stock_courant"]
+            print(f"materiel {e['materiel_id']:<6} stock_courant={stock} reel={e['reel']} ecart={e['ecart']:+d}")
+        print(f"{len(ecarts)} écart(s) {'corrigé(s)' if corriger else 'détecté(s)'}.")
+        return ecarts
+    except Exception as e:
+        db.rollback()
+        print(f"Erreur lors de la réconciliation du stock : {e}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    reconcilier_stock(corriger="--dry-run" not in sys.argv[1:])
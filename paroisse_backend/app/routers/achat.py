@@ -1,5 +1,5 @@
 from datetime import date
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
@@ -8,6 +8,8 @@ from app.schemas.achat import AchatCreate, AchatUpdate, AchatOut
 from app.crud import achat as crud
 from app.permissions.achat import ALLOWED_ROLES
 from app.utils.security import get_current_user
+from app.utils.pagination import Pagination, parametres_pagination, page
+from app.utils.totaux import total_montant, exposer_total
 
 router = APIRouter()
 
@@ -32,16 +34,20 @@ async def create(
 
 @router.get("/", response_model=List[AchatOut])
 async def list_all(
+    response: Response,
     db: Session = Depends(get_db),
     include_deleted: bool = False,
+    pagination: Pagination = Depends(parametres_pagination),
     current_user=Depends(get_current_user)
 ):
     check_role(current_user, ALLOWED_ROLES)
-    return crud.get_achats(db, include_deleted)
+    exposer_total(response, total_montant(db, "achat", include_deleted=include_deleted))
+    return page(response, *crud.get_achats(db, include_deleted, pagination.curseur, pagination.limite))
 
 
 @router.get("/search", response_model=List[AchatOut])
 async def search_achats_route(
+    response: Response,
     libelle: Optional[str] = Query(None, description="Libellé de l'achat"),
     date_achat: Optional[date] = Query(None, description="Date exacte de l'achat"),
     fournisseur: Optional[str] = Query(None, description="Nom du fournisseur"),
@@ -52,7 +58,7 @@ async def search_achats_route(
 ):
     check_role(current_user, ALLOWED_ROLES)
 
-    return crud.search_achats(
+    achats = crud.search_achats(
         db=db,
         libelle=libelle,
         date_achat=date_achat,
@@ -60,15 +66,21 @@ async def search_achats_route(
         montant_min=montant_min,
         montant_max=montant_max
     )
+    # Total des résultats filtrés : calculé sur les lignes déjà chargées
+    exposer_total(response, sum(a.montant for a in achats))
+    return achats
 
 
 @router.get("/supprimes", response_model=List[AchatOut])
 def lire_achats_supprimes(
+    response: Response,
     db: Session = Depends(get_db),
+    pagination: Pagination = Depends(parametres_pagination),
     current_user=Depends(get_current_user)
 ):
     check_role(current_user, ALLOWED_ROLES)
-    return crud.get_achats(db, include_deleted=True)
+    exposer_total(response, total_montant(db, "achat", include_deleted=True))
+    return page(response, *crud.get_achats(db, True, pagination.curseur, pagination.limite))
 
 
 @router.get("/{achat_id}", response_model=AchatOut)
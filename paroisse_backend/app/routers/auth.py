@@ -1,22 +1,41 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordRequestForm
 
 from app.database import get_db
 from app.models.utilisateur import Utilisateur
-from app.utils.security import verify_password, create_access_token
+from app.utils.security import verify_and_update_password_async, create_access_token
 
 router = APIRouter(prefix="/auth", tags=["Authentification"])
 
-@router.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(Utilisateur).filter(
-        Utilisateur.email == form_data.username,
+
+def _get_utilisateur_actif(db: Session, email: str):
+    return db.query(Utilisateur).filter(
+        Utilisateur.email == email,
         Utilisateur.deleted_at.is_(None)
     ).first()
 
-    if not user or not verify_password(form_data.password, user.mot_de_passe):
+
+def _maj_mot_de_passe(db: Session, user: Utilisateur, nouveau_hash: str):
+    user.mot_de_passe = nouveau_hash
+    db.commit()
+
+
+@router.post("/login")
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    # Les accès base restent synchrones : ils sont exécutés hors de la boucle d'événements
+    user = await run_in_threadpool(_get_utilisateur_actif, db, form_data.username)
+    if not user:
+        raise HTTPException(status_code=401, detail="Identifiants invalides")
+
+    valide, nouveau_hash = await verify_and_update_password_async(form_data.password, user.mot_de_passe)
+    if not valide:
         raise HTTPException(status_code=401, detail="Identifiants invalides")
 
+    # Hash calculé avec un ancien coût bcrypt : on le remplace à la volée
+    if nouveau_hash:
+        await run_in_threadpool(_maj_mot_de_passe, db, user, nouveau_hash)
+
     access_token = create_access_token(data={"sub": str(user.utilisateur_id)})
     return {"access_token": access_token, "token_type": "bearer"}
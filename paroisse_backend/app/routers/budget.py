@@ -5,6 +5,7 @@ from app.database import get_db
 from app.schemas.budget import BudgetCreate, BudgetOut, BudgetUpdate
 from app.crud import budget as crud_budget
 from app.crud.budget import verifier_solde_et_notifier
+from app.utils.budget import reconcilier_registre_budget
 from app.database import SessionLocal
 from app.permissions.budget import ALLOWED_ROLES
 from app.utils.security import get_current_user
@@ -82,8 +83,18 @@ async def get_solde_annuel(
     current_user=Depends(get_current_user)
 ):
     check_role(current_user, ALLOWED_ROLES)
-    solde = verifier_solde_et_notifier(annee=annee, db=db)
-    return {"annee": annee, "solde": solde}
+    return verifier_solde_et_notifier(annee=annee, db=db)
+
+@router.post("/reconcilier")
+async def reconcilier_registre(
+    annee: Optional[int] = None,
+    corriger: bool = True,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    check_role(current_user, ALLOWED_ROLES)
+    ecarts = reconcilier_registre_budget(db, annee=annee, corriger=corriger)
+    return {"annee": annee, "corrige": corriger, "ecarts": ecarts}
 
 @router.put("/{budget_id}", response_model=BudgetOut)
 async def update(
@@ -1,19 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from typing import List
-from sqlalchemy import func
-from datetime import datetime
 
 from app.database import get_db
-from app.models.don import Don
 from app.schemas.don import DonCreate, DonUpdate, DonOut
 from app.crud import don as crud_don
 from app.permissions.don import ALLOWED_ROLES
 from app.utils.security import get_current_user
-from app.models.notification import Notification, TypeNotificationEnum
-from app.schemas.recu import RecuCreate
-from app.crud.recu import create_recu
-from app.utils.budget import update_budget_reel, verifier_solde_disponible
+from app.utils.totaux import total_montant, exposer_total
+from app.utils.pagination import Pagination, parametres_pagination, page
 
 router = APIRouter()
 
@@ -35,42 +30,10 @@ async def create_don(
     check_role(current_user, ALLOWED_ROLES)
 
     try:
-        # Création du don
+        # Don, reçu, budget et notification : une seule transaction
         db_don = crud_don.create_don(db, don, utilisateur_id=current_user.utilisateur_id)
 
-        # Création automatique du reçu
-        recu_data = RecuCreate(
-            montant=don.montant,
-            description=f"Don reçu : {don.montant} FCFA",
-            date_emission=datetime.utcnow(),
-            utilisateur_id=current_user.utilisateur_id
-        )
-        create_recu(db, recu_data)
-
-        # Mise à jour du budget réel
-        update_budget_reel(
-            db,
-            annee=db_don.date_don.year,
-            intitule="Don",
-            utilisateur_id=current_user.utilisateur_id
-        )
-
-        # Notification succès
-        notif = Notification(
-            titre="Don enregistré",
-            message=f"Don de {don.montant} FCFA ajouté avec succès.",
-            type=TypeNotificationEnum.success,
-            utilisateur_id=current_user.utilisateur_id,
-            created_at=datetime.utcnow()
-        )
-        db.add(notif)
-        db.commit()
-        db.refresh(db_don)
-
-        # Calcul du montant total des dons actifs
-        montant_total = db.query(func.coalesce(func.sum(Don.montant), 0))\
-            .filter(Don.deleted_at == None).scalar()
-        db_don.montant_total = montant_total or 0.0
+        db_don.montant_total = total_montant(db, "don")
 
         return DonOut.from_orm(db_don)
 
@@ -82,14 +45,15 @@ async def create_don(
 # ✅ Liste paginée des dons
 @router.get("/", response_model=List[DonOut])
 async def list_dons(
-    skip: int = 0,
-    limit: int = 10,
+    response: Response,
     include_deleted: bool = False,
+    pagination: Pagination = Depends(parametres_pagination),
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
     check_role(current_user, ALLOWED_ROLES)
-    return crud_don.get_dons(db, skip=skip, limit=limit, include_deleted=include_deleted)
+    exposer_total(response, total_montant(db, "don", include_deleted=include_deleted))
+    return page(response, *crud_don.get_dons(db, include_deleted, pagination.curseur, pagination.limite))
 
 
 # ✅ Récupérer un don par ID
@@ -107,7 +71,7 @@ async def get_don(
     return don
 
 
-# ✅ Mise à jour d’un don avec budget
+# ✅ Mise à jour d’un don (budget mis à jour par le CRUD)
 @router.put("/{don_id}", response_model=DonOut)
 async def update_don(
     don_id: int,
@@ -120,23 +84,12 @@ async def update_don(
     if not don:
         raise HTTPException(status_code=404, detail="Don non trouvé ou supprimé")
 
-    # Mise à jour du budget réel après modification
-    update_budget_reel(
-        db,
-        annee=don.date_don.year,
-        intitule="Don",
-        utilisateur_id=current_user.utilisateur_id
-    )
-
-    # Recalcul du montant total des dons actifs
-    montant_total = db.query(func.coalesce(func.sum(Don.montant), 0))\
-        .filter(Don.deleted_at == None).scalar()
-    don.montant_total = montant_total or 0.0
+    don.montant_total = total_montant(db, "don")
 
     return DonOut.from_orm(don)
 
 
-# ✅ Suppression logique (soft delete) avec mise à jour budget
+# ✅ Suppression logique (soft delete), budget mis à jour par le CRUD
 @router.delete("/{don_id}")
 async def soft_delete_don(
     don_id: int,
@@ -148,14 +101,6 @@ async def soft_delete_don(
     if not don:
         raise HTTPException(status_code=404, detail="Don non trouvé")
 
-    # Mise à jour du budget réel
-    update_budget_reel(
-        db,
-        annee=don.date_don.year,
-        intitule="Don",
-        utilisateur_id=current_user.utilisateur_id
-    )
-
     return {"message": "Don mis dans la corbeille"}
 
 
@@ -171,14 +116,6 @@ async def restore_don(
     if not don:
         raise HTTPException(status_code=404, detail="Don non trouvé ou pas supprimé")
 
-    # Mise à jour du budget réel
-    update_budget_reel(
-        db,
-        annee=don.date_don.year,
-        intitule="Don",
-        utilisateur_id=current_user.utilisateur_id
-    )
-
     return {"message": "Don restauré"}
 
 
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 from typing import List
 from app.database import get_db
@@ -7,6 +7,9 @@ from app.crud import facture as crud_facture
 from app.database import SessionLocal
 from app.utils.security import get_current_user
 from app.permissions.facture import ALLOWED_ROLES
+from app.utils.totaux import total_montant, exposer_total
+from app.utils.pagination import Pagination, parametres_pagination, page
+from app.utils.documents_pdf import document_facture, nom_fichier_pdf, reponse_documents_pdf
 
 router = APIRouter()
 
@@ -26,19 +29,23 @@ async def create_facture(
     current_user=Depends(get_current_user)
 ):
     check_role(current_user, ALLOWED_ROLES)
-    return crud_facture.create_facture(db, facture)
+    db_facture = crud_facture.create_facture(db, facture)
+    db.commit()
+    db.refresh(db_facture)
+    return db_facture
 
 
 @router.get("/", response_model=List[FactureOut])
 async def list_factures(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
     include_deleted: bool = False,
+    pagination: Pagination = Depends(parametres_pagination),
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
     check_role(current_user, ALLOWED_ROLES)
-    return crud_facture.get_factures(db, include_deleted=include_deleted, skip=skip, limit=limit)
+    exposer_total(response, total_montant(db, "facture", include_deleted=include_deleted))
+    return page(response, *crud_facture.get_factures(db, include_deleted, pagination.curseur, pagination.limite))
 
 
 @router.get("/search/", response_model=List[FactureOut])
@@ -52,19 +59,7 @@ async def search_factures(
 ):
     check_role(current_user, ALLOWED_ROLES)
 
-    q = db.query(crud_facture.Facture)
-    if not include_deleted:
-        q = q.filter(crud_facture.Facture.deleted_at == None)
-
-    search_filter = (
-        crud_facture.Facture.numero.ilike(f"%{query}%") |
-        crud_facture.Facture.description.ilike(f"%{query}%")
-    )
-    q = q.filter(search_filter)
-    q = q.order_by(crud_facture.Facture.date_facture.desc())
-    factures = q.offset(skip).limit(limit).all()
-
-    return factures
+    return crud_facture.search_factures(db, query, include_deleted, skip, limit)
 
 
 @router.get("/factures/{facture_id}", response_model=FactureOut)
@@ -81,6 +76,22 @@ async def get_facture(
     return facture
 
 
+@router.get("/{facture_id}/pdf")
+def imprimer_facture(
+    facture_id: int,
+    include_deleted: bool = False,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    check_role(current_user, ALLOWED_ROLES)
+    facture = crud_facture.get_facture(db, facture_id, include_deleted=include_deleted)
+    if not facture:
+        raise HTTPException(status_code=404, detail="Facture non trouvée")
+    return reponse_documents_pdf(
+        [document_facture(facture)], nom_fichier_pdf("facture", facture.numero), titre=f"Facture {facture.numero}"
+    )
+
+
 @router.put("/factures/{facture_id}", response_model=FactureOut)
 async def update_facture(
     facture_id: int,
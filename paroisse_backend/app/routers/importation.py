@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.schemas.importation import EntiteImportEnum, ResultatImport
+from app.utils.security import get_current_user
+from app.utils.importation import importer_ecritures, lire_lignes
+from app.permissions.don import ALLOWED_ROLES as ALLOWED_ROLES_DON
+from app.permissions.offrande import ALLOWED_ROLES as ALLOWED_ROLES_OFFRANDE
+from app.permissions.quete import ALLOWED_ROLES as ALLOWED_ROLES_QUETE
+
+router = APIRouter()
+
+# Mêmes droits que la création unitaire de chaque entité
+ROLES_PAR_ENTITE = {
+    EntiteImportEnum.don: ALLOWED_ROLES_DON,
+    EntiteImportEnum.offrande: ALLOWED_ROLES_OFFRANDE,
+    EntiteImportEnum.quete: ALLOWED_ROLES_QUETE,
+}
+
+
+def check_role(user, allowed_roles):
+    if user.role not in allowed_roles:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Accès refusé : rôle non autorisé"
+        )
+
+
+# ========================
+# ✅ Import CSV / XLSX de registres historiques
+# ========================
+@router.post("/import/{entite}", response_model=ResultatImport)
+def importer(
+    entite: EntiteImportEnum,
+    fichier: UploadFile = File(..., description="Fichier .csv (UTF-8, séparateur , ou ;) ou .xlsx"),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    check_role(current_user, ROLES_PAR_ENTITE[entite])
+
+    nom = (fichier.filename or "").lower()
+    if not nom.endswith((".csv", ".xlsx")):
+        raise HTTPException(status_code=400, detail="Format non supporté : fichier .csv ou .xlsx attendu")
+
+    try:
+        resultat = ResultatImport(**importer_ecritures(
+            db, entite.value, lire_lignes(fichier.file, nom), utilisateur_id=current_user.utilisateur_id
+        ))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Erreur import {entite.value} : {str(e)}")
+
+    # Tout ou rien : les erreurs par ligne sont renvoyées avec un 400
+    if not resultat.enregistre:
+        raise HTTPException(status_code=400, detail=resultat.model_dump(mode="json"))
+    return resultat
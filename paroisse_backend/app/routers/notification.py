@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Response, status, BackgroundTasks
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
@@ -7,6 +7,7 @@ from app.schemas.notification import NotificationCreate, NotificationOut
 from app.crud import notification as crud_notification
 from app.utils.security import get_current_user
 from app.permissions.notification import ALLOWED_ROLES
+from app.utils.pagination import Pagination, parametres_pagination, page
 
 router = APIRouter()
 
@@ -31,12 +32,16 @@ async def creer_notification(
 # ✅ Lister les notifications (avec filtrage facultatif par utilisateur)
 @router.get("/", response_model=List[NotificationOut])
 async def lister_notifications(
+    response: Response,
     utilisateur_id: Optional[int] = None,
+    pagination: Pagination = Depends(parametres_pagination),
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
     check_role(current_user, ALLOWED_ROLES)
-    return crud_notification.get_notifications(db, utilisateur_id)
+    return page(response, *crud_notification.get_notifications(
+        db, utilisateur_id, pagination.curseur, pagination.limite
+    ))
 
 # ✅ Marquer une notification comme lue
 @router.put("/{notification_id}/lu", response_model=NotificationOut)
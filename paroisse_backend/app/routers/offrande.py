@@ -1,19 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from typing import List
-from sqlalchemy import func
 from datetime import datetime
 
 from app.database import get_db
-from app.models.offrande import Offrande
 from app.schemas.offrande import OffrandeCreate, OffrandeUpdate, OffrandeOut
 from app.crud import offrande as crud_offrande
 from app.permissions.offrande import ALLOWED_ROLES
 from app.utils.security import get_current_user
-from app.models.notification import Notification, TypeNotificationEnum
-from app.schemas.recu import RecuCreate
-from app.crud.recu import create_recu
-from app.utils.budget import update_budget_reel
+from app.utils.totaux import total_montant, exposer_total
+from app.utils.pagination import Pagination, parametres_pagination, page
 
 router = APIRouter()
 
@@ -53,39 +49,7 @@ async def create_offrande(
             db, offrande, utilisateur_id=current_user.utilisateur_id
         )
 
-        # Création automatique du reçu
-        recu_data = RecuCreate(
-            montant=offrande.montant,
-            description=f"Offrande reçue : {offrande.montant} FCFA",
-            date_emission=datetime.utcnow(),
-            utilisateur_id=current_user.utilisateur_id
-        )
-        create_recu(db, recu_data)
-
-        # Mise à jour du budget réel
-        update_budget_reel(
-            db,
-            annee=db_offrande.date_offrande.year,
-            intitule="Offrande",
-            utilisateur_id=current_user.utilisateur_id
-        )
-
-        # Notification succès
-        notif = Notification(
-            titre="Offrande enregistrée",
-            message=f"Offrande de {offrande.montant} FCFA ajoutée avec succès.",
-            type=TypeNotificationEnum.success,
-            utilisateur_id=current_user.utilisateur_id,
-            created_at=datetime.utcnow()
-        )
-        db.add(notif)
-        db.commit()
-        db.refresh(db_offrande)
-
-        # Recalcul du montant total
-        montant_total = db.query(func.coalesce(func.sum(Offrande.montant), 0))\
-            .filter(Offrande.deleted_at == None).scalar()
-        db_offrande.montant_total = montant_total or 0.0
+        db_offrande.montant_total = total_montant(db, "offrande")
 
         return OffrandeOut.from_orm(db_offrande)
     
@@ -101,14 +65,15 @@ async def create_offrande(
 # ========================
 @router.get("/", response_model=List[OffrandeOut])
 async def list_offrandes(
-    skip: int = 0,
-    limit: int = 10,
+    response: Response,
     include_deleted: bool = False,
+    pagination: Pagination = Depends(parametres_pagination),
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
     check_role(current_user, ALLOWED_ROLES)
-    return crud_offrande.get_offrandes(db, skip=skip, limit=limit, include_deleted=include_deleted)
+    exposer_total(response, total_montant(db, "offrande", include_deleted=include_deleted))
+    return page(response, *crud_offrande.get_offrandes(db, include_deleted, pagination.curseur, pagination.limite))
 
 # ========================
 # ✅ Récupérer une offrande par ID
@@ -125,11 +90,6 @@ async def get_offrande(
     if not offrande:
         raise HTTPException(status_code=404, detail="Offrande non trouvée")
 
-    # Recalcul dynamique du montant total
-    montant_total = db.query(func.coalesce(func.sum(Offrande.montant), 0))\
-        .filter(Offrande.deleted_at == None).scalar()
-    offrande.montant_total = montant_total or 0.0
-
     return OffrandeOut.from_orm(offrande)
 
 # ========================
@@ -157,20 +117,10 @@ async def update_offrande(
         if not db_offrande:
             raise HTTPException(status_code=404, detail="Offrande non trouvée ou supprimée")
 
-        update_budget_reel(
-            db,
-            annee=db_offrande.date_offrande.year,
-            intitule="Offrande",
-            utilisateur_id=current_user.utilisateur_id
-        )
-
         db.commit()
         db.refresh(db_offrande)
 
-        # Recalcul du montant total
-        montant_total = db.query(func.coalesce(func.sum(Offrande.montant), 0))\
-            .filter(Offrande.deleted_at == None).scalar()
-        db_offrande.montant_total = montant_total or 0.0
+        db_offrande.montant_total = total_montant(db, "offrande")
 
         return OffrandeOut.from_orm(db_offrande)
     except Exception as e:
@@ -213,10 +163,12 @@ async def restore_offrande(
 # ========================
 @router.get("/search/", response_model=List[OffrandeOut])
 async def search_offrandes(
+    response: Response,
     q: str,
     include_deleted: bool = False,
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
     check_role(current_user, ALLOWED_ROLES)
+    exposer_total(response, total_montant(db, "offrande", include_deleted=include_deleted))
     return crud_offrande.search_offrandes(db, q, include_deleted)
@@ -1,12 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import date, timedelta
 
 from app.permissions.pret import ALLOWED_ROLES
-from app.schemas.pret import PretCreate, PretUpdate, PretOut
+from app.schemas.pret import PretCreate, PretUpdate, PretOut, DisponibiliteOut
+from app.models.materiel import Materiel
+from app.models.infrastructure import Infrastructure
 from app.crud import pret as crud_pret
 from app.database import get_db
 from app.utils.security import get_current_user
+from app.utils.pagination import Pagination, parametres_pagination, page
+from app.utils.disponibilite import calendrier_disponibilite
 
 router = APIRouter(prefix="/prets", tags=["Prêts"])
 
@@ -27,20 +32,65 @@ def create_pret(
 ):
     check_role(current_user, ALLOWED_ROLES)
 
-    if not pret.materiel_id and not pret.infrastructure_id:
+    if not pret.materiel_id and not pret.infrastructure_id and not pret.lignes:
         raise HTTPException(status_code=400, detail="Un prêt doit concerner soit un matériel, soit une infrastructure.")
 
-    return crud_pret.create_pret(db, pret)
+    try:
+        return crud_pret.create_pret(db, pret)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/", response_model=List[PretOut])
 def list_prets(
+    response: Response,
     db: Session = Depends(get_db),
     include_deleted: bool = False,
+    pagination: Pagination = Depends(parametres_pagination),
     current_user=Depends(get_current_user)
 ):
     check_role(current_user, ALLOWED_ROLES)
-    return crud_pret.get_prets(db, include_deleted)
+    return page(response, *crud_pret.get_prets(db, include_deleted, pagination.curseur, pagination.limite))
+
+
+PERIODE_MAX_JOURS = 366
+
+# Déclarée avant /{pret_id} pour ne pas être capturée par la route dynamique
+@router.get("/disponibilite", response_model=DisponibiliteOut)
+def get_disponibilite(
+    materiel_id: Optional[int] = None,
+    infrastructure_id: Optional[int] = None,
+    debut: Optional[date] = Query(None, description="Début de la période (défaut : aujourd'hui)"),
+    fin: Optional[date] = Query(None, description="Fin de la période, incluse (défaut : début + 30 jours)"),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    check_role(current_user, ALLOWED_ROLES)
+
+    if (materiel_id is None) == (infrastructure_id is None):
+        raise HTTPException(status_code=400, detail="Indiquez soit materiel_id, soit infrastructure_id.")
+
+    debut = debut or date.today()
+    fin = fin or debut + timedelta(days=30)
+    if fin < debut:
+        raise HTTPException(status_code=400, detail="La fin de période doit suivre son début.")
+    if (fin - debut).days > PERIODE_MAX_JOURS:
+        raise HTTPException(status_code=400, detail=f"Période limitée à {PERIODE_MAX_JOURS} jours.")
+
+    if materiel_id is not None:
+        ressource, ressource_id = "materiel", materiel_id
+        existe = db.query(Materiel.materiel_id).filter(Materiel.materiel_id == materiel_id, Materiel.deleted_at == None).first()
+    else:
+        ressource, ressource_id = "infrastructure", infrastructure_id
+        existe = db.query(Infrastructure.infrastructure_id).filter(
+            Infrastructure.infrastructure_id == infrastructure_id, Infrastructure.deleted_at == None
+        ).first()
+    if not existe:
+        raise HTTPException(status_code=404, detail="Ressource non trouvée")
+
+    return calendrier_disponibilite(db, ressource, ressource_id, debut, fin)
 
 
 @router.get("/{pret_id}", response_model=PretOut)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from typing import List
 
@@ -7,6 +7,8 @@ from app.crud import quete as crud_quete
 from app.database import get_db
 from app.utils.security import get_current_user
 from app.permissions.quete import ALLOWED_ROLES
+from app.utils.totaux import total_montant, exposer_total
+from app.utils.pagination import Pagination, parametres_pagination, page
 
 router = APIRouter()
 
@@ -42,14 +44,15 @@ async def create_quete(
 # ========================
 @router.get("/", response_model=List[QueteOut])
 async def list_quetes(
-    skip: int = 0,
-    limit: int = 10,
+    response: Response,
     include_deleted: bool = False,
+    pagination: Pagination = Depends(parametres_pagination),
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
     check_role(current_user, ALLOWED_ROLES)
-    return crud_quete.get_quetes(db, skip=skip, limit=limit, include_deleted=include_deleted)
+    exposer_total(response, total_montant(db, "quete", include_deleted=include_deleted))
+    return page(response, *crud_quete.get_quetes(db, include_deleted, pagination.curseur, pagination.limite))
 
 
 # ========================
@@ -130,10 +133,12 @@ async def restore_quete(
 # ========================
 @router.get("/search/", response_model=List[QueteOut])
 async def search_quetes(
+    response: Response,
     q: str,
     include_deleted: bool = False,
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
     check_role(current_user, ALLOWED_ROLES)
+    exposer_total(response, total_montant(db, "quete", include_deleted=include_deleted))
     return crud_quete.search_quetes(db, q, include_deleted)
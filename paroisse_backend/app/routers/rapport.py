@@ -1,16 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import FileResponse
+import os
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from fastapi.responses import FileResponse
-from reportlab.pdfgen import canvas
-from openpyxl import Workbook
-import tempfile
 from datetime import datetime
 
-from app.schemas.rapport import RapportCreate, RapportUpdate, RapportOut
+from app.schemas.rapport import RapportCreate, RapportUpdate, RapportOut, RapportJobCreate, RapportJobOut
 from app.crud import rapport as crud_rapport
 from app.database import get_db
 from app.utils.security import get_current_user
+from app.utils.rapport_pdf import reponse_pdf
+from app.utils.rapport_excel import classeur, ajouter_feuille, reponse_excel
+from app.utils import rapport_jobs
+from app.utils.pagination import Pagination, parametres_pagination, page
+from app.utils.rapport_rendu import (
+    blocs_financier, blocs_administratif, blocs_materiel, blocs_audit,
+    remplir_classeur_financier, remplir_classeur_administratif,
+    remplir_classeur_audit, remplir_classeur_materiel
+)
 
 from app.permissions.rapport import (
     ALLOWED_ROLES_FINANCIER,
@@ -29,12 +36,14 @@ def check_role(user, allowed_roles):
 
 @router.get("/", response_model=List[RapportOut])
 def list_rapports(
+    response: Response,
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user),
-    include_deleted: bool = False
+    include_deleted: bool = False,
+    pagination: Pagination = Depends(parametres_pagination)
 ):
     check_role(current_user, ALLOWED_ROLES_FINANCIER | ALLOWED_ROLES_ADMINISTRATIF | ALLOWED_ROLES_AUDIT | ALLOWED_ROLES_MATERIEL)
-    return crud_rapport.get_rapports(db, include_deleted=include_deleted)
+    return page(response, *crud_rapport.get_rapports(db, include_deleted, pagination.curseur, pagination.limite))
 
 @router.get("/{rapport_id}", response_model=RapportOut)
 def get_rapport(
@@ -151,31 +160,12 @@ def export_pdf_financier(
 ):
     check_role(current_user, ALLOWED_ROLES_FINANCIER)
     data = crud_rapport.generer_rapport_financier_annuel(db, annee, current_user.utilisateur_id)
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        c = canvas.Canvas(tmp.name)
-        c.setFont("Helvetica", 14)
-        c.drawString(100, 800, f"Rapport Budgétaire - Année {annee}")
-        y = 780
-        for section, content in data.items():
-            if isinstance(content, dict):
-                c.drawString(100, y, f"{section.capitalize()}:")
-                y -= 20
-                for key, val in content.items():
-                    if isinstance(val, dict):
-                        c.drawString(120, y, f"{key.capitalize()}:")
-                        y -= 15
-                        for k2, v2 in val.items():
-                            c.drawString(140, y, f"{k2}: {v2}")
-                            y -= 15
-                    else:
-                        c.drawString(120, y, f"{key}: {val}")
-                        y -= 15
-            else:
-                c.drawString(100, y, f"{section}: {content}")
-                y -= 20
-        c.save()
-        tmp_path = tmp.name
-    return FileResponse(tmp_path, filename=f"rapport_budget_{annee}.pdf", media_type="application/pdf")
+    return reponse_pdf(
+        f"Rapport Budgétaire - Année {annee}",
+        blocs_financier(data),
+        f"rapport_budget_{annee}.pdf"
+    )
+
 
 @router.get("/export-excel/{annee}")
 def export_excel_financier(
@@ -185,24 +175,28 @@ def export_excel_financier(
 ):
     check_role(current_user, ALLOWED_ROLES_FINANCIER)
     data = crud_rapport.generer_rapport_financier_annuel(db, annee, current_user.utilisateur_id)
-    wb = Workbook()
-    ws = wb.active
-    ws.title = f"Budget {annee}"
-    ws.append(["Catégorie", "Montant (FCFA)"])
-    ws.append(["Recettes totales", data["recettes"]["total"]])
-    for k, v in data["recettes"]["details"].items():
-        ws.append([f"  {k.capitalize()}", v])
-    ws.append(["Dépenses totales", data["depenses"]["total"]])
-    for k, v in data["depenses"]["details"].items():
-        ws.append([f"  {k.capitalize()}", v])
-    ws.append(["Budget prévisionnel", data["budget"]["previsionnel"]])
-    ws.append(["Budget réel", data["budget"]["reel"]])
-    ws.append(["Écart", data["budget"]["ecart"]])
-    ws.append(["Solde", data["solde"]])
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp:
-        wb.save(tmp.name)
-        tmp_path = tmp.name
-    return FileResponse(tmp_path, filename=f"rapport_budget_{annee}.xlsx", media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+    wb = classeur()
+    remplir_classeur_financier(wb, data, annee)
+    return reponse_excel(wb, f"rapport_budget_{annee}.xlsx")
+
+
+@router.get("/grand-livre/export-excel")
+def export_excel_grand_livre(
+    annee_debut: int,
+    annee_fin: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    check_role(current_user, ALLOWED_ROLES_FINANCIER)
+    annee_fin = annee_fin or annee_debut
+    if annee_fin < annee_debut:
+        raise HTTPException(status_code=400, detail="annee_fin doit être postérieure à annee_debut.")
+
+    wb = classeur()
+    for titre, entetes, lignes in crud_rapport.iterer_grand_livre(db, annee_debut, annee_fin):
+        ajouter_feuille(wb, titre, lignes, entetes)
+    suffixe = annee_debut if annee_fin == annee_debut else f"{annee_debut}_{annee_fin}"
+    return reponse_excel(wb, f"grand_livre_{suffixe}.xlsx")
 
 @router.get("/administratif/export-pdf")
 def export_pdf_rapport_administratif(
@@ -213,40 +207,8 @@ def export_pdf_rapport_administratif(
 ):
     check_role(current_user, ALLOWED_ROLES_ADMINISTRATIF)
     data = crud_rapport.generer_rapport_administratif(db, date_debut, date_fin)
+    return reponse_pdf("Rapport Administratif", blocs_administratif(data), "rapport_administratif.pdf")
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        c = canvas.Canvas(tmp.name)
-        c.setFont("Helvetica-Bold", 16)
-        c.drawString(100, 800, "Rapport Administratif")
-        y = 780
-
-        c.setFont("Helvetica", 12)
-        c.drawString(100, y, f"Total rapports: {data['total_rapports']}")
-        y -= 30
-
-        for rapport in data["rapports"]:
-            c.setFont("Helvetica-Bold", 12)
-            c.drawString(100, y, f"Titre: {rapport['titre']}")
-            y -= 15
-            c.setFont("Helvetica-Oblique", 10)
-            c.drawString(100, y, f"Date: {rapport['date_rapport']}  |  Auteur: {rapport['auteur']}")
-            y -= 15
-            c.setFont("Helvetica", 10)
-            for line in rapport["contenu"].split("\n"):
-                c.drawString(110, y, line)
-                y -= 12
-                if y < 50:
-                    c.showPage()
-                    y = 800
-            y -= 20
-            if y < 50:
-                c.showPage()
-                y = 800
-
-        c.save()
-        tmp_path = tmp.name
-
-    return FileResponse(tmp_path, filename="rapport_administratif.pdf", media_type="application/pdf")
 
 
 @router.get("/administratif/export-excel")
@@ -259,25 +221,9 @@ def export_excel_rapport_administratif(
     check_role(current_user, ALLOWED_ROLES_ADMINISTRATIF)
     data = crud_rapport.generer_rapport_administratif(db, date_debut, date_fin)
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Rapport Administratif"
-    ws.append(["Titre", "Date Rapport", "Auteur", "Contenu"])
-
-    for rapport in data["rapports"]:
-        ws.append([rapport["titre"], rapport["date_rapport"], rapport["auteur"], rapport["contenu"]])
-
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp:
-        wb.save(tmp.name)
-        tmp_path = tmp.name
-
-    return FileResponse(
-        tmp_path,
-        filename="rapport_administratif.xlsx",
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
-
-
+    wb = classeur()
+    remplir_classeur_administratif(wb, data)
+    return reponse_excel(wb, "rapport_administratif.xlsx")
 
 
 @router.get("/audit/compile/export-pdf")
@@ -292,97 +238,7 @@ def export_pdf_rapport_audit_compilé(
         raise HTTPException(status_code=400, detail="date_debut et date_fin sont requis.")
 
     data = crud_rapport.generer_rapport_audit_compile(db, date_debut, date_fin)
-
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        c = canvas.Canvas(tmp.name)
-        c.setFont("Helvetica-Bold", 16)
-        c.drawString(100, 800, "Rapport d'Audit Combiné")
-        y = 780
-
-        # Période
-        c.setFont("Helvetica", 12)
-        c.drawString(100, y, f"Période: {data['periode']['date_debut']} à {data['periode']['date_fin']}")
-        y -= 30
-
-        # ADMINISTRATIF
-        c.setFont("Helvetica-Bold", 14)
-        c.drawString(100, y, f"Rapport Administratif - Total: {data['administratif']['total_rapports']}")
-        y -= 20
-        for rapport in data['administratif']['rapports']:
-            c.setFont("Helvetica-Bold", 12)
-            c.drawString(100, y, f"Titre: {rapport['titre']}")
-            y -= 15
-            c.setFont("Helvetica-Oblique", 10)
-            c.drawString(100, y, f"Date: {rapport['date_rapport']} | Auteur: {rapport['auteur']}")
-            y -= 15
-            c.setFont("Helvetica", 10)
-            for line in rapport['contenu'].split('\n'):
-                c.drawString(110, y, line)
-                y -= 12
-                if y < 50:
-                    c.showPage()
-                    y = 800
-            y -= 20
-
-        # FINANCIER
-        c.setFont("Helvetica-Bold", 14)
-        c.drawString(100, y, f"Rapport Financier - Année: {data['periode']['annee_financiere']}")
-        y -= 20
-        recettes = data['financier'].get('recettes', {})
-        depenses = data['financier'].get('depenses', {})
-        budget = data['financier'].get('budget', {})
-        solde = data['financier'].get('solde', 0)
-
-        c.setFont("Helvetica", 12)
-        c.drawString(100, y, f"Recettes totales: {recettes.get('total', 0)} FCFA")
-        y -= 15
-        for k, v in recettes.get('details', {}).items():
-            c.drawString(120, y, f"{k.capitalize()}: {v}")
-            y -= 15
-
-        c.drawString(100, y, f"Dépenses totales: {depenses.get('total', 0)} FCFA")
-        y -= 15
-        for k, v in depenses.get('details', {}).items():
-            c.drawString(120, y, f"{k.capitalize()}: {v}")
-            y -= 15
-
-        c.drawString(100, y, f"Budget prévisionnel: {budget.get('previsionnel', 0)} FCFA")
-        y -= 15
-        c.drawString(100, y, f"Budget réel: {budget.get('reel', 0)} FCFA")
-        y -= 15
-        c.drawString(100, y, f"Écart: {budget.get('ecart', 0)} FCFA")
-        y -= 15
-        c.drawString(100, y, f"Solde: {solde} FCFA")
-        y -= 30
-
-        # MATERIEL
-        c.setFont("Helvetica-Bold", 14)
-        c.drawString(100, y, "Rapport Matériel")
-        y -= 20
-
-        for section in ["materiels", "infrastructures"]:
-            c.setFont("Helvetica-Bold", 12)
-            c.drawString(100, y, section.capitalize())
-            y -= 15
-            total = data['materiel'][section].get("total", 0)
-            c.setFont("Helvetica", 12)
-            c.drawString(120, y, f"Total: {total}")
-            y -= 15
-            etats = data['materiel'][section].get("etat", {})
-            c.drawString(120, y, "États:")
-            y -= 15
-            for etat, count in etats.items():
-                c.drawString(140, y, f"{etat}: {count}")
-                y -= 15
-            y -= 20
-
-        c.save()
-        tmp_path = tmp.name
-
-    return FileResponse(tmp_path, filename="rapport_audit_compile.pdf", media_type="application/pdf")
-
-
-
+    return reponse_pdf("Rapport d'Audit Combiné", blocs_audit(data), "rapport_audit_compile.pdf")
 
 
 
@@ -399,61 +255,10 @@ def export_excel_rapport_audit_compilé(
 
     data = crud_rapport.generer_rapport_audit_compile(db, date_debut, date_fin)
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Rapport Audit Combiné"
-
-    ws.append(["Période", f"{data['periode']['date_debut']} à {data['periode']['date_fin']}"])
-    ws.append([])
-
-    # Administratif
-    ws.append(["Rapport Administratif", f"Total: {data['administratif']['total_rapports']}"])
-    ws.append(["Titre", "Date Rapport", "Auteur", "Contenu"])
-    for rapport in data['administratif']['rapports']:
-        ws.append([rapport["titre"], rapport["date_rapport"], rapport["auteur"], rapport["contenu"]])
-
-    ws.append([])
-
-    # Financier
-    ws.append(["Rapport Financier", f"Année: {data['periode']['annee_financiere']}"])
-    ws.append(["Catégorie", "Montant (FCFA)"])
-    recettes = data['financier'].get('recettes', {})
-    depenses = data['financier'].get('depenses', {})
-    budget = data['financier'].get('budget', {})
-    solde = data['financier'].get('solde', 0)
-
-    ws.append(["Recettes totales", recettes.get('total', 0)])
-    for k, v in recettes.get('details', {}).items():
-        ws.append([k.capitalize(), v])
-
-    ws.append(["Dépenses totales", depenses.get('total', 0)])
-    for k, v in depenses.get('details', {}).items():
-        ws.append([k.capitalize(), v])
-
-    ws.append(["Budget prévisionnel", budget.get('previsionnel', 0)])
-    ws.append(["Budget réel", budget.get('reel', 0)])
-    ws.append(["Écart", budget.get('ecart', 0)])
-    ws.append(["Solde", solde])
+    wb = classeur()
+    remplir_classeur_audit(wb, data)
 
-    ws.append([])
-
-    # Matériel
-    for section in ["materiels", "infrastructures"]:
-        ws.append([f"Rapport Matériel - {section.capitalize()}"])
-        ws.append(["Total", data['materiel'][section].get("total", 0)])
-        ws.append(["État", "Nombre"])
-        for etat, count in data['materiel'][section].get("etat", {}).items():
-            ws.append([etat, count])
-
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp:
-        wb.save(tmp.name)
-        tmp_path = tmp.name
-
-    return FileResponse(
-        tmp_path,
-        filename="rapport_audit_compile.xlsx",
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
+    return reponse_excel(wb, "rapport_audit_compile.xlsx")
 
 
 
@@ -466,51 +271,8 @@ def export_pdf_materiel(
 ):
     check_role(current_user, ALLOWED_ROLES_MATERIEL)
     rapport = crud_rapport.generer_rapport_materiel(db, date_debut=date_debut, date_fin=date_fin)
+    return reponse_pdf("Rapport Matériels et Infrastructures", blocs_materiel(rapport), "rapport_materiels.pdf")
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        c = canvas.Canvas(tmp.name)
-        c.setFont("Helvetica-Bold", 16)
-        c.drawString(100, 800, "Rapport Matériels et Infrastructures")
-
-        y = 780
-        for section, data in rapport.items():
-            c.setFont("Helvetica-Bold", 14)
-            c.drawString(100, y, f"{section.capitalize()}:")
-            y -= 20
-
-            if "total" in data:
-                c.setFont("Helvetica", 12)
-                c.drawString(120, y, f"Total: {data['total']}")
-                y -= 20
-
-            if "etat" in data:
-                c.setFont("Helvetica", 12)
-                c.drawString(120, y, "États:")
-                y -= 15
-                for etat, count in data["etat"].items():
-                    c.drawString(140, y, f"{etat}: {count}")
-                    y -= 15
-
-            if "pret" in data:
-                c.setFont("Helvetica", 12)
-                c.drawString(120, y, "Prêts en cours:")
-                y -= 15
-                for pret in data["pret"]:
-                    pret_str = ", ".join(f"{k}: {v}" for k, v in pret.items())
-                    c.drawString(140, y, pret_str)
-                    y -= 15
-                    if y < 100:
-                        c.showPage()
-                        y = 800
-            y -= 20
-            if y < 100:
-                c.showPage()
-                y = 800
-
-        c.save()
-        tmp_path = tmp.name
-
-    return FileResponse(tmp_path, filename="rapport_materiels.pdf", media_type="application/pdf")
 
 
 @router.get("/materiel/export-excel")
@@ -523,61 +285,87 @@ def export_excel_materiel(
     check_role(current_user, ALLOWED_ROLES_MATERIEL)
     rapport = crud_rapport.generer_rapport_materiel(db, date_debut=date_debut, date_fin=date_fin)
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Rapport Matériels"
-
-    # Matériels
-    ws.append(["MATÉRIELS"])
-    ws.append(["Total", rapport["materiels"].get("total", 0)])
-    ws.append(["État", "Nombre"])
-    for etat, count in rapport["materiels"].get("etat", {}).items():
-        ws.append([etat, count])
-
-    ws.append([])
-    ws.append(["Prêts Matériels"])
-    headers = ["Matériel", "Bénéficiaire", "Date prêt", "Date retour prévue", "Date retour effective", "État retour"]
-    ws.append(headers)
-    for pret in rapport["materiels"].get("pret", []):
-        ws.append([
-            pret.get("materiel", ""),
-            pret.get("beneficiaire", ""),
-            pret.get("date_pret", ""),
-            pret.get("date_retour_prevue", ""),
-            pret.get("date_retour_effective", ""),
-            pret.get("etat_retour", "")
-        ])
-
-    ws.append([])
-    # Infrastructures
-    ws.append(["INFRASTRUCTURES"])
-    ws.append(["Total", rapport["infrastructures"].get("total", 0)])
-    ws.append(["État", "Nombre"])
-    for etat, count in rapport["infrastructures"].get("etat", {}).items():
-        ws.append([etat, count])
-
-    ws.append([])
-    ws.append(["Prêts Infrastructures"])
-    headers = ["Infrastructure", "Bénéficiaire", "Date prêt", "Date retour prévue", "Date retour effective", "État retour"]
-    ws.append(headers)
-    for pret in rapport["infrastructures"].get("pret", []):
-        ws.append([
-            pret.get("infrastructure", ""),
-            pret.get("beneficiaire", ""),
-            pret.get("date_pret", ""),
-            pret.get("date_retour_prevue", ""),
-            pret.get("date_retour_effective", ""),
-            pret.get("etat_retour", "")
-        ])
-
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp:
-        wb.save(tmp.name)
-        tmp_path = tmp.name
+    wb = classeur()
+    remplir_classeur_materiel(wb, rapport)
+
+    return reponse_excel(wb, "rapport_materiels.xlsx")
+
+
+# --- GÉNÉRATION EN ARRIÈRE-PLAN ---
 
+ROLES_PAR_TYPE = {
+    "financier": ALLOWED_ROLES_FINANCIER,
+    "administratif": ALLOWED_ROLES_ADMINISTRATIF,
+    "materiel": ALLOWED_ROLES_MATERIEL,
+    "audit": ALLOWED_ROLES_AUDIT,
+}
+
+
+def _job_out(job, request: Request):
+    job = {**job, "telechargement": None}
+    if job["statut"] == rapport_jobs.TERMINE:
+        job["telechargement"] = str(request.url_for("telecharger_rapport_job", job_id=job["job_id"]))
+    return job
+
+
+def _get_job_autorise(job_id: str, current_user):
+    job = rapport_jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Tâche de rapport introuvable ou expirée.")
+    check_role(current_user, ROLES_PAR_TYPE[job["type"]])
+    return job
+
+
+@router.post("/jobs", response_model=RapportJobOut, status_code=status.HTTP_202_ACCEPTED)
+def creer_rapport_job(
+    demande: RapportJobCreate,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    type_rapport = demande.type.value
+    check_role(current_user, ROLES_PAR_TYPE[type_rapport])
+
+    if type_rapport == "financier" and demande.annee is None:
+        raise HTTPException(status_code=400, detail="annee est requis pour le rapport financier.")
+    if type_rapport == "audit" and (not demande.date_debut or not demande.date_fin):
+        raise HTTPException(status_code=400, detail="date_debut et date_fin sont requis.")
+
+    params = {
+        "annee": demande.annee if type_rapport == "financier" else None,
+        "date_debut": demande.date_debut if type_rapport != "financier" else None,
+        "date_fin": demande.date_fin if type_rapport != "financier" else None,
+    }
+    job = rapport_jobs.soumettre_rapport(
+        db, type_rapport, demande.format.value, params, current_user.utilisateur_id
+    )
+    return _job_out(job, request)
+
+
+@router.get("/jobs/{job_id}", response_model=RapportJobOut)
+def get_rapport_job(
+    job_id: str,
+    request: Request,
+    current_user=Depends(get_current_user)
+):
+    return _job_out(_get_job_autorise(job_id, current_user), request)
+
+
+@router.get("/jobs/{job_id}/telechargement", name="telecharger_rapport_job")
+def telecharger_rapport_job(
+    job_id: str,
+    current_user=Depends(get_current_user)
+):
+    job = _get_job_autorise(job_id, current_user)
+    if job["statut"] != rapport_jobs.TERMINE:
+        raise HTTPException(status_code=409, detail=f"Rapport non disponible (statut: {job['statut']}).")
+    if not os.path.exists(job["chemin"]):
+        raise HTTPException(status_code=410, detail="Le fichier du rapport a expiré, relancez la génération.")
     return FileResponse(
-        tmp_path,
-        filename="rapport_materiels.xlsx",
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        job["chemin"],
+        media_type=rapport_jobs.MEDIA_TYPES[job["format"]],
+        filename=job["nom_fichier"],
+        headers={"ETag": f'"{job["empreinte"]}"'}
     )
 
 
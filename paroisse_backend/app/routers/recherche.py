@@ -0,0 +1,107 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from app.config import INDEX_RECHERCHE_MEMOIRE
+from app.database import get_db, SessionLocal
+from app.models.rapport import Rapport, RapportTypeEnum
+from app.models.utilisateur import RoleEnum
+from app.schemas.recherche import EntiteRechercheEnum, ResultatRecherche
+from app.utils.security import get_current_user
+from app.utils.recherche import rechercher
+from app.utils.index_memoire import index_memoire, rechercher_memoire, lancer_reconstruction
+from app.permissions.don import ALLOWED_ROLES as ALLOWED_ROLES_DON
+from app.permissions.quete import ALLOWED_ROLES as ALLOWED_ROLES_QUETE
+from app.permissions.offrande import ALLOWED_ROLES as ALLOWED_ROLES_OFFRANDE
+from app.permissions.facture import ALLOWED_ROLES as ALLOWED_ROLES_FACTURE
+from app.permissions.recu import ALLOWED_ROLES_RECU_ADMIN
+from app.permissions.rapport import (
+    ALLOWED_ROLES_FINANCIER,
+    ALLOWED_ROLES_ADMINISTRATIF,
+    ALLOWED_ROLES_AUDIT,
+    ALLOWED_ROLES_MATERIEL,
+)
+
+router = APIRouter()
+
+# Mêmes droits que les routes /search de chaque entité
+ROLES_PAR_ENTITE = {
+    EntiteRechercheEnum.don: ALLOWED_ROLES_DON,
+    EntiteRechercheEnum.quete: ALLOWED_ROLES_QUETE,
+    EntiteRechercheEnum.offrande: ALLOWED_ROLES_OFFRANDE,
+    EntiteRechercheEnum.facture: ALLOWED_ROLES_FACTURE,
+    EntiteRechercheEnum.recu: ALLOWED_ROLES_RECU_ADMIN,
+}
+
+ROLES_PAR_TYPE_RAPPORT = {
+    RapportTypeEnum.financier: ALLOWED_ROLES_FINANCIER,
+    RapportTypeEnum.administratif: ALLOWED_ROLES_ADMINISTRATIF,
+    RapportTypeEnum.audit: ALLOWED_ROLES_AUDIT,
+    RapportTypeEnum.materiel: ALLOWED_ROLES_MATERIEL,
+}
+
+
+def _entites_autorisees(current_user, types):
+    """Entités demandées que le rôle peut consulter, et types de rapport visibles."""
+    demandees = types or list(EntiteRechercheEnum)
+    entites = [e.value for e in demandees if e in ROLES_PAR_ENTITE and current_user.role in ROLES_PAR_ENTITE[e]]
+
+    # Un rapport n'est visible que si le rôle a accès à son type
+    types_rapport = [t for t, roles in ROLES_PAR_TYPE_RAPPORT.items() if current_user.role in roles]
+    if EntiteRechercheEnum.rapport in demandees and types_rapport:
+        entites.append(EntiteRechercheEnum.rapport.value)
+
+    if not entites:
+        raise HTTPException(status_code=403, detail=f"Permission refusée pour le rôle {current_user.role}")
+    return entites, types_rapport
+
+
+@router.get("/search", response_model=List[ResultatRecherche])
+def recherche_globale(
+    q: str = Query(..., min_length=1, description="Texte libre ; ex. « loyer >5000 2025-03 »"),
+    types: Optional[List[EntiteRechercheEnum]] = Query(None, description="Limiter à certaines entités"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    entites, types_rapport = _entites_autorisees(current_user, types)
+    filtres = {EntiteRechercheEnum.rapport.value: [Rapport.type.in_(types_rapport)]}
+    return rechercher(db, q, entites=entites, limite=limit, filtres=filtres)
+
+
+@router.get("/search/suggestions", response_model=List[ResultatRecherche])
+def suggestions(
+    q: str = Query(..., min_length=1, description="Début de saisie ; chaque mot est cherché en préfixe"),
+    types: Optional[List[EntiteRechercheEnum]] = Query(None),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    entites, types_rapport = _entites_autorisees(current_user, types)
+
+    # Index en mémoire si disponible, sinon recherche SQL
+    resultats = rechercher_memoire(
+        q, entites, limit, categories={EntiteRechercheEnum.rapport.value: {t.value for t in types_rapport}}
+    )
+    if resultats is None:
+        filtres = {EntiteRechercheEnum.rapport.value: [Rapport.type.in_(types_rapport)]}
+        resultats = rechercher(db, q, entites=entites, limite=limit, filtres=filtres)
+    return resultats
+
+
+@router.get("/search/index")
+def etat_index(current_user=Depends(get_current_user)):
+    if current_user.role != RoleEnum.Administrateur:
+        raise HTTPException(status_code=403, detail=f"Permission refusée pour le rôle {current_user.role}")
+    return index_memoire.statistiques()
+
+
+@router.post("/search/index/reconstruire", status_code=202)
+def reconstruire_index(current_user=Depends(get_current_user)):
+    if current_user.role != RoleEnum.Administrateur:
+        raise HTTPException(status_code=403, detail=f"Permission refusée pour le rôle {current_user.role}")
+    if not INDEX_RECHERCHE_MEMOIRE:
+        raise HTTPException(status_code=409, detail="Index de recherche en mémoire désactivé (INDEX_RECHERCHE_MEMOIRE)")
+    if not lancer_reconstruction(SessionLocal):
+        raise HTTPException(status_code=409, detail="Reconstruction déjà en cours")
+    return {"message": "Reconstruction de l'index lancée"}
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
-from app.schemas.recu import RecuCreate, RecuOut
+from typing import List, Optional
+from app.schemas.recu import RecuCreate, RecuOut, SourceRecuEnum
 from app.crud import recu as crud_recu
 from app.database import get_db
 from app.utils.security import get_current_user
 from app.permissions.recu import ALLOWED_ROLES_RECU_ADMIN
+from app.utils.pagination import Pagination, parametres_pagination, page
+from app.utils.totaux import total_montant, exposer_total
+from app.utils.documents_pdf import MAX_DOCUMENTS_PDF, documents_recus, nom_fichier_pdf, reponse_documents_pdf
 
 router = APIRouter()
 
@@ -16,24 +19,91 @@ def check_role(current_user):
 @router.post("/", response_model=RecuOut)
 def create_recu(recu: RecuCreate, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
     check_role(current_user)
-    return crud_recu.create_recu(db, recu)
+    db_recu = crud_recu.create_recu(db, recu)
+    db.commit()
+    db.refresh(db_recu)
+    return db_recu
 
 @router.get("/", response_model=List[RecuOut])
-def list_recus(db: Session = Depends(get_db), include_deleted: bool = False, current_user=Depends(get_current_user)):
+def list_recus(
+    response: Response,
+    db: Session = Depends(get_db),
+    include_deleted: bool = False,
+    pagination: Pagination = Depends(parametres_pagination),
+    current_user=Depends(get_current_user)
+):
     check_role(current_user)
-    return crud_recu.get_recus(db, include_deleted=include_deleted)
+    return page(response, *crud_recu.get_recus(db, include_deleted, pagination.curseur, pagination.limite))
 
 # La route /search doit être avant la route dynamique /{recu_id}
 @router.get("/search", response_model=List[RecuOut])
 def search_recus(
+    response: Response,
     keyword: str,
     include_deleted: bool = False,
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
     check_role(current_user)
+    exposer_total(response, total_montant(db, "recu", include_deleted=include_deleted))
     return crud_recu.search_recus(db, keyword, include_deleted)
 
+# Reçu d'une écriture (don, offrande, quête, salaire), avant /{recu_id} également
+@router.get("/source/{source_type}/{source_id}", response_model=RecuOut)
+def get_recu_de_source(
+    source_type: SourceRecuEnum,
+    source_id: int,
+    include_deleted: bool = False,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    check_role(current_user)
+    recu = crud_recu.get_recu_de_source(db, source_type.value, source_id, include_deleted=include_deleted)
+    if not recu:
+        raise HTTPException(status_code=404, detail="Reçu non trouvé")
+    return recu
+
+# Impression en lot (ex. reçus fiscaux de l'année), avant /{recu_id} également
+@router.get("/pdf")
+def imprimer_recus(
+    ids: Optional[List[int]] = Query(None, description="Identifiants des reçus à imprimer"),
+    annee: Optional[int] = Query(None, description="Année d'émission"),
+    source_type: Optional[SourceRecuEnum] = None,
+    include_deleted: bool = False,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    check_role(current_user)
+    if not ids and not annee:
+        raise HTTPException(status_code=400, detail="Précisez les reçus à imprimer (ids) ou une année.")
+    if ids and len(ids) > MAX_DOCUMENTS_PDF:
+        raise HTTPException(status_code=400, detail=f"Au plus {MAX_DOCUMENTS_PDF} reçus par impression.")
+
+    recus = crud_recu.get_recus_a_imprimer(
+        db, ids, annee, source_type.value if source_type else None, include_deleted, limite=MAX_DOCUMENTS_PDF + 1
+    )
+    if not recus:
+        raise HTTPException(status_code=404, detail="Aucun reçu à imprimer")
+    if len(recus) > MAX_DOCUMENTS_PDF:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Plus de {MAX_DOCUMENTS_PDF} reçus sélectionnés : précisez le type de source ou les identifiants."
+        )
+
+    nom = f"recus_{annee}.pdf" if annee else "recus.pdf"
+    return reponse_documents_pdf(documents_recus(db, recus), nom, titre="Reçus")
+
+@router.get("/{recu_id}/pdf")
+def imprimer_recu(recu_id: int, include_deleted: bool = False, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+    check_role(current_user)
+    recus = crud_recu.get_recus_a_imprimer(db, ids=[recu_id], include_deleted=include_deleted)
+    if not recus:
+        raise HTTPException(status_code=404, detail="Reçu non trouvé")
+    recu = recus[0]
+    return reponse_documents_pdf(
+        documents_recus(db, recus), nom_fichier_pdf("recu", recu.numero or recu.recu_id), titre=f"Reçu {recu.numero or recu.recu_id}"
+    )
+
 @router.get("/{recu_id}", response_model=RecuOut)
 def get_recu(recu_id: int, db: Session = Depends(get_db), include_deleted: bool = False, current_user=Depends(get_current_user)):
     check_role(current_user)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from typing import List
 from app.schemas.salaire import SalaireCreate, SalaireOut
@@ -6,6 +6,8 @@ from app.crud import salaire as crud_salaire
 from app.database import get_db
 from app.utils.security import get_current_user
 from app.permissions.salaire import ALLOWED_ROLES_SALAIRE
+from app.utils.pagination import Pagination, parametres_pagination, page
+from app.utils.totaux import total_montant, exposer_total
 
 router = APIRouter()
 
@@ -30,12 +32,15 @@ def create_salaire(
 
 @router.get("/", response_model=List[SalaireOut])
 def list_salaires(
+    response: Response,
     include_deleted: bool = False,
+    pagination: Pagination = Depends(parametres_pagination),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     check_role(current_user, ALLOWED_ROLES_SALAIRE)
-    return crud_salaire.get_salaires(db, include_deleted)
+    exposer_total(response, total_montant(db, "salaire", include_deleted=include_deleted))
+    return page(response, *crud_salaire.get_salaires(db, include_deleted, pagination.curseur, pagination.limite))
 
 
 # ✅ Cette route doit venir AVANT /{salaire_id}
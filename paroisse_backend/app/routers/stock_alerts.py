@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.utils.stock_alerts import verifier_alertes_stock
+from app.utils.stock_alerts import verifier_alertes_stock, file_alertes_stock
 from app.utils.security import get_current_user
 from app.models.utilisateur import RoleEnum, Utilisateur
 from typing import Set
@@ -22,3 +22,8 @@ def verifier_alertes(
     check_role(current_user)
     notifications = verifier_alertes_stock(db)
     return {"message": f"{len(notifications)} alertes générées."}
+
+@router.get("/metriques")
+def metriques_alertes(current_user: Utilisateur = Depends(get_current_user)):
+    check_role(current_user)
+    return file_alertes_stock.metriques()
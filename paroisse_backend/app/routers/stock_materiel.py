@@ -1,14 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
-from app.schemas.stock_materiel import StockMaterielCreate, StockMaterielOut
+from app.schemas.stock_materiel import StockMaterielCreate, StockMaterielOut, ResultatMouvementsBatch
 from app.crud import stock_materiel as crud_stock
 from app.database import get_db
 from app.utils.security import get_current_user
 from app.models.utilisateur import Utilisateur
 from app.permissions.stock_materiel import ALLOWED_ROLES_STOCK
-from app.models.stock_materiel import TypeMouvementStockEnum
+from app.utils.pagination import Pagination, parametres_pagination, page
 
 router = APIRouter(prefix="/stock", tags=["StockMateriel"])
 
@@ -26,23 +26,63 @@ def create_mouvement(
     if mouvement.quantite <= 0:
         raise HTTPException(status_code=400, detail="La quantité doit être positive.")
 
-    if mouvement.type_mouvement == TypeMouvementStockEnum.sortie:
-        stock_actuel = crud_stock.get_stock_actuel_par_materiel(db, mouvement.materiel_id)
-        if mouvement.quantite > stock_actuel:
-            raise HTTPException(
-                status_code=400,
-                detail=f"La quantité sortie ({mouvement.quantite}) ne peut pas dépasser la quantité en stock ({stock_actuel})."
-            )
-
+    # Stock suffisant pour une sortie : vérifié sous verrou par le CRUD
     return crud_stock.create_mouvement_stock(db, mouvement)
 
+MAX_LIGNES_BATCH = 500
+
+@router.post("/batch", response_model=ResultatMouvementsBatch, status_code=201)
+def create_mouvements_batch(
+    mouvements: List[StockMaterielCreate],
+    db: Session = Depends(get_db),
+    current_user: Utilisateur = Depends(get_current_user)
+):
+    check_role(current_user)
+    if not mouvements:
+        raise HTTPException(status_code=400, detail="Aucun mouvement à enregistrer.")
+    if len(mouvements) > MAX_LIGNES_BATCH:
+        raise HTTPException(status_code=400, detail=f"Au plus {MAX_LIGNES_BATCH} mouvements par lot.")
+
+    try:
+        lignes, succes = crud_stock.create_mouvements_stock_batch(db, mouvements)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    resultat = ResultatMouvementsBatch(enregistre=succes, lignes=lignes)
+    if not succes:
+        raise HTTPException(status_code=400, detail=resultat.model_dump(mode="json"))
+    return resultat
+
 @router.get("/", response_model=List[StockMaterielOut])
 def list_mouvements(
+    response: Response,
     db: Session = Depends(get_db), 
-    skip: int = 0, 
-    limit: int = 100,
+    pagination: Pagination = Depends(parametres_pagination),
     search: Optional[str] = Query(None, description="Recherche par description"),
     current_user: Utilisateur = Depends(get_current_user)
 ):
     check_role(current_user)
-    return crud_stock.get_mouvements_stock(db, skip=skip, limit=limit, search=search)
+    return page(response, *crud_stock.get_mouvements_stock(db, pagination.curseur, pagination.limite, search=search))
+
+@router.post("/reconcilier")
+def reconcilier_stock(
+    corriger: bool = True,
+    db: Session = Depends(get_db),
+    current_user: Utilisateur = Depends(get_current_user)
+):
+    check_role(current_user)
+    ecarts = crud_stock.reconcilier_stock_courant(db, corriger=corriger)
+    return {"corrige": corriger, "ecarts": ecarts}
+
+@router.post("/initialiser")
+def initialiser_stock(
+    db: Session = Depends(get_db),
+    current_user: Utilisateur = Depends(get_current_user)
+):
+    # Migration unique : un exemplaire en stock pour chaque matériel sans parc
+    check_role(current_user)
+    try:
+        entrees = crud_stock.initialiser_stock_materiels(db)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"entrees": entrees}
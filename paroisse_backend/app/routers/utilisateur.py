@@ -17,7 +17,7 @@ from sqlalchemy.orm import Session
 from app.schemas.utilisateur import UtilisateurCreate, UtilisateurOut
 from app.crud import utilisateur as crud_utilisateur
 from app.database import get_db
-from app.utils.security import get_current_user, hash_password
+from app.utils.security import get_current_user, hash_password_async, invalider_utilisateur_courant
 from app.models.utilisateur import Utilisateur, RoleEnum
 from app.permissions.utilisateur import ALLOWED_ROLES_UTILISATEUR
 
@@ -47,7 +47,11 @@ def get_my_profile(
     db: Session = Depends(get_db),
     current_user: Utilisateur = Depends(get_current_user)
 ):
-    return current_user
+    # current_user n'est qu'une identité légère : le profil complet est relu en base
+    utilisateur = crud_utilisateur.get_utilisateur(db, current_user.utilisateur_id)
+    if not utilisateur:
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+    return utilisateur
 
 
 # Liste des utilisateurs
@@ -128,7 +132,7 @@ async def update_utilisateur(
         except Exception:
             raise HTTPException(status_code=400, detail="role invalide")
     if mot_de_passe is not None:
-        update_data["mot_de_passe"] = hash_password(mot_de_passe)
+        update_data["mot_de_passe"] = await hash_password_async(mot_de_passe)
 
     # Gestion de la photo
     if photo is not None:
@@ -147,6 +151,7 @@ async def update_utilisateur(
         setattr(utilisateur, key, value)
 
     db.commit()
+    invalider_utilisateur_courant(utilisateur_id)
     db.refresh(utilisateur)
     return utilisateur
 
@@ -3,6 +3,9 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from app.database import SessionLocal
 from app.utils.stock_alerts import verifier_alertes_stock
+from app.utils.rapport_jobs import purger_rapports_generes
+from app.crud.stock_materiel import reconcilier_stock_courant
+from app.crud.pret import sortir_prets_commences
 
 def job_verifier_alertes():
     db = SessionLocal()
@@ -11,8 +14,28 @@ def job_verifier_alertes():
     finally:
         db.close()
 
+def job_purger_rapports():
+    purger_rapports_generes()
+
+def job_reconcilier_stock():
+    db = SessionLocal()
+    try:
+        reconcilier_stock_courant(db)
+    finally:
+        db.close()
+
+def job_sortir_prets():
+    db = SessionLocal()
+    try:
+        sortir_prets_commences(db)
+    finally:
+        db.close()
+
 def start_scheduler():
     scheduler = BackgroundScheduler()
     scheduler.add_job(job_verifier_alertes, 'interval', hours=24)  # exécute toutes les 24h
+    scheduler.add_job(job_purger_rapports, 'interval', hours=1)  # fichiers de rapports expirés
+    scheduler.add_job(job_reconcilier_stock, 'interval', hours=24)  # stock courant vs historique
+    scheduler.add_job(job_sortir_prets, 'interval', hours=1)  # sorties des prêts qui commencent
     scheduler.start()
     return scheduler
@@ -0,0 +1,25 @@
+from pydantic import BaseModel
+from typing import List
+from enum import Enum
+
+
+class EntiteImportEnum(str, Enum):
+    don = "don"
+    offrande = "offrande"
+    quete = "quete"
+
+
+class ErreurImport(BaseModel):
+    ligne: int
+    message: str
+
+
+class ResultatImport(BaseModel):
+    entite: EntiteImportEnum
+    enregistre: bool  # False : au moins une ligne invalide, rien n'a été importé
+    lignes_lues: int
+    importees: int
+    recus: int
+    annees_budget: List[int]
+    nb_erreurs: int
+    erreurs: List[ErreurImport]  # limitées aux MAX_ERREURS_RAPPORTEES premières
@@ -1,7 +1,19 @@
-from pydantic import BaseModel, ConfigDict, EmailStr, model_validator
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, model_validator
+from typing import List, Optional
 from datetime import date, datetime
 
+class PretLigneBase(BaseModel):
+    materiel_id: int
+    quantite: int = Field(1, gt=0)
+
+class PretLigneCreate(PretLigneBase):
+    pass
+
+class PretLigneOut(PretLigneBase):
+    ligne_id: int
+
+    model_config = ConfigDict(from_attributes=True)
+
 class PretBase(BaseModel):
     materiel_id: Optional[int] = None
     infrastructure_id: Optional[int] = None
@@ -16,12 +28,13 @@ class PretBase(BaseModel):
 
     @model_validator(mode="after")
     def check_materiel_or_infrastructure(self):
-        if not self.materiel_id and not self.infrastructure_id:
+        if not self.materiel_id and not self.infrastructure_id and not getattr(self, "lignes", None):
             raise ValueError("Un prêt doit concerner au moins un matériel ou une infrastructure.")
         return self
 
 class PretCreate(PretBase):
-    pass
+    quantite: int = Field(1, gt=0)  # quantité prêtée de materiel_id
+    lignes: List[PretLigneCreate] = []  # autres matériels prêtés avec leur quantité
 
 class PretUpdate(BaseModel):
     date_retour_effective: Optional[date]
@@ -32,5 +45,26 @@ class PretOut(PretBase):
     created_at: Optional[datetime]
     updated_at: Optional[datetime]
     deleted_at: Optional[datetime]
+    lignes: List[PretLigneOut] = []
 
     model_config = ConfigDict(from_attributes=True)
+
+class OccupationOut(BaseModel):
+    pret_id: int
+    debut: date
+    fin: date
+    quantite: int = 1  # quantité prêtée (1 pour une infrastructure)
+
+class CreneauLibreOut(BaseModel):
+    debut: date
+    fin: date
+    quantite: Optional[int] = None  # quantité libre d'un matériel ; None pour une infrastructure
+
+class DisponibiliteOut(BaseModel):
+    ressource: str  # materiel ou infrastructure
+    ressource_id: int
+    debut: date
+    fin: date
+    stock: Optional[int] = None  # parc du matériel : stock courant + quantités sorties par les prêts en cours
+    occupations: List[OccupationOut]
+    libres: List[CreneauLibreOut]
@@ -31,3 +31,29 @@ class RapportOut(RapportBase):
     deleted_at: Optional[datetime]
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class FormatRapportEnum(str, enum.Enum):
+    pdf = "pdf"
+    xlsx = "xlsx"
+
+class RapportJobCreate(BaseModel):
+    type: TypeRapportEnum
+    format: FormatRapportEnum = FormatRapportEnum.pdf
+    annee: Optional[int] = None
+    date_debut: Optional[datetime] = None
+    date_fin: Optional[datetime] = None
+
+class RapportJobOut(BaseModel):
+    job_id: str
+    type: TypeRapportEnum
+    format: FormatRapportEnum
+    statut: str
+    nom_fichier: str
+    empreinte: Optional[str] = None
+    taille: Optional[int] = None
+    erreur: Optional[str] = None
+    created_at: datetime
+    debut_at: Optional[datetime] = None
+    fin_at: Optional[datetime] = None
+    telechargement: Optional[str] = None
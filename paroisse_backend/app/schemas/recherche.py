@@ -0,0 +1,22 @@
+from pydantic import BaseModel
+from typing import Optional, Union
+from datetime import date, datetime
+from enum import Enum
+
+
+class EntiteRechercheEnum(str, Enum):
+    don = "don"
+    quete = "quete"
+    offrande = "offrande"
+    facture = "facture"
+    recu = "recu"
+    rapport = "rapport"
+
+
+class ResultatRecherche(BaseModel):
+    type: EntiteRechercheEnum
+    id: int
+    titre: Optional[str] = None
+    date: Optional[Union[datetime, date]] = None
+    montant: Optional[float] = None
+    score: float = 0.0
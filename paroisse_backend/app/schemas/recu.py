@@ -1,6 +1,15 @@
 from pydantic import BaseModel, ConfigDict
 from typing import Optional
 from datetime import datetime
+from enum import Enum
+
+
+class SourceRecuEnum(str, Enum):
+    don = "don"
+    offrande = "offrande"
+    quete = "quete"
+    salaire = "salaire"
+
 
 class RecuBase(BaseModel):
     date_emission: Optional[datetime] = None
@@ -13,6 +22,9 @@ class RecuCreate(RecuBase):
 
 class RecuOut(RecuBase):
     recu_id: int
+    numero: Optional[str] = None  # None pour un reçu antérieur à la numérotation
+    source_type: Optional[SourceRecuEnum] = None
+    source_id: Optional[int] = None
     montant_total: Optional[float] = None  # ← à ajouter
     deleted_at: Optional[datetime]
 
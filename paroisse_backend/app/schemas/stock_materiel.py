@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 import enum
 
@@ -25,3 +25,16 @@ class StockMaterielOut(StockMaterielBase):
 class StockMaterielResponse(BaseModel):
     stock_mouvement: StockMaterielOut
     message: str
+
+class LigneMouvementBatch(BaseModel):
+    index: int
+    materiel_id: int
+    type_mouvement: TypeMouvementStockEnum
+    quantite: int
+    statut: str  # ok, erreur, annule (ligne valide non enregistrée car le lot a échoué)
+    stock_apres: Optional[int] = None
+    erreur: Optional[str] = None
+
+class ResultatMouvementsBatch(BaseModel):
+    enregistre: bool
+    lignes: List[LigneMouvementBatch]
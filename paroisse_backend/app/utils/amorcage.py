@@ -0,0 +1,34 @@
+from typing import Callable, Tuple, TypeVar
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+# Amorçage des lignes compteurs (séquence des reçus, registre budgétaire, stock
+# courant) : la ligne est lue sous verrou, puis créée si elle manque. Deux
+# transactions peuvent la trouver absente en même temps ; la seconde à insérer
+# viole alors la contrainte d'unicité. L'insertion est donc faite dans un
+# savepoint : en cas de conflit, seul le savepoint est annulé et la ligne créée
+# par l'autre transaction est relue sous verrou.
+#
+# Le savepoint est pris sur la connexion et non sur la session : un savepoint
+# de session déclencherait after_commit / after_rollback, et les écouteurs
+# (totaux, calendrier, index) videraient trop tôt le travail de la transaction.
+
+T = TypeVar("T")
+
+
+def inserer_ou_relire(db: Session, modele, valeurs: dict, relire: Callable[[], T]) -> Tuple[T, bool]:
+    """
+    Insère la ligne `valeurs` de `modele` puis la renvoie relue par `relire()`
+    (qui doit verrouiller). Si une transaction concurrente l'a créée entre-temps,
+    c'est cette ligne qui est renvoyée. Retourne (ligne, créée).
+    """
+    connection = db.connection()
+    try:
+        with connection.begin_nested():
+            connection.execute(insert(modele).values(**valeurs))
+        creee = True
+    except IntegrityError:
+        creee = False
+    return relire(), creee
@@ -1,46 +1,76 @@
+import unicodedata
+from typing import Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select, literal, union_all
 from datetime import datetime
 from app.models.budget import Budget
+from app.models.registre_budget import RegistreBudget
 from app.models.notification import Notification, TypeNotificationEnum
 from app.models.don import Don
 from app.models.offrande import Offrande
 from app.models.quete import Quete
 from app.models.achat import Achat
 from app.models.salaire import Salaire
+from app.utils.amorcage import inserer_ou_relire
+from app.utils.periode import filtre_annee
 
-def update_budget_reel(session: Session, annee: int, intitule: str, utilisateur_id: int):
-    intitule_lower = intitule.lower()
-    montant_total = 0
-    type = None
+# Sources du registre : clé -> (intitulé du budget, modèle, colonne date, type)
+SOURCES_BUDGET = {
+    "don": ("Don", Don, Don.date_don, "recette"),
+    "offrande": ("Offrande", Offrande, Offrande.date, "recette"),
+    "quete": ("Quête", Quete, Quete.date_quete, "recette"),
+    "achat": ("Achat", Achat, Achat.date_achat, "depense"),
+    "salaire": ("Salaire", Salaire, Salaire.date_paiement, "depense"),
+}
 
-    if intitule_lower == "don":
-        montant_total = session.query(func.coalesce(func.sum(Don.montant), 0))\
-            .filter(func.extract('year', Don.date_don) == annee).scalar()
-        type = "recette"
 
-    elif intitule_lower == "offrande":
-        montant_total = session.query(func.coalesce(func.sum(Offrande.montant), 0))\
-            .filter(func.extract('year', Offrande.date) == annee).scalar()
-        type = "recette"
+def cle_intitule(intitule: str) -> str:
+    # "Quête" -> "quete" : la clé du registre ne dépend ni de la casse ni des accents
+    decompose = unicodedata.normalize("NFKD", intitule.lower())
+    return "".join(c for c in decompose if not unicodedata.combining(c))
 
-    elif intitule_lower == "quete":
-        montant_total = session.query(func.coalesce(func.sum(Quete.montant), 0))\
-            .filter(func.extract('year', Quete.date_quete) == annee).scalar()
-        type = "recette"
 
-    elif intitule_lower == "achat":
-        montant_total = session.query(func.coalesce(func.sum(Achat.montant), 0))\
-            .filter(func.extract('year', Achat.date_achat) == annee).scalar()
-        type = "depense"
+def total_source(session: Session, cle: str, annee: int) -> float:
+    """Somme des écritures actives d'une source pour une année (recalcul complet)."""
+    _, modele, colonne_date, _ = SOURCES_BUDGET[cle]
+    return session.query(func.coalesce(func.sum(modele.montant), 0))\
+        .filter(modele.deleted_at.is_(None), filtre_annee(colonne_date, annee)).scalar()
 
-    elif intitule_lower == "salaire":
-        montant_total = session.query(func.coalesce(func.sum(Salaire.montant), 0))\
-            .filter(func.extract('year', Salaire.date_paiement) == annee).scalar()
-        type = "depense"
 
-    else:
-        montant_total = 0
+def update_budget_reel(session: Session, annee: int, intitule: str, utilisateur_id: int, delta: float):
+    """
+    Applique une variation (+montant à la création/restauration, -montant à la
+    suppression, différence à la modification) au registre budgétaire de l'année,
+    puis reporte le nouveau solde sur le budget. Aucun commit : l'appelant valide
+    l'écriture source et le registre dans la même transaction.
+    """
+    cle = cle_intitule(intitule)
+    source = SOURCES_BUDGET.get(cle)
+    type = source[3] if source else None
+
+    def relire():
+        return session.query(RegistreBudget).filter(
+            RegistreBudget.annee == annee,
+            RegistreBudget.intitule == cle
+        ).with_for_update().first()
+
+    registre, cree = relire(), False
+    if not registre:
+        # Première écriture de l'année : on initialise le registre depuis la table
+        # source. L'écriture courante y est déjà incluse une fois flushée ; si une
+        # autre transaction a créé le registre entre-temps, le delta s'y applique.
+        session.flush()
+        registre, cree = inserer_ou_relire(session, RegistreBudget, {
+            "annee": annee,
+            "intitule": cle,
+            "montant": total_source(session, cle, annee) if source else 0.0,
+            "version": 1,
+        }, relire)
+    if not cree:
+        registre.montant = (registre.montant or 0) + delta
+        registre.version = (registre.version or 0) + 1
+
+    montant_total = registre.montant
 
     budget = session.query(Budget).filter(
         Budget.intitule.ilike(intitule),
@@ -60,7 +90,6 @@ def update_budget_reel(session: Session, annee: int, intitule: str, utilisateur_
             sous_categorie=intitule.capitalize()
         )
         session.add(budget)
-        session.commit()
 
     # Mise à jour du montant réel selon type
     if type == "recette":
@@ -79,24 +108,120 @@ def update_budget_reel(session: Session, annee: int, intitule: str, utilisateur_
         budget.montantTotal = montant_total
 
     budget.updated_at = datetime.utcnow()
-    session.commit()
+    session.flush()
+
+
+def reporter_modification_budget(
+    session: Session,
+    intitule: str,
+    utilisateur_id: int,
+    ancienne_annee: int,
+    ancien_montant: float,
+    nouvelle_annee: int,
+    nouveau_montant: float
+):
+    """Répercute la modification d'une écriture active, y compris un changement d'année."""
+    if ancienne_annee == nouvelle_annee:
+        # Même sans variation de montant (ex. changement de mois), l'écriture
+        # incrémente la version du registre et invalide les rapports en cache.
+        update_budget_reel(session, nouvelle_annee, intitule, utilisateur_id, nouveau_montant - ancien_montant)
+        return
+
+    update_budget_reel(session, ancienne_annee, intitule, utilisateur_id, -ancien_montant)
+    update_budget_reel(session, nouvelle_annee, intitule, utilisateur_id, nouveau_montant)
+
+
+def reconcilier_registre_budget(session: Session, annee: Optional[int] = None, corriger: bool = True):
+    """
+    Reconstruit le registre depuis les tables sources et retourne les écarts
+    constatés (registre vs somme réelle). Avec corriger=False, simple rapport.
+    """
+    ecarts = []
+
+    for cle, (intitule, modele, colonne_date, _) in SOURCES_BUDGET.items():
+        annee_col = func.extract('year', colonne_date)
+        query = session.query(annee_col, func.coalesce(func.sum(modele.montant), 0))\
+            .filter(modele.deleted_at.is_(None))
+        if annee is not None:
+            query = query.filter(filtre_annee(colonne_date, annee))
+        reels = {int(a): float(total) for a, total in query.group_by(annee_col).all()}
+
+        registres_query = session.query(RegistreBudget).filter(RegistreBudget.intitule == cle)
+        if annee is not None:
+            registres_query = registres_query.filter(RegistreBudget.annee == annee)
+        registres = {r.annee: r for r in registres_query.all()}
+
+        for a in sorted(set(reels) | set(registres)):
+            reel = reels.get(a, 0.0)
+            registre = registres.get(a)
+            enregistre = float(registre.montant) if registre else None
+
+            if enregistre is not None and abs(reel - enregistre) < 0.005:
+                continue
+
+            ecarts.append({
+                "annee": a,
+                "intitule": intitule,
+                "registre": enregistre,
+                "reel": reel,
+                "ecart": reel - (enregistre or 0.0)
+            })
+
+            if corriger:
+                if not registre:
+                    registre = RegistreBudget(annee=a, intitule=cle)
+                    session.add(registre)
+                registre.montant = reel
+                registre.version = (registre.version or 0) + 1
+
+                budget = session.query(Budget).filter(
+                    Budget.intitule.ilike(intitule),
+                    Budget.annee == a,
+                    Budget.deleted_at == None
+                ).first()
+                if budget:
+                    budget.montantTotal = reel
+                    budget.updated_at = datetime.utcnow()
+
+    if corriger and ecarts:
+        session.commit()
 
+    return ecarts
 
-def verifier_solde_disponible(session: Session, annee: int, montant: float) -> bool:
+
+def calculer_tresorerie(session: Session, annee: int) -> dict:
     """
-    Vérifie si une nouvelle dépense peut être ajoutée sans dépasser les recettes disponibles.
+    Instantané de trésorerie d'une année : recettes, dépenses et solde calculés
+    en un seul aller-retour (UNION ALL des agrégats de chaque source).
     """
-    recettes = (
-        session.query(func.coalesce(func.sum(Don.montant), 0)).filter(func.extract('year', Don.date_don) == annee).scalar()
-        + session.query(func.coalesce(func.sum(Offrande.montant), 0)).filter(func.extract('year', Offrande.date) == annee).scalar()
-        + session.query(func.coalesce(func.sum(Quete.montant), 0)).filter(func.extract('year', Quete.date_quete) == annee).scalar()
-    )
+    sous_requetes = []
+    for cle, (_, modele, colonne_date, _) in SOURCES_BUDGET.items():
+        sous_requetes.append(
+            select(
+                literal(cle).label("source"),
+                func.coalesce(func.sum(modele.montant), 0).label("total")
+            ).where(
+                modele.deleted_at.is_(None),
+                filtre_annee(colonne_date, annee)
+            )
+        )
+
+    details = {cle: float(total) for cle, total in session.execute(union_all(*sous_requetes)).all()}
+
+    recettes = sum(total for cle, total in details.items() if SOURCES_BUDGET[cle][3] == "recette")
+    depenses = sum(total for cle, total in details.items() if SOURCES_BUDGET[cle][3] == "depense")
 
-    depenses = (
-        session.query(func.coalesce(func.sum(Achat.montant), 0)).filter(func.extract('year', Achat.date_achat) == annee).scalar()
-        + session.query(func.coalesce(func.sum(Salaire.montant), 0)).filter(func.extract('year', Salaire.date_paiement) == annee).scalar()
-    )
+    return {
+        "annee": annee,
+        "recettes": recettes,
+        "depenses": depenses,
+        "solde": recettes - depenses,
+        "details": details
+    }
 
-    solde = recettes - depenses
 
-    return montant <= solde
+def verifier_solde_disponible(session: Session, annee: int, montant: float) -> bool:
+    """
+    Vérifie si une nouvelle dépense peut être ajoutée sans dépasser les recettes disponibles.
+    """
+    return montant <= calculer_tresorerie(session, annee)["solde"]
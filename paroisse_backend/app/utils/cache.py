@@ -0,0 +1,52 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheLRU:
+    """
+    Petit cache mémoire thread-safe, borné en nombre d'entrées (LRU) et
+    optionnellement en durée de vie (ttl en secondes).
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._donnees = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def get(self, cle, defaut=None):
+        with self._verrou:
+            entree = self._donnees.get(cle)
+            if entree is None:
+                return defaut
+            valeur, expire_a = entree
+            if expire_a is not None and expire_a < time.monotonic():
+                del self._donnees[cle]
+                return defaut
+            self._donnees.move_to_end(cle)
+            return valeur
+
+    def set(self, cle, valeur):
+        expire_a = time.monotonic() + self.ttl if self.ttl else None
+        with self._verrou:
+            self._donnees[cle] = (valeur, expire_a)
+            self._donnees.move_to_end(cle)
+            while len(self._donnees) > self.maxsize:
+                self._donnees.popitem(last=False)
+
+    def invalider(self, cle):
+        with self._verrou:
+            self._donnees.pop(cle, None)
+
+    def invalider_si(self, predicat):
+        with self._verrou:
+            for cle in [c for c in self._donnees if predicat(c)]:
+                del self._donnees[cle]
+
+    def vider(self):
+        with self._verrou:
+            self._donnees.clear()
+
+    def __len__(self):
+        return len(self._donnees)
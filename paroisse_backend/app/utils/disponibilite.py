@@ -0,0 +1,265 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import List, Tuple
+
+from sqlalchemy import and_, event, exists, func, literal, or_
+from sqlalchemy.orm import Session, aliased, object_session
+
+from app.crud.stock_materiel import get_stock_actuel_par_materiel
+from app.models.pret import Pret, PretLigne
+from app.utils.cache import CacheLRU
+
+# Calendrier de disponibilité des ressources prêtables (matériel, infrastructure).
+#
+# Pour chaque ressource consultée, les prêts actifs (non supprimés, non rendus)
+# sont chargés en une requête servie par l'index (ressource, date_pret,
+# date_retour_prevue), puis rangés dans un arbre d'intervalles centré. Seul
+# l'arbre de la ressource touchée par un prêt est reconstruit, à la demande,
+# après le commit. La durée de vie borne l'écart entre plusieurs processus ;
+# le contrôle de chevauchement à la création reste fait en base.
+#
+# Une infrastructure est prêtée en entier : elle est libre ou occupée. Un
+# matériel est prêté en quantité : chaque jour, la quantité libre est le parc
+# (stock courant + quantités déjà sorties par les prêts en cours) moins les
+# quantités des prêts qui couvrent ce jour.
+
+TTL_CALENDRIER = 60  # secondes
+
+RESSOURCES = {
+    "materiel": Pret.materiel_id,
+    "infrastructure": Pret.infrastructure_id,
+}
+
+
+class _Noeud:
+    __slots__ = ("centre", "par_debut", "par_fin", "gauche", "droite")
+
+
+class ArbreIntervalles:
+    """
+    Arbre d'intervalles centré sur des intervalles de dates fermés [debut, fin].
+    chevauchements(a, b) coûte O(log n + k) pour k intervalles trouvés.
+    """
+
+    def __init__(self, intervalles):
+        # intervalles : [(debut, fin, valeur)]
+        self.taille = len(intervalles)
+        self._racine = self._construire([(d.toordinal(), f.toordinal(), d, f, v) for d, f, v in intervalles])
+
+    def _construire(self, intervalles):
+        if not intervalles:
+            return None
+
+        bornes = sorted(b for i in intervalles for b in (i[0], i[1]))
+        noeud = _Noeud()
+        noeud.centre = bornes[len(bornes) // 2]
+
+        gauche, droite, ici = [], [], []
+        for intervalle in intervalles:
+            if intervalle[1] < noeud.centre:
+                gauche.append(intervalle)
+            elif intervalle[0] > noeud.centre:
+                droite.append(intervalle)
+            else:
+                ici.append(intervalle)
+
+        noeud.par_debut = sorted(ici, key=lambda i: i[0])
+        noeud.par_fin = sorted(ici, key=lambda i: i[1], reverse=True)
+        noeud.gauche = self._construire(gauche)
+        noeud.droite = self._construire(droite)
+        return noeud
+
+    def chevauchements(self, debut: date, fin: date):
+        a, b = debut.toordinal(), fin.toordinal()
+        resultats = []
+        a_visiter = [self._racine]
+
+        while a_visiter:
+            noeud = a_visiter.pop()
+            if noeud is None:
+                continue
+            if b < noeud.centre:
+                # Les intervalles du nœud finissent après b : il suffit qu'ils commencent avant
+                for intervalle in noeud.par_debut:
+                    if intervalle[0] > b:
+                        break
+                    resultats.append(intervalle)
+                a_visiter.append(noeud.gauche)
+            elif a > noeud.centre:
+                for intervalle in noeud.par_fin:
+                    if intervalle[1] < a:
+                        break
+                    resultats.append(intervalle)
+                a_visiter.append(noeud.droite)
+            else:
+                resultats.extend(noeud.par_debut)
+                a_visiter.append(noeud.gauche)
+                a_visiter.append(noeud.droite)
+
+        return sorted(((d, f, v) for _, _, d, f, v in resultats), key=lambda i: (i[0], i[1]))
+
+
+_arbres = CacheLRU(maxsize=512, ttl=TTL_CALENDRIER)
+
+
+def prets_actifs(db: Session, ressource: str, ressource_id: int):
+    """
+    Prêts en cours de la ressource : [(pret_id, date_pret, date_retour_prevue,
+    quantité, sortie_effectuee)]. Pour un matériel, la quantité est celle de sa
+    ligne ; un prêt antérieur aux lignes en prête un exemplaire, sorti à la création.
+    """
+    if ressource == "materiel":
+        autre_ligne = aliased(PretLigne)
+        sans_lignes = ~exists().where(autre_ligne.pret_id == Pret.pret_id)
+        query = db.query(
+            Pret.pret_id,
+            Pret.date_pret,
+            Pret.date_retour_prevue,
+            func.coalesce(PretLigne.quantite, 1),
+            func.coalesce(PretLigne.sortie_effectuee, True),
+        ).outerjoin(
+            PretLigne, and_(PretLigne.pret_id == Pret.pret_id, PretLigne.materiel_id == ressource_id)
+        ).filter(or_(
+            PretLigne.ligne_id.isnot(None),
+            and_(Pret.materiel_id == ressource_id, sans_lignes)
+        ))
+    else:
+        query = db.query(
+            Pret.pret_id, Pret.date_pret, Pret.date_retour_prevue, literal(1), literal(True)
+        ).filter(RESSOURCES[ressource] == ressource_id)
+
+    return query.filter(
+        Pret.deleted_at == None,
+        Pret.date_retour_effective == None
+    ).all()
+
+
+def arbre_ressource(db: Session, ressource: str, ressource_id: int) -> Tuple[ArbreIntervalles, int]:
+    """Arbre des prêts en cours (valeur : (pret_id, quantité)) et quantité qu'ils ont déjà sortie du stock."""
+    cle = (ressource, ressource_id)
+    entree = _arbres.get(cle)
+    if entree is None:
+        prets = prets_actifs(db, ressource, ressource_id)
+        entree = (
+            ArbreIntervalles([
+                (date_pret, date_retour_prevue, (pret_id, quantite))
+                for pret_id, date_pret, date_retour_prevue, quantite, _ in prets
+            ]),
+            sum(quantite for *_, quantite, sortie in prets if sortie),
+        )
+        _arbres.set(cle, entree)
+    return entree
+
+
+def paliers(intervalles, debut: date, fin: date) -> List[Tuple[date, date, int]]:
+    """
+    Découpe [debut, fin] en paliers consécutifs de quantité prêtée constante,
+    pour des intervalles [(debut, fin, quantité)] aux dates incluses.
+    """
+    variations = defaultdict(int)
+    for debut_pret, fin_pret, quantite in intervalles:
+        if debut_pret > fin or fin_pret < debut:
+            continue
+        variations[max(debut_pret, debut)] += quantite
+        if fin_pret < fin:
+            variations[fin_pret + timedelta(days=1)] -= quantite
+
+    resultat, courant, depuis = [], 0, debut
+    for jour in sorted(variations):
+        if jour > depuis:
+            resultat.append((depuis, jour - timedelta(days=1), courant))
+            depuis = jour
+        courant += variations[jour]
+    resultat.append((depuis, fin, courant))
+
+    # Paliers voisins de même quantité (un retour et un départ le même jour) fusionnés
+    fusionnes = [resultat[0]]
+    for palier in resultat[1:]:
+        if palier[2] == fusionnes[-1][2]:
+            fusionnes[-1] = (fusionnes[-1][0], palier[1], palier[2])
+        else:
+            fusionnes.append(palier)
+    return fusionnes
+
+
+def calendrier_disponibilite(db: Session, ressource: str, ressource_id: int, debut: date, fin: date) -> dict:
+    """
+    Occupations de la ressource sur [debut, fin] (quantité prêtée par prêt) et
+    créneaux libres (dates incluses). Pour un matériel, chaque créneau porte la
+    quantité libre et "stock" donne le parc ; une infrastructure n'est libre
+    qu'en l'absence de tout prêt.
+    """
+    arbre, quantite_sortie = arbre_ressource(db, ressource, ressource_id)
+    occupations = arbre.chevauchements(debut, fin)
+
+    if ressource == "materiel":
+        stock = get_stock_actuel_par_materiel(db, ressource_id) + quantite_sortie
+    else:
+        stock = 1
+
+    libres: List[dict] = []
+    for debut_palier, fin_palier, pretee in paliers(
+        [(date_pret, date_retour_prevue, quantite) for date_pret, date_retour_prevue, (_, quantite) in occupations],
+        debut, fin
+    ):
+        if stock - pretee > 0:
+            libres.append({
+                "debut": debut_palier,
+                "fin": fin_palier,
+                "quantite": stock - pretee if ressource == "materiel" else None,
+            })
+
+    return {
+        "ressource": ressource,
+        "ressource_id": ressource_id,
+        "debut": debut,
+        "fin": fin,
+        "stock": stock if ressource == "materiel" else None,
+        "occupations": [
+            {"pret_id": pret_id, "debut": date_pret, "fin": date_retour_prevue, "quantite": quantite}
+            for date_pret, date_retour_prevue, (pret_id, quantite) in occupations
+        ],
+        "libres": libres,
+    }
+
+
+def invalider_calendrier(ressource: str, ressource_id: int):
+    _arbres.invalider((ressource, ressource_id))
+
+
+# --- INVALIDATION SUR COMMIT ---
+
+def _noter_ressources(mapper, connection, pret):
+    session = object_session(pret)
+    if session is None:
+        return
+    touchees = session.info.setdefault("calendrier_modifie", set())
+    for ressource, colonne in RESSOURCES.items():
+        valeur = getattr(pret, colonne.key)
+        if valeur is not None:
+            touchees.add((ressource, valeur))
+    # Lignes déjà chargées (chargement selectin) : pas de requête pendant le flush
+    for ligne in pret.__dict__.get("lignes", ()):
+        touchees.add(("materiel", ligne.materiel_id))
+
+
+def _noter_ligne(mapper, connection, ligne):
+    session = object_session(ligne)
+    if session is not None:
+        session.info.setdefault("calendrier_modifie", set()).add(("materiel", ligne.materiel_id))
+
+
+for _evenement in ("after_insert", "after_update", "after_delete"):
+    event.listen(Pret, _evenement, _noter_ressources)
+    event.listen(PretLigne, _evenement, _noter_ligne)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalider_apres_commit(session):
+    for ressource, ressource_id in session.info.pop("calendrier_modifie", ()):
+        invalider_calendrier(ressource, ressource_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _oublier_apres_rollback(session):
+    session.info.pop("calendrier_modifie", None)
@@ -0,0 +1,197 @@
+import logging
+from functools import lru_cache
+from io import BytesIO
+from typing import Iterable, List
+
+from fastapi.responses import StreamingResponse
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import cm
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas as pdf_canvas
+from sqlalchemy.orm import Session
+
+from app.config import PAROISSE_ADRESSE, PAROISSE_LOGO, PAROISSE_NOM
+from app.models.don import Don
+from app.utils.flux import reponse_fichier
+
+# Impression des reçus et factures : une page A4 par document.
+#
+# La partie fixe d'une page (en-tête de la paroisse, logo, cadre, libellés,
+# zone de signature) est dessinée une seule fois par PDF dans un « form
+# XObject » reportlab, puis posée sur chaque page avec doForm : le PDF ne
+# contient qu'une copie du modèle et du logo, quel que soit le nombre de
+# documents. Seules les valeurs (numéro, date, montant...) sont écrites page
+# par page, ce qui rend rapide l'impression en lot (reçus fiscaux de fin
+# d'année). L'image du logo est décodée une fois par processus.
+
+logger = logging.getLogger(__name__)
+
+MAX_DOCUMENTS_PDF = 2000
+
+LARGEUR, HAUTEUR = A4
+MARGE = 2 * cm
+X_VALEUR = MARGE + 4.5 * cm
+
+# Ordonnées des lignes du corps, partagées par le modèle (libellés) et les valeurs
+LIGNES = {
+    "numero": HAUTEUR - 8.2 * cm,
+    "date": HAUTEUR - 9.2 * cm,
+    "tiers": HAUTEUR - 10.2 * cm,
+    "objet": HAUTEUR - 11.2 * cm,
+    "montant": HAUTEUR - 12.6 * cm,
+}
+
+MODELES = {
+    "recu": {"titre": "REÇU", "tiers": "Reçu de :"},
+    "facture": {"titre": "FACTURE", "tiers": "Saisie par :"},
+}
+
+
+@lru_cache(maxsize=4)
+def _logo(chemin: str):
+    try:
+        return ImageReader(chemin)
+    except Exception as e:
+        logger.warning("Logo %s illisible, en-tête sans logo : %s", chemin, e)
+        return None
+
+
+def _montant(valeur) -> str:
+    return f"{valeur or 0:,.0f} FCFA".replace(",", " ")
+
+
+def _date(valeur) -> str:
+    return valeur.strftime("%d/%m/%Y") if valeur else ""
+
+
+def _tronquer(c, texte: str, police: str, taille: float, largeur: float) -> str:
+    if c.stringWidth(texte, police, taille) <= largeur:
+        return texte
+    while texte and c.stringWidth(texte + "…", police, taille) > largeur:
+        texte = texte[:-1]
+    return texte + "…"
+
+
+# --- MODÈLE (dessiné une fois par PDF) ---
+
+def _dessiner_modele(c, nom: str):
+    modele = MODELES[nom]
+    c.beginForm(f"modele_{nom}")
+
+    # En-tête de la paroisse
+    x_texte = MARGE
+    logo = _logo(PAROISSE_LOGO) if PAROISSE_LOGO else None
+    if logo:
+        c.drawImage(logo, MARGE, HAUTEUR - 4.2 * cm, width=2.4 * cm, height=2.4 * cm,
+                    preserveAspectRatio=True, mask="auto")
+        x_texte = MARGE + 3 * cm
+    c.setFillColor(colors.black)
+    c.setFont("Helvetica-Bold", 13)
+    c.drawString(x_texte, HAUTEUR - 2.6 * cm, PAROISSE_NOM)
+    c.setFont("Helvetica", 9)
+    c.drawString(x_texte, HAUTEUR - 3.2 * cm, PAROISSE_ADRESSE)
+    c.setStrokeColor(colors.grey)
+    c.setLineWidth(0.8)
+    c.line(MARGE, HAUTEUR - 4.6 * cm, LARGEUR - MARGE, HAUTEUR - 4.6 * cm)
+
+    # Titre et cadre
+    c.setFont("Helvetica-Bold", 20)
+    c.drawCentredString(LARGEUR / 2, HAUTEUR - 6 * cm, modele["titre"])
+    c.setLineWidth(0.5)
+    c.rect(MARGE, HAUTEUR - 13.6 * cm, LARGEUR - 2 * MARGE, 6.6 * cm)
+
+    # Libellés
+    c.setFont("Helvetica-Bold", 10)
+    libelles = {"numero": "N° :", "date": "Date :", "tiers": modele["tiers"], "objet": "Objet :", "montant": "Montant :"}
+    for cle, libelle in libelles.items():
+        c.drawString(MARGE + 0.5 * cm, LIGNES[cle], libelle)
+
+    # Signature et pied de page
+    c.setFont("Helvetica", 9)
+    c.drawString(LARGEUR - MARGE - 6 * cm, HAUTEUR - 15.5 * cm, "Le Trésorier paroissial")
+    c.line(LARGEUR - MARGE - 6 * cm, HAUTEUR - 17.5 * cm, LARGEUR - MARGE, HAUTEUR - 17.5 * cm)
+    c.setFont("Helvetica-Oblique", 7)
+    c.setFillColor(colors.grey)
+    c.drawCentredString(LARGEUR / 2, 1.2 * cm, f"{PAROISSE_NOM} - document généré électroniquement")
+
+    c.endForm()
+
+
+def _dessiner_valeurs(c, document: dict):
+    largeur_valeur = LARGEUR - MARGE - 0.5 * cm - X_VALEUR
+    c.setFillColor(colors.black)
+    c.setFont("Helvetica", 10)
+    for cle in ("numero", "date", "tiers", "objet"):
+        texte = _tronquer(c, str(document.get(cle) or "-"), "Helvetica", 10, largeur_valeur)
+        c.drawString(X_VALEUR, LIGNES[cle], texte)
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(X_VALEUR, LIGNES["montant"], document["montant"])
+
+
+def generer_documents_pdf(documents: Iterable[dict], titre: str = "Documents") -> BytesIO:
+    """
+    Rend les documents (dictionnaires produits par documents_recus / document_facture)
+    dans un seul PDF, une page chacun.
+    """
+    tampon = BytesIO()
+    c = pdf_canvas.Canvas(tampon, pagesize=A4, pageCompression=1)
+    c.setTitle(titre)
+    c.setAuthor(PAROISSE_NOM)
+
+    modeles_dessines = set()
+    for document in documents:
+        nom = document["modele"]
+        if nom not in modeles_dessines:
+            _dessiner_modele(c, nom)
+            modeles_dessines.add(nom)
+        c.doForm(f"modele_{nom}")
+        _dessiner_valeurs(c, document)
+        c.showPage()
+
+    c.save()
+    tampon.seek(0)
+    return tampon
+
+
+def reponse_documents_pdf(documents: Iterable[dict], nom_fichier: str, titre: str = "Documents") -> StreamingResponse:
+    return reponse_fichier(generer_documents_pdf(documents, titre), "application/pdf", nom_fichier)
+
+
+# --- DONNÉES DES DOCUMENTS ---
+
+def documents_recus(db: Session, recus: List) -> List[dict]:
+    # Les reçus de dons portent le nom du donateur : une seule requête pour tout le lot
+    ids_dons = {r.source_id for r in recus if r.source_type == "don" and r.source_id}
+    donateurs = dict(
+        db.query(Don.don_id, Don.donateur).filter(Don.don_id.in_(ids_dons)).all()
+    ) if ids_dons else {}
+
+    return [
+        {
+            "modele": "recu",
+            "numero": recu.numero or f"#{recu.recu_id}",
+            "date": _date(recu.date_emission),
+            "tiers": donateurs.get(recu.source_id) if recu.source_type == "don" else None,
+            "objet": recu.description,
+            "montant": _montant(recu.montant),
+        }
+        for recu in recus
+    ]
+
+
+def document_facture(facture) -> dict:
+    utilisateur = facture.utilisateur
+    return {
+        "modele": "facture",
+        "numero": facture.numero,
+        "date": _date(facture.date_facture),
+        "tiers": " ".join(filter(None, (utilisateur.prenom, utilisateur.nom))) if utilisateur else None,
+        "objet": facture.description,
+        "montant": _montant(facture.montant),
+    }
+
+
+def nom_fichier_pdf(prefixe: str, numero) -> str:
+    numero = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in str(numero))
+    return f"{prefixe}_{numero}.pdf"
@@ -0,0 +1,66 @@
+from datetime import date
+
+from sqlalchemy.orm import Session
+
+from app.models.notification import Notification, TypeNotificationEnum
+from app.utils.budget import update_budget_reel
+from app.utils.recu import generate_recu
+
+# Unité de travail des écritures financières (don, offrande, quête) : l'écriture,
+# son reçu, la variation du registre budgétaire et la notification sont ajoutés
+# à la session puis validés par un seul commit. En cas d'erreur, rien n'est
+# conservé (ni reçu orphelin, ni budget décalé).
+
+
+def enregistrer_ecriture(
+    db: Session,
+    ecriture,
+    source: str,
+    reference: str,
+    montant: float,
+    date_ecriture: date,
+    utilisateur_id: int,
+    titre_notification: str,
+    message_notification: str
+):
+    """
+    `source` est l'intitulé budgétaire ("Don", "Offrande", "Quête") et
+    `reference` le nom de la clé primaire de l'écriture (ex. "don_id").
+    `date_ecriture` fixe l'année du budget et la date (donc le numéro) du reçu.
+    Renvoie l'écriture rafraîchie ; lève l'exception d'origine après rollback.
+    """
+    db.add(ecriture)
+    try:
+        db.flush()  # pour obtenir l'identifiant de l'écriture
+
+        generate_recu(
+            db=db,
+            montant=montant,
+            source=source,
+            reference_id=getattr(ecriture, reference),
+            utilisateur_id=utilisateur_id,
+            date_emission=date_ecriture
+        )
+
+        update_budget_reel(
+            session=db,
+            annee=date_ecriture.year,
+            intitule=source,
+            utilisateur_id=utilisateur_id,
+            delta=montant
+        )
+
+        db.add(Notification(
+            titre=titre_notification,
+            message=message_notification,
+            type=TypeNotificationEnum.success,
+            utilisateur_id=utilisateur_id
+        ))
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    db.refresh(ecriture)
+    return ecriture
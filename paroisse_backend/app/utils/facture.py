@@ -11,6 +11,6 @@ def generate_facture(db: Session, montant: float, type_facture: str, reference_i
         utilisateur_id=utilisateur_id
     )
     db.add(nouvelle_facture)
-    db.commit()
-    db.refresh(nouvelle_facture)
+    # Pas de commit : la facture est validée par la transaction de l'appelant
+    db.flush()
     return nouvelle_facture
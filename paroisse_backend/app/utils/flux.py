@@ -0,0 +1,36 @@
+import tempfile
+
+from fastapi.responses import StreamingResponse
+
+# Envoi des fichiers générés (PDF, Excel) : le document est écrit dans un
+# fichier temporaire « spoolé » (en mémoire tant qu'il est petit, sur disque
+# au-delà de SEUIL_MEMOIRE) puis renvoyé par morceaux ; la mémoire reste bornée
+# quelle que soit la taille de l'export. Le fichier est fermé, donc supprimé,
+# une fois la réponse envoyée ou interrompue.
+
+TAILLE_MORCEAU = 64 * 1024
+SEUIL_MEMOIRE = 1024 * 1024
+
+
+def fichier_temporaire():
+    return tempfile.SpooledTemporaryFile(max_size=SEUIL_MEMOIRE)
+
+
+def morceaux(fichier):
+    try:
+        while True:
+            morceau = fichier.read(TAILLE_MORCEAU)
+            if not morceau:
+                break
+            yield morceau
+    finally:
+        fichier.close()
+
+
+def reponse_fichier(fichier, media_type: str, nom_fichier: str) -> StreamingResponse:
+    fichier.seek(0)
+    return StreamingResponse(
+        morceaux(fichier),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{nom_fichier}"'}
+    )
@@ -0,0 +1,276 @@
+import codecs
+import csv
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, Tuple, Type
+
+from openpyxl import load_workbook
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.orm import Session
+
+from app.models.don import Don
+from app.models.notification import Notification, TypeNotificationEnum
+from app.models.offrande import Offrande
+from app.models.quete import Quete
+from app.schemas.don import DonCreate
+from app.schemas.offrande import OffrandeCreate
+from app.schemas.quete import QueteCreate
+from app.utils.budget import update_budget_reel
+from app.utils.recu import creer_recus
+
+# Import en masse de registres historiques (dons, offrandes, quêtes) depuis un
+# fichier CSV ou XLSX. Chaque ligne est validée avec le schéma de création de
+# l'entité ; les lignes valides sont insérées par lots, avec leur reçu, puis le
+# budget de chaque année touchée est mis à jour une seule fois à la fin. Un
+# seul commit couvre tout le fichier, et il est tout ou rien : dès qu'une ligne
+# est invalide, plus rien n'est inséré, la lecture continue seulement pour
+# rapporter toutes les erreurs, puis la transaction est annulée.
+#
+# Les insertions passent par l'ORM (session.add_all + flush) : les événements
+# de l'index de recherche et des totaux restent donc à jour.
+
+TAILLE_LOT_IMPORT = 1000
+MAX_ERREURS_RAPPORTEES = 1000
+
+_RE_DATE_FR = re.compile(r"^(\d{1,2})/(\d{1,2})/(\d{4})$")
+
+
+@dataclass(frozen=True)
+class EntiteImport:
+    modele: Type
+    schema: Type[BaseModel]
+    source: str          # intitulé budgétaire et libellé des reçus
+    colonne_id: str
+    colonne_date: str    # attribut du schéma portant la date de l'écriture
+    vers_modele: Callable[[BaseModel, datetime], dict]
+
+
+def _date_ecriture(valeur) -> datetime:
+    if isinstance(valeur, datetime):
+        return valeur
+    return datetime(valeur.year, valeur.month, valeur.day)
+
+
+ENTITES_IMPORT: Dict[str, EntiteImport] = {
+    "don": EntiteImport(
+        modele=Don,
+        schema=DonCreate,
+        source="Don",
+        colonne_id="don_id",
+        colonne_date="date_don",
+        vers_modele=lambda d, quand: {
+            "donateur": d.donateur,
+            "montant": d.montant,
+            "type": d.type.value,
+            "date_don": quand,
+            "commentaire": d.commentaire,
+        },
+    ),
+    "offrande": EntiteImport(
+        modele=Offrande,
+        schema=OffrandeCreate,
+        source="Offrande",
+        colonne_id="offrande_id",
+        colonne_date="date_offrande",
+        vers_modele=lambda d, quand: {
+            "date": d.date_offrande,
+            "montant": d.montant,
+            "type": d.type,
+            "description": d.description,
+        },
+    ),
+    "quete": EntiteImport(
+        modele=Quete,
+        schema=QueteCreate,
+        source="Quête",
+        colonne_id="quete_id",
+        colonne_date="date_quete",
+        vers_modele=lambda d, quand: {
+            "libelle": d.libelle,
+            "montant": d.montant,
+            "date_quete": quand,
+        },
+    ),
+}
+
+
+# --- LECTURE DU FICHIER ---
+
+def _entete(valeur) -> str:
+    return str(valeur or "").strip().lower()
+
+
+def lire_csv(fichier) -> Iterator[dict]:
+    # Lecture en flux ; le séparateur (virgule ou point-virgule, fréquent avec
+    # Excel en français) est déduit de la ligne d'en-tête
+    texte = codecs.getreader("utf-8-sig")(fichier)
+    premiere = texte.readline()
+    separateur = ";" if premiere.count(";") > premiere.count(",") else ","
+    entetes = [_entete(e) for e in next(csv.reader([premiere], delimiter=separateur), [])]
+    for valeurs in csv.reader(texte, delimiter=separateur):
+        yield dict(zip(entetes, valeurs))
+
+
+def lire_xlsx(fichier) -> Iterator[dict]:
+    wb = load_workbook(fichier, read_only=True, data_only=True)
+    try:
+        lignes = wb.active.iter_rows(values_only=True)
+        entetes = [_entete(e) for e in next(lignes, ())]
+        for valeurs in lignes:
+            yield dict(zip(entetes, valeurs))
+    finally:
+        wb.close()
+
+
+def lire_lignes(fichier, nom_fichier: str) -> Iterator[dict]:
+    if (nom_fichier or "").lower().endswith(".xlsx"):
+        return lire_xlsx(fichier)
+    return lire_csv(fichier)
+
+
+def _normaliser(cle: str, valeur):
+    # Cellules vides -> None ; dates "jj/mm/aaaa" et montants "1 500,50" des registres papier
+    if isinstance(valeur, str):
+        valeur = valeur.strip()
+        if not valeur:
+            return None
+        correspondance = _RE_DATE_FR.match(valeur)
+        if correspondance:
+            jour, mois, annee = correspondance.groups()
+            return f"{annee}-{int(mois):02d}-{int(jour):02d}"
+        if cle == "montant":
+            return valeur.replace(" ", "").replace("\u00a0", "").replace(",", ".")
+    return valeur
+
+
+# --- IMPORT ---
+
+def _valider(cfg: EntiteImport, brute: dict, utilisateur_id: int, maintenant: datetime) -> Tuple[dict, datetime]:
+    donnees = {cle: _normaliser(cle, v) for cle, v in brute.items() if cle}
+    # Comme à la création unitaire, l'écriture est rattachée à l'utilisateur connecté
+    donnees["utilisateur_id"] = utilisateur_id
+    ecriture = cfg.schema.model_validate(donnees)
+
+    if ecriture.montant is None or ecriture.montant <= 0:
+        raise ValueError("Le montant doit être strictement positif.")
+    quand = _date_ecriture(getattr(ecriture, cfg.colonne_date) or maintenant)
+    if quand > maintenant:
+        raise ValueError("La date ne peut pas être dans le futur.")
+
+    colonnes = cfg.vers_modele(ecriture, quand)
+    colonnes["utilisateur_id"] = utilisateur_id
+    return colonnes, quand
+
+
+def _message_erreur(exc: Exception) -> str:
+    if isinstance(exc, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(p) for p in e['loc']) or 'ligne'} : {e['msg']}" for e in exc.errors()
+        )
+    return str(exc)
+
+
+def _inserer_lot(db: Session, cfg: EntiteImport, lot, utilisateur_id: int) -> int:
+    ecritures = [cfg.modele(**colonnes) for colonnes, _ in lot]
+    db.add_all(ecritures)
+    db.flush()  # identifiants nécessaires aux reçus
+
+    # Un bloc de numéros de reçu par année du lot
+    creer_recus(db, [
+        {
+            "montant": colonnes["montant"],
+            "source": cfg.source,
+            "reference_id": getattr(ecriture, cfg.colonne_id),
+            "date_emission": quand,
+        }
+        for ecriture, (colonnes, quand) in zip(ecritures, lot)
+    ], utilisateur_id)
+    return len(ecritures)
+
+
+def importer_ecritures(
+    db: Session,
+    entite: str,
+    lignes: Iterable[dict],
+    utilisateur_id: int,
+    taille_lot: int = TAILLE_LOT_IMPORT
+) -> dict:
+    """
+    Importe les lignes (dictionnaires en-tête -> valeur) et renvoie le rapport :
+    lignes lues, importées, reçus générés, années budgétaires recalculées et
+    erreurs par ligne (numéro de ligne du fichier, en-tête = ligne 1). Si une
+    ligne est invalide, rien n'est enregistré (enregistre = False).
+    """
+    cfg = ENTITES_IMPORT[entite]
+    maintenant = datetime.utcnow()
+    lues = importees = nb_erreurs = 0
+    erreurs = []
+    montants_par_annee = defaultdict(float)
+    lot = []
+
+    try:
+        for numero, brute in enumerate(lignes, start=2):
+            if not any(v not in (None, "") for v in brute.values()):
+                continue  # ligne vide
+            lues += 1
+            try:
+                colonnes, quand = _valider(cfg, brute, utilisateur_id, maintenant)
+            except (ValidationError, ValueError, TypeError) as e:
+                nb_erreurs += 1
+                if len(erreurs) < MAX_ERREURS_RAPPORTEES:
+                    erreurs.append({"ligne": numero, "message": _message_erreur(e)})
+                lot = []
+                continue
+            if nb_erreurs:
+                continue  # import déjà voué à l'annulation : validation seule
+
+            lot.append((colonnes, quand))
+            montants_par_annee[quand.year] += colonnes["montant"]
+            if len(lot) >= taille_lot:
+                importees += _inserer_lot(db, cfg, lot, utilisateur_id)
+                lot = []
+
+        if nb_erreurs:
+            db.rollback()
+            return {
+                "entite": entite,
+                "enregistre": False,
+                "lignes_lues": lues,
+                "importees": 0,
+                "recus": 0,
+                "annees_budget": [],
+                "nb_erreurs": nb_erreurs,
+                "erreurs": erreurs,
+            }
+
+        if lot:
+            importees += _inserer_lot(db, cfg, lot, utilisateur_id)
+
+        # Une seule mise à jour du registre budgétaire par année touchée
+        for annee, delta in sorted(montants_par_annee.items()):
+            update_budget_reel(db, annee, cfg.source, utilisateur_id, delta=delta)
+
+        if importees:
+            db.add(Notification(
+                titre=f"Import {cfg.source}",
+                message=f"{importees} écriture(s) importée(s).",
+                type=TypeNotificationEnum.success,
+                utilisateur_id=utilisateur_id
+            ))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return {
+        "entite": entite,
+        "enregistre": True,
+        "lignes_lues": lues,
+        "importees": importees,
+        "recus": importees,
+        "annees_budget": sorted(montants_par_annee),
+        "nb_erreurs": nb_erreurs,
+        "erreurs": erreurs,
+    }
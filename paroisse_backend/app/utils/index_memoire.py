@@ -0,0 +1,363 @@
+import bisect
+import logging
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import event, literal
+from sqlalchemy.orm import Session, object_session
+
+from app.config import INDEX_RECHERCHE_MEMOIRE, INDEX_RECHERCHE_MAX_MO
+from app.utils.recherche import ENTITES_RECHERCHE, OPERATEURS, analyser_requete, sans_accents
+
+logger = logging.getLogger(__name__)
+
+# Index inversé en mémoire pour les suggestions (saisie semi-automatique) :
+# construit au démarrage depuis la base, puis tenu à jour par les événements
+# ORM after_insert / after_update / after_delete. Les modifications ne sont
+# appliquées qu'après le commit de la session (rien n'entre dans l'index si la
+# transaction est annulée).
+#
+# L'index est optionnel (INDEX_RECHERCHE_MEMOIRE=1) et borné par un budget
+# mémoire estimé (INDEX_RECHERCHE_MAX_MO). Tant qu'il n'est pas prêt, ou s'il
+# dépasse son budget, rechercher_memoire() renvoie None et l'appelant repasse
+# par la recherche SQL.
+#
+# Limite : les mises à jour en masse (query.update(), SQL brut) ne déclenchent
+# pas les événements ORM ; une reconstruction remet l'index d'aplomb.
+
+_RE_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# Estimation grossière du coût d'une entrée (dict, set, tuple) en octets
+_COUT_DOCUMENT = 250
+_COUT_POSTING = 80
+_COUT_TERME = 120
+
+
+def tokeniser(texte: Optional[str]) -> frozenset:
+    if not texte:
+        return frozenset()
+    return frozenset(t for t in _RE_TOKEN.findall(sans_accents(texte.lower())) if len(t) > 1)
+
+
+@dataclass(frozen=True)
+class Document:
+    entite: str
+    id: int
+    titre: Optional[str]
+    date: object
+    montant: Optional[float]
+    categorie: Optional[str]
+    termes: frozenset
+
+    @property
+    def cle(self):
+        return (self.entite, self.id)
+
+    @property
+    def jour(self) -> Optional[date]:
+        return self.date.date() if isinstance(self.date, datetime) else self.date
+
+
+def _categorie(valeur):
+    return getattr(valeur, "value", valeur)
+
+
+def _document(entite, identifiant, titre, date_ligne, montant, categorie, textes) -> Document:
+    return Document(
+        entite=entite,
+        id=identifiant,
+        titre=str(titre) if titre is not None else None,
+        date=date_ligne,
+        montant=float(montant) if montant is not None else None,
+        categorie=_categorie(categorie),
+        termes=tokeniser(" ".join(str(t) for t in textes if t)),
+    )
+
+
+class IndexMemoire:
+    def __init__(self, max_octets: int):
+        self.max_octets = max_octets
+        self._verrou = threading.RLock()
+        self._reinitialiser()
+        self.etat = "vide"  # vide, construction, pret, depasse
+        self.construit_le = None
+        self.duree_construction = None
+        self._en_attente = None  # modifications reçues pendant une construction
+
+    def _reinitialiser(self):
+        self._documents = {}
+        self._postings = defaultdict(set)
+        self._vocabulaire = []  # termes triés, pour la recherche par préfixe
+        self.octets = 0
+
+    @property
+    def pret(self) -> bool:
+        return self.etat == "pret"
+
+    # --- Écriture ---
+
+    def _ajouter(self, doc: Document):
+        self._retirer(doc.cle)
+        self._documents[doc.cle] = doc
+        self.octets += _COUT_DOCUMENT + sys.getsizeof(doc.titre or "")
+        for terme in doc.termes:
+            postings = self._postings.get(terme)
+            if postings is None:
+                postings = self._postings[terme]
+                bisect.insort(self._vocabulaire, terme)
+                self.octets += _COUT_TERME + sys.getsizeof(terme)
+            postings.add(doc.cle)
+            self.octets += _COUT_POSTING
+
+    def _retirer(self, cle):
+        doc = self._documents.pop(cle, None)
+        if doc is None:
+            return
+        self.octets -= _COUT_DOCUMENT + sys.getsizeof(doc.titre or "")
+        for terme in doc.termes:
+            postings = self._postings[terme]
+            postings.discard(cle)
+            self.octets -= _COUT_POSTING
+            if not postings:
+                del self._postings[terme]
+                del self._vocabulaire[bisect.bisect_left(self._vocabulaire, terme)]
+                self.octets -= _COUT_TERME + sys.getsizeof(terme)
+
+    def _verifier_budget(self) -> bool:
+        if self.octets <= self.max_octets:
+            return True
+        logger.warning(
+            "Index de recherche en mémoire désactivé : budget de %s Mo dépassé", self.max_octets // 2**20
+        )
+        self._reinitialiser()
+        self.etat = "depasse"
+        return False
+
+    def appliquer(self, modifications):
+        """modifications : liste de Document (ajout/mise à jour) ou de clés (suppression)."""
+        with self._verrou:
+            if self.etat == "construction":
+                self._en_attente.extend(modifications)
+                return
+            if self.etat != "pret":
+                return
+            for modification in modifications:
+                if isinstance(modification, Document):
+                    self._ajouter(modification)
+                else:
+                    self._retirer(modification)
+            self._verifier_budget()
+
+    def construire(self, db: Session):
+        with self._verrou:
+            if self.etat == "construction":
+                return
+            self.etat = "construction"
+            self._en_attente = []
+            self._reinitialiser()
+
+        debut = time.monotonic()
+        try:
+            for entite, cfg in ENTITES_RECHERCHE.items():
+                lignes = db.query(
+                    cfg.colonne_id,
+                    cfg.colonne_titre,
+                    cfg.colonne_date,
+                    cfg.colonne_montant if cfg.colonne_montant is not None else literal(None),
+                    cfg.colonne_categorie if cfg.colonne_categorie is not None else literal(None),
+                    *cfg.colonnes_texte
+                ).filter(cfg.modele.deleted_at == None).yield_per(1000)
+
+                for identifiant, titre, date_ligne, montant, categorie, *textes in lignes:
+                    doc = _document(entite, identifiant, titre, date_ligne, montant, categorie, textes)
+                    with self._verrou:
+                        self._ajouter(doc)
+                        if not self._verifier_budget():
+                            self._en_attente = None
+                            return
+        except Exception:
+            with self._verrou:
+                self._reinitialiser()
+                self.etat = "vide"
+                self._en_attente = None
+            raise
+
+        with self._verrou:
+            # Rejoue les commits survenus pendant la lecture de la base
+            en_attente, self._en_attente = self._en_attente, None
+            self.etat = "pret"
+            self.construit_le = datetime.utcnow()
+            self.duree_construction = time.monotonic() - debut
+            self.appliquer(en_attente)
+
+    # --- Lecture ---
+
+    def _cles_prefixe(self, prefixe: str):
+        cles, exactes = set(), set()
+        i = bisect.bisect_left(self._vocabulaire, prefixe)
+        while i < len(self._vocabulaire) and self._vocabulaire[i].startswith(prefixe):
+            terme = self._vocabulaire[i]
+            cles |= self._postings[terme]
+            if terme == prefixe:
+                exactes = self._postings[terme]
+            i += 1
+        return cles, exactes
+
+    def rechercher(self, q: str, entites=None, limite: int = 10, categories: Optional[dict] = None):
+        """
+        Chaque terme est cherché en préfixe (ET logique) ; les filtres montant et
+        date de analyser_requete() s'appliquent aussi. `categories` restreint une
+        entité à certaines catégories (ex. {"rapport": {"financier"}}).
+        Renvoie None si l'index n'est pas utilisable.
+        """
+        requete = analyser_requete(q)
+        termes = [sans_accents(t) for t in requete.termes]
+        if not termes:
+            return None
+
+        with self._verrou:
+            if not self.pret:
+                return None
+            candidats, score = None, defaultdict(int)
+            for terme in termes:
+                cles, exactes = self._cles_prefixe(terme)
+                candidats = cles if candidats is None else candidats & cles
+                if not candidats:
+                    return []
+                for cle in exactes:
+                    score[cle] += 1
+            documents = [self._documents[cle] for cle in candidats]
+
+        entites = set(entites or ENTITES_RECHERCHE)
+        categories = categories or {}
+        resultats = []
+        for doc in documents:
+            if doc.entite not in entites:
+                continue
+            if doc.entite in categories and doc.categorie not in categories[doc.entite]:
+                continue
+            if requete.montants and (doc.montant is None or not all(
+                OPERATEURS[operateur](doc.montant, valeur) for operateur, valeur in requete.montants
+            )):
+                continue
+            if requete.date_debut is not None and (doc.jour is None or doc.jour < requete.date_debut):
+                continue
+            if requete.date_fin is not None and (doc.jour is None or doc.jour >= requete.date_fin):
+                continue
+            resultats.append({
+                "type": doc.entite,
+                "id": doc.id,
+                "titre": doc.titre,
+                "date": doc.date,
+                "montant": doc.montant,
+                # Tous les termes correspondent ; bonus pour chaque mot complet
+                "score": float(len(termes) + score[doc.cle]),
+            })
+
+        resultats.sort(key=lambda r: (r["score"], str(r["date"] or "")), reverse=True)
+        return resultats[:limite]
+
+    def statistiques(self) -> dict:
+        with self._verrou:
+            return {
+                "actif": INDEX_RECHERCHE_MEMOIRE,
+                "etat": self.etat,
+                "documents": len(self._documents),
+                "termes": len(self._vocabulaire),
+                "octets_estimes": self.octets,
+                "budget_octets": self.max_octets,
+                "construit_le": self.construit_le,
+                "duree_construction": self.duree_construction,
+            }
+
+
+index_memoire = IndexMemoire(max_octets=INDEX_RECHERCHE_MAX_MO * 2**20)
+
+
+def rechercher_memoire(q: str, entites=None, limite: int = 10, categories: Optional[dict] = None):
+    if not INDEX_RECHERCHE_MEMOIRE:
+        return None
+    return index_memoire.rechercher(q, entites, limite, categories)
+
+
+def reconstruire_index_memoire(session_factory):
+    """Reconstruit l'index depuis la base (au démarrage ou à la demande)."""
+    db = session_factory()
+    try:
+        index_memoire.construire(db)
+    except Exception:
+        logger.exception("Échec de la construction de l'index de recherche en mémoire")
+    finally:
+        db.close()
+
+
+def lancer_reconstruction(session_factory) -> bool:
+    """Lance la reconstruction dans un thread ; False si elle est déjà en cours."""
+    if index_memoire.etat == "construction":
+        return False
+    threading.Thread(
+        target=reconstruire_index_memoire, args=(session_factory,), name="index-recherche", daemon=True
+    ).start()
+    return True
+
+
+# --- MISE À JOUR INCRÉMENTALE ---
+
+_ENTITE_PAR_MODELE = {cfg.modele: entite for entite, cfg in ENTITES_RECHERCHE.items()}
+
+
+def _noter(instance, supprime: bool):
+    session = object_session(instance)
+    if session is None:
+        return
+    entite = _ENTITE_PAR_MODELE[type(instance)]
+    cfg = ENTITES_RECHERCHE[entite]
+    identifiant = getattr(instance, cfg.colonne_id.key)
+
+    # Instantané pris pendant le flush : après le commit les attributs sont expirés
+    if supprime or instance.deleted_at is not None:
+        modification = (entite, identifiant)
+    else:
+        def valeur(colonne):
+            return getattr(instance, colonne.key) if colonne is not None else None
+
+        modification = _document(
+            entite, identifiant, valeur(cfg.colonne_titre), valeur(cfg.colonne_date),
+            valeur(cfg.colonne_montant), valeur(cfg.colonne_categorie),
+            [valeur(c) for c in cfg.colonnes_texte]
+        )
+    session.info.setdefault("index_memoire", []).append(modification)
+
+
+def _apres_ecriture(mapper, connection, instance):
+    if INDEX_RECHERCHE_MEMOIRE:
+        _noter(instance, supprime=False)
+
+
+def _apres_suppression(mapper, connection, instance):
+    if INDEX_RECHERCHE_MEMOIRE:
+        _noter(instance, supprime=True)
+
+
+for _cfg in ENTITES_RECHERCHE.values():
+    event.listen(_cfg.modele, "after_insert", _apres_ecriture)
+    event.listen(_cfg.modele, "after_update", _apres_ecriture)
+    event.listen(_cfg.modele, "after_delete", _apres_suppression)
+
+
+@event.listens_for(Session, "after_commit")
+def _appliquer_apres_commit(session):
+    modifications = session.info.pop("index_memoire", None)
+    if modifications:
+        index_memoire.appliquer(modifications)
+
+
+@event.listens_for(Session, "after_rollback")
+def _oublier_apres_rollback(session):
+    session.info.pop("index_memoire", None)
@@ -0,0 +1,145 @@
+import base64
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Optional
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import and_, or_
+
+# Pagination par curseur (keyset) : au lieu d'un OFFSET, qui oblige la base à
+# parcourir puis jeter toutes les lignes des pages précédentes, on reprend
+# juste après le dernier couple (date, id) renvoyé. Chaque page coûte donc le
+# même prix, quelle que soit sa profondeur. Le curseur est opaque pour le client.
+#
+# Les anciens clients envoient encore `?skip=` : sans curseur, ce décalage est
+# accepté (OFFSET) le temps de leur migration, puis la réponse leur donne un
+# curseur normal pour la suite. Les recherches, triées par pertinence, ne se
+# prêtent pas au keyset : elles sont plafonnées à LIMITE_MAX lignes.
+
+LIMITE_DEFAUT = 100
+LIMITE_MAX = 500
+EN_TETE_CURSEUR = "X-Next-Cursor"
+
+
+def _encoder_valeur(valeur):
+    if isinstance(valeur, datetime):
+        return {"dt": valeur.isoformat()}
+    if isinstance(valeur, date):
+        return {"d": valeur.isoformat()}
+    return valeur
+
+
+def _decoder_valeur(valeur):
+    if isinstance(valeur, dict):
+        if "dt" in valeur:
+            return datetime.fromisoformat(valeur["dt"])
+        if "d" in valeur:
+            return date.fromisoformat(valeur["d"])
+        raise ValueError("Curseur invalide")
+    return valeur
+
+
+def encoder_curseur(valeur_date, identifiant) -> str:
+    brut = json.dumps([_encoder_valeur(valeur_date), identifiant], separators=(",", ":"))
+    return base64.urlsafe_b64encode(brut.encode()).decode().rstrip("=")
+
+
+def _lire_curseur(curseur: str):
+    try:
+        return json.loads(base64.urlsafe_b64decode(curseur + "=" * (-len(curseur) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Curseur invalide") from e
+
+
+def decoder_curseur(curseur: str):
+    try:
+        valeur_date, identifiant = _lire_curseur(curseur)
+        return _decoder_valeur(valeur_date), int(identifiant)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Curseur invalide") from e
+
+
+def encoder_decalage(decalage: int) -> str:
+    """Curseur interne portant un `skip` hérité (pagination par OFFSET)."""
+    brut = json.dumps({"skip": decalage}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(brut.encode()).decode().rstrip("=")
+
+
+def decalage_curseur(curseur: str) -> Optional[int]:
+    """Décalage porté par un curseur `encoder_decalage`, None pour un curseur keyset."""
+    try:
+        valeur = _lire_curseur(curseur)
+    except ValueError:
+        return None
+    if isinstance(valeur, dict) and isinstance(valeur.get("skip"), int):
+        return valeur["skip"]
+    return None
+
+
+def paginer(query, colonne_date, colonne_id, curseur: str = None, limite: int = LIMITE_DEFAUT):
+    """
+    Applique un tri (date, id) décroissant et renvoie (lignes, next_cursor).
+    next_cursor vaut None sur la dernière page. Lève ValueError si le curseur
+    est illisible.
+    """
+    limite = max(1, min(limite, LIMITE_MAX))
+    decalage = decalage_curseur(curseur) if curseur else None
+
+    if curseur and decalage is None:
+        valeur_date, identifiant = decoder_curseur(curseur)
+        if valeur_date is None:
+            # Déjà dans la queue des lignes sans date
+            query = query.filter(colonne_date.is_(None), colonne_id < identifiant)
+        else:
+            query = query.filter(or_(
+                colonne_date < valeur_date,
+                and_(colonne_date == valeur_date, colonne_id < identifiant),
+                colonne_date.is_(None)
+            ))
+
+    # Une ligne de plus que demandé suffit à savoir s'il existe une page suivante.
+    # Les dates NULL sont les plus petites pour MySQL et SQLite : en tri
+    # décroissant elles forment la fin de la liste, parcourue par id.
+    query = query.order_by(colonne_date.desc(), colonne_id.desc())
+    if decalage:
+        query = query.offset(decalage)
+    lignes = query.limit(limite + 1).all()
+
+    if len(lignes) <= limite:
+        return lignes, None
+
+    lignes = lignes[:limite]
+    derniere = lignes[-1]
+    return lignes, encoder_curseur(getattr(derniere, colonne_date.key), getattr(derniere, colonne_id.key))
+
+
+# --- CÔTÉ ROUTES ---
+
+@dataclass
+class Pagination:
+    curseur: Optional[str]
+    limite: int
+
+
+def parametres_pagination(
+    cursor: Optional[str] = Query(None, description="Curseur renvoyé dans l'en-tête X-Next-Cursor"),
+    skip: int = Query(0, ge=0, deprecated=True, description="Décalage hérité, ignoré si `cursor` est fourni"),
+    limit: int = Query(LIMITE_DEFAUT, ge=1, le=LIMITE_MAX)
+) -> Pagination:
+    if cursor:
+        try:
+            decoder_curseur(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+    elif skip:
+        cursor = encoder_decalage(skip)
+    return Pagination(curseur=cursor, limite=limit)
+
+
+def page(response: Response, lignes, next_cursor):
+    # Le corps reste une liste (compatibilité des clients) ; le curseur de la
+    # page suivante est transmis dans un en-tête.
+    if next_cursor:
+        response.headers[EN_TETE_CURSEUR] = next_cursor
+    return lignes
@@ -0,0 +1,27 @@
+from datetime import date
+from sqlalchemy import and_
+
+
+# Les filtres par période sont exprimés en intervalles semi-ouverts [début, fin)
+# plutôt qu'avec extract()/year()/month(), qui empêchent l'usage des index sur
+# les colonnes de date. Des bornes de type date conviennent aux colonnes Date
+# comme DateTime (MySQL et SQLite).
+
+def bornes_annee(annee: int):
+    return date(annee, 1, 1), date(annee + 1, 1, 1)
+
+
+def bornes_mois(annee: int, mois: int):
+    debut = date(annee, mois, 1)
+    fin = date(annee + 1, 1, 1) if mois == 12 else date(annee, mois + 1, 1)
+    return debut, fin
+
+
+def filtre_annee(colonne, annee: int):
+    debut, fin = bornes_annee(annee)
+    return and_(colonne >= debut, colonne < fin)
+
+
+def filtre_mois(colonne, annee: int, mois: int):
+    debut, fin = bornes_mois(annee, mois)
+    return and_(colonne >= debut, colonne < fin)
@@ -0,0 +1,38 @@
+from fastapi.responses import StreamingResponse
+from openpyxl import Workbook
+
+from app.utils.flux import fichier_temporaire, reponse_fichier
+
+# Les exports Excel utilisent le mode "write_only" d'openpyxl : les lignes sont
+# sérialisées au fil de l'eau au lieu d'être gardées en mémoire sous forme de
+# cellules, ce qui permet d'exporter des dizaines de milliers de lignes. Le
+# classeur est enregistré dans un fichier temporaire (sur disque au-delà d'un
+# Mo) puis renvoyé par morceaux : il n'est jamais entièrement en mémoire.
+
+MEDIA_TYPE_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def classeur():
+    return Workbook(write_only=True)
+
+
+def ajouter_feuille(wb, titre: str, lignes, entetes=None):
+    # Excel limite les noms de feuille à 31 caractères
+    ws = wb.create_sheet(title=titre[:31])
+    if entetes:
+        ws.append(list(entetes))
+    for ligne in lignes:
+        ws.append(list(ligne))
+    return ws
+
+
+def reponse_excel(wb, nom_fichier: str) -> StreamingResponse:
+    fichier = fichier_temporaire()
+    try:
+        wb.save(fichier)
+    except Exception:
+        fichier.close()
+        raise
+    finally:
+        wb.close()
+    return reponse_fichier(fichier, MEDIA_TYPE_XLSX, nom_fichier)
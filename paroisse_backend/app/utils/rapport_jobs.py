@@ -0,0 +1,318 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO
+
+from app.config import (
+    RAPPORTS_DIR,
+    RAPPORTS_WORKERS,
+    RAPPORTS_FRAICHEUR_SECONDES,
+    RAPPORTS_CONSERVATION_HEURES
+)
+from app.crud import rapport as crud_rapport
+from app.database import SessionLocal
+from app.utils.rapport_excel import classeur, MEDIA_TYPE_XLSX
+from app.utils.rapport_pdf import generer_pdf
+from app.utils.rapport_rendu import (
+    blocs_financier, blocs_administratif, blocs_materiel, blocs_audit,
+    remplir_classeur_financier, remplir_classeur_administratif,
+    remplir_classeur_audit, remplir_classeur_materiel
+)
+
+# Génération des rapports en arrière-plan : la requête HTTP enregistre une tâche
+# et rend la main, un pool de workers calcule les données (session dédiée) puis
+# rend le fichier. Le fichier est stocké sur disque sous le nom de l'empreinte
+# SHA-256 de son contenu. Une demande identique (même type, format et période)
+# reçue pendant la fenêtre de fraîcheur réutilise la tâche existante au lieu de
+# relancer le rendu ; pour le rapport financier, la clé inclut aussi le filigrane
+# des données, si bien qu'une écriture comptable invalide immédiatement l'artefact.
+#
+# Le registre des tâches est lui aussi sur disque, à côté des artefacts
+# (jobs/<job_id>.json et jobs/cle-<empreinte de la demande>) : avec plusieurs
+# workers uvicorn, n'importe quel processus peut répondre sur une tâche, et la
+# déduplication vaut pour tous. Chaque fichier est écrit par remplacement atomique.
+
+EN_ATTENTE = "en_attente"
+EN_COURS = "en_cours"
+TERMINE = "termine"
+ECHEC = "echec"
+
+EXTENSIONS = {"pdf": "pdf", "xlsx": "xlsx"}
+MEDIA_TYPES = {"pdf": "application/pdf", "xlsx": MEDIA_TYPE_XLSX}
+
+_executeur = ThreadPoolExecutor(max_workers=RAPPORTS_WORKERS, thread_name_prefix="rapport")
+_verrou = threading.Lock()
+_FORMAT_JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+
+# --- DÉFINITION DES RAPPORTS ---
+
+def _donnees_financier(db, params):
+    return crud_rapport.generer_rapport_financier_annuel(db, params["annee"], params["utilisateur_id"])
+
+
+def _donnees_administratif(db, params):
+    return crud_rapport.generer_rapport_administratif(db, params.get("date_debut"), params.get("date_fin"))
+
+
+def _donnees_materiel(db, params):
+    return crud_rapport.generer_rapport_materiel(db, date_debut=params.get("date_debut"), date_fin=params.get("date_fin"))
+
+
+def _donnees_audit(db, params):
+    return crud_rapport.generer_rapport_audit_compile(db, params.get("date_debut"), params.get("date_fin"))
+
+
+# type -> (titre, nom de fichier, données, blocs PDF, feuilles Excel)
+RAPPORTS = {
+    "financier": (
+        lambda p: f"Rapport Budgétaire - Année {p['annee']}",
+        lambda p: f"rapport_budget_{p['annee']}",
+        _donnees_financier,
+        blocs_financier,
+        lambda wb, data, p: remplir_classeur_financier(wb, data, p["annee"]),
+    ),
+    "administratif": (
+        lambda p: "Rapport Administratif",
+        lambda p: "rapport_administratif",
+        _donnees_administratif,
+        blocs_administratif,
+        lambda wb, data, p: remplir_classeur_administratif(wb, data),
+    ),
+    "materiel": (
+        lambda p: "Rapport Matériels et Infrastructures",
+        lambda p: "rapport_materiels",
+        _donnees_materiel,
+        blocs_materiel,
+        lambda wb, data, p: remplir_classeur_materiel(wb, data),
+    ),
+    "audit": (
+        lambda p: "Rapport d'Audit Combiné",
+        lambda p: "rapport_audit_compile",
+        _donnees_audit,
+        blocs_audit,
+        lambda wb, data, p: remplir_classeur_audit(wb, data),
+    ),
+}
+
+
+def _rendre(type_rapport: str, format: str, params: dict, db) -> bytes:
+    titre, _, donnees, blocs, remplir = RAPPORTS[type_rapport]
+    data = donnees(db, params)
+
+    if format == "pdf":
+        tampon = generer_pdf(titre(params), blocs(data))
+    else:
+        wb = classeur()
+        remplir(wb, data, params)
+        tampon = BytesIO()
+        wb.save(tampon)
+        wb.close()
+    return tampon.getvalue()
+
+
+def _enregistrer(contenu: bytes, format: str):
+    empreinte = hashlib.sha256(contenu).hexdigest()
+    os.makedirs(RAPPORTS_DIR, exist_ok=True)
+    chemin = os.path.join(RAPPORTS_DIR, f"{empreinte}.{EXTENSIONS[format]}")
+    try:
+        # Artefact déjà présent : il repart pour une durée de conservation complète
+        os.utime(chemin)
+    except FileNotFoundError:
+        # Écriture atomique : un téléchargement concurrent ne voit jamais de fichier partiel
+        temporaire = f"{chemin}.{uuid.uuid4().hex}.tmp"
+        with open(temporaire, "wb") as fichier:
+            fichier.write(contenu)
+        os.replace(temporaire, chemin)
+    return empreinte, chemin
+
+
+# --- REGISTRE ---
+
+def _dossier_jobs():
+    return os.path.join(RAPPORTS_DIR, "jobs")
+
+
+def _ecrire_json(chemin: str, valeur):
+    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    temporaire = f"{chemin}.{uuid.uuid4().hex}.tmp"
+    with open(temporaire, "w", encoding="utf-8") as fichier:
+        json.dump(valeur, fichier, default=lambda v: v.isoformat())
+    os.replace(temporaire, chemin)
+
+
+def _lire_fichier(chemin: str, age_max_secondes: float):
+    """Contenu JSON du fichier, ou None s'il manque, est illisible ou a expiré."""
+    try:
+        if os.path.getmtime(chemin) < time.time() - age_max_secondes:
+            return None
+        with open(chemin, encoding="utf-8") as fichier:
+            return json.load(fichier)
+    except (OSError, ValueError):
+        return None
+
+
+def _chemin_job(job_id: str):
+    # L'identifiant vient de l'URL : seul un uuid hexadécimal désigne un fichier
+    if not isinstance(job_id, str) or not _FORMAT_JOB_ID.fullmatch(job_id):
+        return None
+    return os.path.join(_dossier_jobs(), f"{job_id}.json")
+
+
+def _chemin_cle(cle) -> str:
+    return os.path.join(_dossier_jobs(), f"cle-{hashlib.sha256(repr(cle).encode()).hexdigest()}")
+
+
+def _lire_job(job_id: str):
+    chemin = _chemin_job(job_id)
+    if chemin is None:
+        return None
+    return _lire_fichier(chemin, RAPPORTS_CONSERVATION_HEURES * 3600)
+
+
+# --- TÂCHES ---
+
+def _cle(type_rapport: str, format: str, params: dict, db):
+    cle = (
+        type_rapport,
+        format,
+        params.get("annee"),
+        params.get("date_debut"),
+        params.get("date_fin"),
+    )
+    if type_rapport == "financier":
+        cle += (crud_rapport.filigrane_financier(db, params["annee"]),)
+    return cle
+
+
+def _maj_job(job_id: str, **valeurs):
+    # Seul le processus qui exécute la tâche la met à jour
+    with _verrou:
+        job = _lire_job(job_id)
+        if job is not None:
+            job.update(valeurs)
+            _ecrire_json(_chemin_job(job_id), job)
+
+
+def _executer(job: dict):
+    # Le job est reçu tel que soumis : ses paramètres gardent leurs types Python
+    job_id = job["job_id"]
+    _maj_job(job_id, statut=EN_COURS, debut_at=datetime.utcnow())
+
+    db = SessionLocal()
+    try:
+        contenu = _rendre(job["type"], job["format"], job["params"], db)
+        empreinte, chemin = _enregistrer(contenu, job["format"])
+        _maj_job(
+            job_id,
+            statut=TERMINE,
+            empreinte=empreinte,
+            chemin=chemin,
+            taille=len(contenu),
+            fin_at=datetime.utcnow()
+        )
+    except Exception as e:
+        _maj_job(job_id, statut=ECHEC, erreur=str(e), fin_at=datetime.utcnow())
+    finally:
+        db.close()
+
+
+def soumettre_rapport(db, type_rapport: str, format: str, params: dict, utilisateur_id: int) -> dict:
+    """
+    Enregistre une demande de rapport et la confie au pool de workers. Si une
+    demande identique est en cours ou terminée dans la fenêtre de fraîcheur, la
+    tâche existante est renvoyée sans nouveau rendu.
+    """
+    params = {**params, "utilisateur_id": utilisateur_id}
+    cle = _cle(type_rapport, format, params, db)
+
+    chemin_cle = _chemin_cle(cle)
+
+    with _verrou:
+        job_existant = _lire_job(_lire_fichier(chemin_cle, RAPPORTS_FRAICHEUR_SECONDES))
+        if job_existant is not None and job_existant["statut"] != ECHEC and (
+            job_existant["statut"] != TERMINE or os.path.exists(job_existant["chemin"])
+        ):
+            return job_existant
+
+        job_id = uuid.uuid4().hex
+        _, nom_fichier, _, _, _ = RAPPORTS[type_rapport]
+        job = {
+            "job_id": job_id,
+            "type": type_rapport,
+            "format": format,
+            "params": params,
+            "utilisateur_id": utilisateur_id,
+            "statut": EN_ATTENTE,
+            "nom_fichier": f"{nom_fichier(params)}.{EXTENSIONS[format]}",
+            "empreinte": None,
+            "chemin": None,
+            "taille": None,
+            "erreur": None,
+            "created_at": datetime.utcnow(),
+            "debut_at": None,
+            "fin_at": None,
+        }
+        _ecrire_json(_chemin_job(job_id), job)
+        # Deux processus peuvent enregistrer la même demande au même instant :
+        # le dernier écrit la clé, et l'autre rendu aboutit à un doublon inoffensif.
+        _ecrire_json(chemin_cle, job_id)
+
+    _executeur.submit(_executer, dict(job))
+    return dict(job)
+
+
+def get_job(job_id: str):
+    return _lire_job(job_id)
+
+
+def _supprimer(chemin: str) -> int:
+    try:
+        os.remove(chemin)
+        return 1
+    except FileNotFoundError:
+        return 0
+
+
+def purger_rapports_generes(age_max_heures: int = RAPPORTS_CONSERVATION_HEURES) -> int:
+    """
+    Supprime les entrées du registre plus anciennes que la durée de
+    conservation, puis les artefacts expirés qu'aucune tâche encore
+    enregistrée ne référence. Retourne le nombre d'artefacts supprimés.
+    """
+    if not os.path.isdir(RAPPORTS_DIR):
+        return 0
+    limite = time.time() - age_max_heures * 3600
+
+    references = set()
+    dossier_jobs = _dossier_jobs()
+    if os.path.isdir(dossier_jobs):
+        for nom in os.listdir(dossier_jobs):
+            chemin = os.path.join(dossier_jobs, nom)
+            try:
+                expire = os.path.getmtime(chemin) < limite
+            except FileNotFoundError:
+                continue
+            if expire:
+                _supprimer(chemin)
+            elif nom.endswith(".json"):
+                job = _lire_fichier(chemin, age_max_heures * 3600) or {}
+                if job.get("chemin"):
+                    references.add(os.path.abspath(job["chemin"]))
+
+    supprimes = 0
+    for nom in os.listdir(RAPPORTS_DIR):
+        chemin = os.path.join(RAPPORTS_DIR, nom)
+        if (
+            os.path.isfile(chemin)
+            and os.path.abspath(chemin) not in references
+            and os.path.getmtime(chemin) < limite
+        ):
+            supprimes += _supprimer(chemin)
+    return supprimes
@@ -0,0 +1,103 @@
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from fastapi.responses import StreamingResponse
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+
+from app.utils.flux import reponse_fichier
+
+# Un rapport est décrit de façon structurée (sections, paragraphes, tableaux)
+# puis mis en page par reportlab, qui gère le retour à la ligne et les sauts de
+# page (les en-têtes de tableau sont répétés sur chaque page). Le PDF est produit
+# dans un tampon mémoire et renvoyé par morceaux (app.utils.flux).
+
+_styles = getSampleStyleSheet()
+STYLES = {
+    "titre": _styles["Title"],
+    "section": _styles["Heading2"],
+    "sous_section": _styles["Heading3"],
+    "normal": _styles["BodyText"],
+    "meta": _styles["Italic"],
+}
+
+
+def paragraphe(texte, style: str = "normal"):
+    return {"type": "paragraphe", "texte": "" if texte is None else str(texte), "style": style}
+
+
+def tableau(entetes, lignes):
+    return {"type": "tableau", "entetes": list(entetes), "lignes": lignes}
+
+
+def cles_valeurs(valeurs: dict, entetes=("Libellé", "Valeur")):
+    return tableau(entetes, [[cle, valeur] for cle, valeur in valeurs.items()])
+
+
+def section(titre, *blocs, niveau: str = "section"):
+    return {"type": "section", "titre": titre, "blocs": list(blocs), "niveau": niveau}
+
+
+def _texte(valeur):
+    # Paragraph interprète un mini-balisage XML : on échappe le contenu
+    return escape("" if valeur is None else str(valeur)).replace("\n", "<br/>")
+
+
+def _flowables(bloc):
+    if bloc["type"] == "section":
+        yield Paragraph(_texte(bloc["titre"]), STYLES[bloc["niveau"]])
+        for sous_bloc in bloc["blocs"]:
+            yield from _flowables(sous_bloc)
+        yield Spacer(1, 0.4 * cm)
+
+    elif bloc["type"] == "paragraphe":
+        yield Paragraph(_texte(bloc["texte"]), STYLES[bloc["style"]])
+
+    elif bloc["type"] == "tableau":
+        style_cellule = STYLES["normal"]
+        donnees = [[Paragraph(f"<b>{_texte(e)}</b>", style_cellule) for e in bloc["entetes"]]]
+        for ligne in bloc["lignes"]:
+            donnees.append([Paragraph(_texte(v), style_cellule) for v in ligne])
+        if len(donnees) == 1:
+            yield Paragraph("<i>Aucune donnée.</i>", style_cellule)
+            return
+        table = Table(donnees, repeatRows=1, hAlign="LEFT")
+        table.setStyle(TableStyle([
+            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#E8E8E8")),
+            ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+            ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ]))
+        yield table
+        yield Spacer(1, 0.3 * cm)
+
+
+def generer_pdf(titre: str, blocs) -> BytesIO:
+    tampon = BytesIO()
+    document = SimpleDocTemplate(
+        tampon,
+        pagesize=A4,
+        title=titre,
+        leftMargin=2 * cm,
+        rightMargin=2 * cm,
+        topMargin=2 * cm,
+        bottomMargin=2 * cm,
+    )
+
+    histoire = [Paragraph(_texte(titre), STYLES["titre"])]
+    for bloc in blocs:
+        histoire.extend(_flowables(bloc))
+
+    def numeroter(canvas, doc):
+        canvas.setFont("Helvetica", 8)
+        canvas.drawRightString(A4[0] - 2 * cm, 1.2 * cm, f"Page {doc.page}")
+
+    document.build(histoire, onFirstPage=numeroter, onLaterPages=numeroter)
+    tampon.seek(0)
+    return tampon
+
+
+def reponse_pdf(titre: str, blocs, nom_fichier: str) -> StreamingResponse:
+    return reponse_fichier(generer_pdf(titre, blocs), "application/pdf", nom_fichier)
@@ -0,0 +1,223 @@
+from app.utils.rapport_pdf import section, paragraphe, tableau, cles_valeurs
+from app.utils.rapport_excel import ajouter_feuille
+
+# Mise en forme des rapports générés (données -> blocs PDF / feuilles Excel),
+# partagée par les routes d'export et les tâches de génération en arrière-plan.
+
+# --- PDF ---
+
+def blocs_financier(data, niveau="section"):
+    recettes = data.get("recettes", {})
+    depenses = data.get("depenses", {})
+    budget = data.get("budget", {})
+    entetes = ("Catégorie", "Montant (FCFA)")
+
+    blocs = [
+        section("Recettes", cles_valeurs({
+            **{k.capitalize(): v for k, v in recettes.get("details", {}).items()},
+            "Total": recettes.get("total", 0)
+        }, entetes), niveau=niveau),
+        section("Dépenses", cles_valeurs({
+            **{k.capitalize(): v for k, v in depenses.get("details", {}).items()},
+            "Total": depenses.get("total", 0)
+        }, entetes), niveau=niveau),
+        section("Budget", cles_valeurs({
+            "Budget prévisionnel": budget.get("previsionnel", 0),
+            "Budget réel": budget.get("reel", 0),
+            "Écart": budget.get("ecart", 0),
+            "Solde": data.get("solde", 0)
+        }, entetes), niveau=niveau),
+    ]
+    if data.get("mensuel"):
+        blocs.append(section("Détail mensuel", tableau(
+            ["Mois", "Recettes", "Dépenses", "Solde"],
+            [[mois, v["recettes"], v["depenses"], v["solde"]] for mois, v in data["mensuel"].items()]
+        ), niveau=niveau))
+    return blocs
+
+
+def blocs_administratif(data, niveau="sous_section"):
+    blocs = [paragraphe(f"Total rapports: {data['total_rapports']}")]
+    for rapport in data["rapports"]:
+        blocs.append(section(
+            f"Titre: {rapport['titre']}",
+            paragraphe(f"Date: {rapport['date_rapport']}  |  Auteur: {rapport['auteur']}", "meta"),
+            paragraphe(rapport["contenu"]),
+            niveau=niveau
+        ))
+    return blocs
+
+
+def blocs_materiel(rapport, niveau="section"):
+    blocs = []
+    for cle, cle_pret, libelle in (
+        ("materiels", "materiel", "Matériel"),
+        ("infrastructures", "infrastructure", "Infrastructure")
+    ):
+        data = rapport.get(cle, {})
+        # Le matériel se prête en quantité, une infrastructure en entier
+        avec_quantite = cle == "materiels"
+        prets = [
+            [
+                p.get(cle_pret, ""),
+                *([p.get("quantite", 1)] if avec_quantite else []),
+                p.get("beneficiaire", ""),
+                p.get("date_pret", ""),
+                p.get("date_retour_prevue", ""),
+                p.get("date_retour_effective", ""),
+                p.get("etat_retour", "")
+            ]
+            for p in data.get("pret", [])
+        ]
+        blocs.append(section(
+            cle.capitalize(),
+            paragraphe(f"Total: {data.get('total', 0)}"),
+            cles_valeurs(data.get("etat", {}), ("État", "Nombre")),
+            paragraphe("Prêts sur la période :"),
+            tableau(
+                [libelle, *(["Quantité"] if avec_quantite else []), "Bénéficiaire", "Date prêt",
+                 "Date retour prévue", "Date retour effective", "État retour"],
+                prets
+            ),
+            niveau=niveau
+        ))
+    return blocs
+
+
+def blocs_audit(data):
+    return [
+        paragraphe(f"Période: {data['periode']['date_debut']} à {data['periode']['date_fin']}"),
+        section(
+            f"Rapport Administratif - Total: {data['administratif']['total_rapports']}",
+            *blocs_administratif(data["administratif"])[1:]
+        ),
+        section(
+            f"Rapport Financier - Année: {data['periode']['annee_financiere']}",
+            *blocs_financier(data["financier"], niveau="sous_section")
+        ),
+        section("Rapport Matériel", *blocs_materiel(data["materiel"], niveau="sous_section")),
+    ]
+
+
+# --- EXCEL ---
+
+def remplir_classeur_financier(wb, data, annee):
+    ws = wb.create_sheet(f"Budget {annee}")
+    ws.append(["Catégorie", "Montant (FCFA)"])
+    ws.append(["Recettes totales", data["recettes"]["total"]])
+    for k, v in data["recettes"]["details"].items():
+        ws.append([f"  {k.capitalize()}", v])
+    ws.append(["Dépenses totales", data["depenses"]["total"]])
+    for k, v in data["depenses"]["details"].items():
+        ws.append([f"  {k.capitalize()}", v])
+    ws.append(["Budget prévisionnel", data["budget"]["previsionnel"]])
+    ws.append(["Budget réel", data["budget"]["reel"]])
+    ws.append(["Écart", data["budget"]["ecart"]])
+    ws.append(["Solde", data["solde"]])
+    ws.append([])
+    ws.append(["Mois", "Recettes", "Dépenses", "Solde"])
+    for mois, valeurs in data["mensuel"].items():
+        ws.append([mois, valeurs["recettes"], valeurs["depenses"], valeurs["solde"]])
+
+
+def remplir_classeur_administratif(wb, data):
+    ajouter_feuille(
+        wb,
+        "Rapport Administratif",
+        ([r["titre"], r["date_rapport"], r["auteur"], r["contenu"]] for r in data["rapports"]),
+        entetes=["Titre", "Date Rapport", "Auteur", "Contenu"]
+    )
+
+
+def remplir_classeur_audit(wb, data):
+    ws = wb.create_sheet("Rapport Audit Combiné")
+
+    ws.append(["Période", f"{data['periode']['date_debut']} à {data['periode']['date_fin']}"])
+    ws.append([])
+
+    # Administratif
+    ws.append(["Rapport Administratif", f"Total: {data['administratif']['total_rapports']}"])
+    ws.append(["Titre", "Date Rapport", "Auteur", "Contenu"])
+    for rapport in data['administratif']['rapports']:
+        ws.append([rapport["titre"], rapport["date_rapport"], rapport["auteur"], rapport["contenu"]])
+
+    ws.append([])
+
+    # Financier
+    ws.append(["Rapport Financier", f"Année: {data['periode']['annee_financiere']}"])
+    ws.append(["Catégorie", "Montant (FCFA)"])
+    recettes = data['financier'].get('recettes', {})
+    depenses = data['financier'].get('depenses', {})
+    budget = data['financier'].get('budget', {})
+    solde = data['financier'].get('solde', 0)
+
+    ws.append(["Recettes totales", recettes.get('total', 0)])
+    for k, v in recettes.get('details', {}).items():
+        ws.append([k.capitalize(), v])
+
+    ws.append(["Dépenses totales", depenses.get('total', 0)])
+    for k, v in depenses.get('details', {}).items():
+        ws.append([k.capitalize(), v])
+
+    ws.append(["Budget prévisionnel", budget.get('previsionnel', 0)])
+    ws.append(["Budget réel", budget.get('reel', 0)])
+    ws.append(["Écart", budget.get('ecart', 0)])
+    ws.append(["Solde", solde])
+
+    ws.append([])
+
+    # Matériel
+    for cle in ["materiels", "infrastructures"]:
+        ws.append([f"Rapport Matériel - {cle.capitalize()}"])
+        ws.append(["Total", data['materiel'][cle].get("total", 0)])
+        ws.append(["État", "Nombre"])
+        for etat, count in data['materiel'][cle].get("etat", {}).items():
+            ws.append([etat, count])
+
+
+def remplir_classeur_materiel(wb, rapport):
+    ws = wb.create_sheet("Rapport Matériels")
+
+    # Matériels
+    ws.append(["MATÉRIELS"])
+    ws.append(["Total", rapport["materiels"].get("total", 0)])
+    ws.append(["État", "Nombre"])
+    for etat, count in rapport["materiels"].get("etat", {}).items():
+        ws.append([etat, count])
+
+    ws.append([])
+    ws.append(["Prêts Matériels"])
+    headers = ["Matériel", "Quantité", "Bénéficiaire", "Date prêt", "Date retour prévue", "Date retour effective", "État retour"]
+    ws.append(headers)
+    for pret in rapport["materiels"].get("pret", []):
+        ws.append([
+            pret.get("materiel", ""),
+            pret.get("quantite", 1),
+            pret.get("beneficiaire", ""),
+            pret.get("date_pret", ""),
+            pret.get("date_retour_prevue", ""),
+            pret.get("date_retour_effective", ""),
+            pret.get("etat_retour", "")
+        ])
+
+    ws.append([])
+    # Infrastructures
+    ws.append(["INFRASTRUCTURES"])
+    ws.append(["Total", rapport["infrastructures"].get("total", 0)])
+    ws.append(["État", "Nombre"])
+    for etat, count in rapport["infrastructures"].get("etat", {}).items():
+        ws.append([etat, count])
+
+    ws.append([])
+    ws.append(["Prêts Infrastructures"])
+    headers = ["Infrastructure", "Bénéficiaire", "Date prêt", "Date retour prévue", "Date retour effective", "État retour"]
+    ws.append(headers)
+    for pret in rapport["infrastructures"].get("pret", []):
+        ws.append([
+            pret.get("infrastructure", ""),
+            pret.get("beneficiaire", ""),
+            pret.get("date_pret", ""),
+            pret.get("date_retour_prevue", ""),
+            pret.get("date_retour_effective", ""),
+            pret.get("etat_retour", "")
+        ])
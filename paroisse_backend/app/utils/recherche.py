@@ -0,0 +1,460 @@
+import re
+import unicodedata
+import weakref
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Optional
+
+from sqlalchemy import Float, Integer, event, false, inspect, literal, or_, text
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import Session, object_session
+
+from app.models.don import Don
+from app.models.quete import Quete
+from app.models.offrande import Offrande
+from app.models.facture import Facture
+from app.models.recu import Recu
+from app.models.rapport import Rapport
+from app.utils.periode import bornes_annee, bornes_mois
+
+# Recherche unifiée. La requête libre est découpée en :
+#   - filtres structurés (montants, dates) appliqués directement sur les colonnes
+#     typées, donc indexables, au lieu de CAST(montant AS CHAR) LIKE '%...%' ;
+#   - termes texte cherchés via l'index plein texte du moteur :
+#       MySQL  : index FULLTEXT + MATCH ... AGAINST (mode booléen), ou ILIKE
+#                tant que l'index manque sur une table créée avant lui ;
+#       SQLite : table FTS5 "recherche_fts" tenue à jour par les événements ORM ;
+#       autres : repli sur ILIKE.
+#
+# Syntaxe des filtres :
+#   5000            montant égal          >5000, <=10000   montant comparé
+#   1000..5000      plage de montants     2025-03-12, 12/03/2025   jour
+#   2025-03, 03/2025  mois                annee:2025        année
+
+
+@dataclass(frozen=True)
+class EntiteRecherche:
+    modele: type
+    colonne_id: object
+    colonnes_texte: tuple
+    colonne_titre: object
+    colonne_date: object
+    colonne_montant: Optional[object] = None
+    colonne_categorie: Optional[object] = None  # ex. type de rapport, pour filtrer par rôle
+
+
+ENTITES_RECHERCHE = {
+    "don": EntiteRecherche(
+        Don, Don.don_id, (Don.donateur, Don.type, Don.commentaire), Don.donateur, Don.date_don, Don.montant
+    ),
+    "quete": EntiteRecherche(
+        Quete, Quete.quete_id, (Quete.libelle,), Quete.libelle, Quete.date_quete, Quete.montant
+    ),
+    "offrande": EntiteRecherche(
+        Offrande, Offrande.offrande_id, (Offrande.type, Offrande.description), Offrande.type,
+        Offrande.date, Offrande.montant
+    ),
+    "facture": EntiteRecherche(
+        Facture, Facture.facture_id, (Facture.numero, Facture.description), Facture.numero,
+        Facture.date_facture, Facture.montant
+    ),
+    "recu": EntiteRecherche(
+        Recu, Recu.recu_id, (Recu.description,), Recu.description, Recu.date_emission, Recu.montant
+    ),
+    "rapport": EntiteRecherche(
+        Rapport, Rapport.rapport_id, (Rapport.titre, Rapport.contenu), Rapport.titre, Rapport.date_rapport,
+        colonne_categorie=Rapport.type
+    ),
+}
+_ENTITE_PAR_MODELE = {cfg.modele: entite for entite, cfg in ENTITES_RECHERCHE.items()}
+
+
+# --- ANALYSE DE LA REQUÊTE ---
+
+@dataclass
+class RequeteAnalysee:
+    termes: list = field(default_factory=list)
+    montants: list = field(default_factory=list)  # [(opérateur, valeur)]
+    date_debut: Optional[date] = None               # incluse
+    date_fin: Optional[date] = None                 # exclue
+
+    @property
+    def a_filtres(self):
+        return bool(self.montants) or self.date_debut is not None or self.date_fin is not None
+
+    def restreindre_periode(self, debut: date, fin: date):
+        self.date_debut = debut if self.date_debut is None else max(self.date_debut, debut)
+        self.date_fin = fin if self.date_fin is None else min(self.date_fin, fin)
+
+
+_NOMBRE = r"\d+(?:[.,]\d+)?"
+_RE_COMPARAISON = re.compile(rf"^(>=|<=|>|<)({_NOMBRE})$")
+_RE_PLAGE = re.compile(rf"^({_NOMBRE})\.\.({_NOMBRE})$")
+_RE_MONTANT = re.compile(rf"^({_NOMBRE})(?:fcfa|f)?$")
+_RE_JOUR_ISO = re.compile(r"^(\d{4})-(\d{1,2})-(\d{1,2})$")
+_RE_JOUR_FR = re.compile(r"^(\d{1,2})/(\d{1,2})/(\d{4})$")
+_RE_MOIS_ISO = re.compile(r"^(\d{4})-(\d{1,2})$")
+_RE_MOIS_FR = re.compile(r"^(\d{1,2})/(\d{4})$")
+_RE_ANNEE = re.compile(r"^ann[ée]e:(\d{4})$")
+_RE_MOT = re.compile(r"\w+", re.UNICODE)
+
+
+def _nombre(valeur: str) -> float:
+    return float(valeur.replace(",", "."))
+
+
+def _jour(annee, mois, jour):
+    debut = date(int(annee), int(mois), int(jour))
+    return debut, debut + timedelta(days=1)
+
+
+def analyser_requete(q: str) -> RequeteAnalysee:
+    requete = RequeteAnalysee()
+
+    for jeton in (q or "").lower().split():
+        try:
+            if m := _RE_COMPARAISON.match(jeton):
+                requete.montants.append((m.group(1), _nombre(m.group(2))))
+            elif m := _RE_PLAGE.match(jeton):
+                requete.montants += [(">=", _nombre(m.group(1))), ("<=", _nombre(m.group(2)))]
+            elif m := _RE_JOUR_ISO.match(jeton):
+                requete.restreindre_periode(*_jour(m.group(1), m.group(2), m.group(3)))
+            elif m := _RE_JOUR_FR.match(jeton):
+                requete.restreindre_periode(*_jour(m.group(3), m.group(2), m.group(1)))
+            elif m := _RE_MOIS_ISO.match(jeton):
+                requete.restreindre_periode(*bornes_mois(int(m.group(1)), int(m.group(2))))
+            elif m := _RE_MOIS_FR.match(jeton):
+                requete.restreindre_periode(*bornes_mois(int(m.group(2)), int(m.group(1))))
+            elif m := _RE_ANNEE.match(jeton):
+                requete.restreindre_periode(*bornes_annee(int(m.group(1))))
+            elif m := _RE_MONTANT.match(jeton):
+                requete.montants.append(("==", _nombre(m.group(1))))
+            else:
+                requete.termes += [mot for mot in _RE_MOT.findall(jeton) if len(mot) > 1]
+        except ValueError:
+            # Date impossible (ex. 31/02/2025) : on la traite comme du texte
+            requete.termes += [mot for mot in _RE_MOT.findall(jeton) if len(mot) > 1]
+
+    return requete
+
+
+OPERATEURS = {
+    "==": lambda col, v: col == v,
+    ">": lambda col, v: col > v,
+    ">=": lambda col, v: col >= v,
+    "<": lambda col, v: col < v,
+    "<=": lambda col, v: col <= v,
+}
+
+
+# --- APPLICATION À UNE REQUÊTE ORM ---
+
+def requete_recherche(db: Session, entite: str, q: str, include_deleted: bool = False, query=None):
+    """
+    Filtre `query` (par défaut db.query(modèle)) selon la recherche `q` et la trie
+    par pertinence puis par date. Retourne (query, score) ; score est None
+    lorsque la recherche ne contient aucun terme texte.
+    """
+    cfg = ENTITES_RECHERCHE[entite]
+    requete = analyser_requete(q)
+    query = query if query is not None else db.query(cfg.modele)
+
+    if not include_deleted:
+        query = query.filter(cfg.modele.deleted_at == None)
+
+    # Filtres structurés (une entité sans montant ne peut pas satisfaire un filtre montant)
+    if requete.montants:
+        if cfg.colonne_montant is None:
+            query = query.filter(false())
+        for operateur, valeur in requete.montants:
+            query = query.filter(OPERATEURS[operateur](cfg.colonne_montant, valeur))
+    if requete.date_debut is not None:
+        query = query.filter(cfg.colonne_date >= requete.date_debut)
+    if requete.date_fin is not None:
+        query = query.filter(cfg.colonne_date < requete.date_fin)
+
+    score = None
+    termes_ilike = []
+    dialecte = db.get_bind().dialect.name
+    if dialecte == "mysql":
+        if cfg.modele.__tablename__ in tables_fulltext(db.connection()):
+            # InnoDB n'indexe pas les mots de moins de 3 caractères (innodb_ft_min_token_size)
+            termes_fulltext = [t for t in requete.termes if len(t) >= 3]
+            termes_ilike = [t for t in requete.termes if len(t) < 3]
+        else:
+            # Sans index FULLTEXT, MATCH ... AGAINST échouerait (erreur 1191)
+            termes_fulltext, termes_ilike = [], requete.termes
+        if termes_fulltext:
+            expression = " ".join(f"+{terme}*" for terme in termes_fulltext)
+            score = match(*cfg.colonnes_texte, against=expression).in_boolean_mode()
+            query = query.filter(score > 0)
+    elif dialecte == "sqlite":
+        if requete.termes:
+            assurer_index_fts(db.connection())
+            fts = _sous_requete_fts(entite, requete.termes)
+            query = query.join(fts, cfg.colonne_id == fts.c.entite_id)
+            score = fts.c.score
+    else:
+        termes_ilike = requete.termes
+
+    for terme in termes_ilike:
+        query = query.filter(or_(*(colonne.ilike(f"%{terme}%") for colonne in cfg.colonnes_texte)))
+
+    if score is not None:
+        query = query.order_by(score.desc(), cfg.colonne_date.desc())
+    else:
+        query = query.order_by(cfg.colonne_date.desc())
+    return query, score
+
+
+def rechercher(
+    db: Session,
+    q: str,
+    entites=None,
+    limite: int = 20,
+    include_deleted: bool = False,
+    filtres: Optional[dict] = None
+):
+    """
+    Recherche sur plusieurs entités, résultats fusionnés et classés par pertinence.
+    `filtres` associe à une entité des critères supplémentaires (ex. types de
+    rapport visibles par le rôle courant).
+    """
+    resultats = []
+    for entite in entites or ENTITES_RECHERCHE:
+        cfg = ENTITES_RECHERCHE[entite]
+        query = db.query(cfg.modele).filter(*(filtres or {}).get(entite, ()))
+        query, score = requete_recherche(db, entite, q, include_deleted, query=query)
+        lignes = query.with_entities(
+            cfg.colonne_id,
+            cfg.colonne_titre,
+            cfg.colonne_date,
+            cfg.colonne_montant if cfg.colonne_montant is not None else literal(None),
+            score if score is not None else literal(0.0),
+        ).limit(limite).all()
+
+        for identifiant, titre, date_ligne, montant, pertinence in lignes:
+            resultats.append({
+                "type": entite,
+                "id": identifiant,
+                "titre": titre,
+                "date": date_ligne,
+                "montant": montant,
+                "score": float(pertinence or 0),
+            })
+
+    resultats.sort(key=lambda r: (r["score"], str(r["date"] or "")), reverse=True)
+    return resultats[:limite]
+
+
+# --- INDEX FULLTEXT (MySQL) ---
+
+# create_all ne modifie pas les tables existantes : une base créée avant la
+# déclaration des index FULLTEXT ne les a pas. assurer_index_fulltext les ajoute
+# au démarrage ; en attendant (ex. droits insuffisants), la recherche repasse
+# par ILIKE sur les tables qui n'en ont pas.
+
+# moteur -> tables munies de leur index FULLTEXT. Clés faibles : l'id() d'un
+# moteur libéré peut être réattribué à un nouveau, qui hériterait de son état.
+_tables_fulltext = weakref.WeakKeyDictionary()
+
+
+def _index_fulltext(table):
+    return next((i for i in table.indexes if i.dialect_options["mysql"]["prefix"] == "FULLTEXT"), None)
+
+
+def _index_presents(inspecteur, table) -> set:
+    return {index["name"] for index in inspecteur.get_indexes(table.name)}
+
+
+def tables_fulltext(connection) -> set:
+    moteur = connection.engine
+    if moteur not in _tables_fulltext:
+        inspecteur = inspect(connection)
+        tables = set()
+        for cfg in ENTITES_RECHERCHE.values():
+            table = cfg.modele.__table__
+            index = _index_fulltext(table)
+            if index is not None and index.name in _index_presents(inspecteur, table):
+                tables.add(table.name)
+        _tables_fulltext[moteur] = tables
+    return _tables_fulltext[moteur]
+
+
+def assurer_index_fulltext(connection):
+    """Ajoute les index FULLTEXT absents des tables existantes (MySQL uniquement)."""
+    if connection.dialect.name != "mysql":
+        return
+    inspecteur = inspect(connection)
+    for cfg in ENTITES_RECHERCHE.values():
+        table = cfg.modele.__table__
+        index = _index_fulltext(table)
+        if index is not None and index.name not in _index_presents(inspecteur, table):
+            index.create(connection)
+    _tables_fulltext.pop(connection.engine, None)
+
+
+# --- INDEX FTS5 (SQLite) ---
+
+_TABLE_FTS = "recherche_fts"
+_moteurs_fts_prets = weakref.WeakSet()
+
+# Chaque document a pour rowid entite_id * _FACTEUR_FTS + code de l'entité :
+# mises à jour et suppressions le retrouvent par la clé de la table FTS5 au lieu
+# de la parcourir (entite et entite_id y sont UNINDEXED). Les codes suivent
+# l'ordre de ENTITES_RECHERCHE : une nouvelle entité s'ajoute en fin de liste.
+_FACTEUR_FTS = 16
+_CODES_FTS = {entite: code for code, entite in enumerate(ENTITES_RECHERCHE)}
+assert len(_CODES_FTS) <= _FACTEUR_FTS
+
+
+def sans_accents(valeur: str) -> str:
+    decompose = unicodedata.normalize("NFKD", valeur)
+    return "".join(c for c in decompose if not unicodedata.combining(c))
+
+
+def _sous_requete_fts(entite: str, termes):
+    # Chaque terme est cité (pas d'interprétation de la syntaxe FTS5) et
+    # cherché en préfixe ; bm25() est négatif, plus petit = plus pertinent.
+    expression = " ".join('"{}"*'.format(sans_accents(t).replace('"', "")) for t in termes)
+    return (
+        text(
+            f"SELECT entite_id, -bm25({_TABLE_FTS}) AS score FROM {_TABLE_FTS} "
+            f"WHERE {_TABLE_FTS} MATCH :expression AND entite = :entite"
+        )
+        .bindparams(expression=expression, entite=entite)
+        .columns(entite_id=Integer, score=Float)
+        .subquery(f"fts_{entite}")
+    )
+
+
+def _texte_indexe(instance, cfg: EntiteRecherche) -> str:
+    valeurs = (getattr(instance, colonne.key) for colonne in cfg.colonnes_texte)
+    return " ".join(str(v) for v in valeurs if v)
+
+
+_SUPPRESSION_FTS = text(f"DELETE FROM {_TABLE_FTS} WHERE rowid = :rowid")
+_ECRITURE_FTS = text(
+    f"INSERT OR REPLACE INTO {_TABLE_FTS} (rowid, entite, entite_id, texte) VALUES (:rowid, :entite, :id, :texte)"
+)
+
+
+def _rowid_fts(entite: str, identifiant: int) -> int:
+    return identifiant * _FACTEUR_FTS + _CODES_FTS[entite]
+
+
+def _document(entite: str, identifiant: int, texte_indexe: str) -> dict:
+    return {"rowid": _rowid_fts(entite, identifiant), "entite": entite, "id": identifiant, "texte": texte_indexe}
+
+
+def _indexer(connection, entite: str, identifiant: int, texte_indexe: Optional[str]):
+    if texte_indexe is None:
+        connection.execute(_SUPPRESSION_FTS, {"rowid": _rowid_fts(entite, identifiant)})
+    else:
+        connection.execute(_ECRITURE_FTS, _document(entite, identifiant, texte_indexe))
+
+
+def _rowids_conformes(connection) -> bool:
+    # Table créée avant les rowids dérivés : ses rowids sont séquentiels
+    ligne = connection.execute(
+        text(f"SELECT rowid, entite, entite_id FROM {_TABLE_FTS} ORDER BY rowid LIMIT 1")
+    ).first()
+    return ligne is None or (ligne.entite in _CODES_FTS and ligne.rowid == _rowid_fts(ligne.entite, ligne.entite_id))
+
+
+def assurer_index_fts(connection):
+    """Crée la table FTS5 au premier usage et l'alimente depuis les tables existantes."""
+    moteur = connection.engine
+    if moteur in _moteurs_fts_prets:
+        return
+
+    existe = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :nom"), {"nom": _TABLE_FTS}
+    ).first()
+    if existe and not _rowids_conformes(connection):
+        connection.execute(text(f"DROP TABLE {_TABLE_FTS}"))
+        existe = None
+    if not existe:
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE {_TABLE_FTS} USING fts5("
+            "entite UNINDEXED, entite_id UNINDEXED, texte, tokenize = 'unicode61 remove_diacritics 2')"
+        ))
+        reconstruire_index_fts(connection)
+    _moteurs_fts_prets.add(moteur)
+
+
+def reconstruire_index_fts(connection):
+    connection.execute(text(f"DELETE FROM {_TABLE_FTS}"))
+    for entite, cfg in ENTITES_RECHERCHE.items():
+        lignes = connection.execute(
+            cfg.modele.__table__.select().with_only_columns(cfg.colonne_id, *cfg.colonnes_texte)
+        )
+        documents = [
+            _document(entite, identifiant, " ".join(str(v) for v in valeurs if v))
+            for identifiant, *valeurs in lignes
+        ]
+        if documents:
+            connection.execute(_ECRITURE_FTS, documents)
+
+
+def _apres_insertion(mapper, connection, instance):
+    if connection.dialect.name != "sqlite":
+        return
+    entite = _ENTITE_PAR_MODELE[type(instance)]
+    cfg = ENTITES_RECHERCHE[entite]
+    document = _document(entite, getattr(instance, cfg.colonne_id.key), _texte_indexe(instance, cfg))
+    # Une ligne neuve est indexée en lot à la fin du flush
+    session = object_session(instance)
+    if session is not None:
+        session.info.setdefault("fts_insertions", []).append(document)
+    else:
+        assurer_index_fts(connection)
+        connection.execute(_ECRITURE_FTS, document)
+
+
+def _apres_mise_a_jour(mapper, connection, instance):
+    if connection.dialect.name != "sqlite":
+        return
+    entite = _ENTITE_PAR_MODELE[type(instance)]
+    cfg = ENTITES_RECHERCHE[entite]
+    etat = inspect(instance)
+    # Une mise à jour qui ne touche pas au texte (montant, deleted_at...) ne réindexe rien
+    if any(etat.attrs[c.key].history.has_changes() for c in cfg.colonnes_texte):
+        assurer_index_fts(connection)
+        _indexer(connection, entite, getattr(instance, cfg.colonne_id.key), _texte_indexe(instance, cfg))
+
+
+def _apres_suppression(mapper, connection, instance):
+    if connection.dialect.name != "sqlite":
+        return
+    entite = _ENTITE_PAR_MODELE[type(instance)]
+    assurer_index_fts(connection)
+    _indexer(connection, entite, getattr(instance, ENTITES_RECHERCHE[entite].colonne_id.key), None)
+
+
+for _cfg in ENTITES_RECHERCHE.values():
+    event.listen(_cfg.modele, "after_insert", _apres_insertion)
+    event.listen(_cfg.modele, "after_update", _apres_mise_a_jour)
+    event.listen(_cfg.modele, "after_delete", _apres_suppression)
+
+
+@event.listens_for(Session, "after_begin")
+def _preparer_index_fts(session, transaction, connection):
+    # Table créée (et alimentée) avant tout flush : créée pendant un flush, la
+    # reconstruction indexerait aussi les lignes que after_insert va ajouter
+    if connection.dialect.name == "sqlite":
+        assurer_index_fts(connection)
+
+
+@event.listens_for(Session, "after_flush")
+def _indexer_insertions(session, flush_context):
+    documents = session.info.pop("fts_insertions", None)
+    if documents:
+        connection = session.connection()
+        assurer_index_fts(connection)
+        connection.execute(_ECRITURE_FTS, documents)
+
+
+@event.listens_for(Session, "after_rollback")
+def _oublier_insertions(session):
+    session.info.pop("fts_insertions", None)
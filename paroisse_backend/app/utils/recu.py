@@ -1,15 +1,162 @@
+import re
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Iterable, List, Optional
+
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from datetime import datetime
+
 from app.models.recu import Recu
+from app.models.sequence_recu import SequenceRecu
+from app.utils.amorcage import inserer_ou_relire
+from app.utils.budget import cle_intitule
+
+# Service des reçus : numérotation annuelle sans trou ("R-2025-000042") et
+# référence (source_type, source_id) vers l'écriture d'origine.
+#
+# Les numéros sont pris sur le compteur de l'année (SequenceRecu), verrouillé
+# jusqu'au commit de l'appelant : un rollback rend les numéros, d'où l'absence
+# de trou. Une création en lot (import) réserve d'un coup un bloc de numéros
+# par année, en une seule écriture du compteur, au lieu d'un verrou par reçu.
+#
+# Le reçu d'une écriture est daté, et donc numéroté, à la date de l'écriture
+# (création unitaire comme import) : un don du 28/12/2024 saisi en janvier
+# prend un numéro R-2024-... .
+
+_RE_NUMERO = re.compile(r"^R-(\d{4})-(\d+)$")
+
+
+def numero_recu(annee: int, sequence: int) -> str:
+    return f"R-{annee}-{sequence:06d}"
+
+
+def allouer_numeros(db: Session, annee: int, nombre: int = 1) -> range:
+    """
+    Réserve `nombre` numéros consécutifs pour l'année et renvoie leurs rangs.
+    Aucun commit : le compteur reste verrouillé jusqu'à la fin de la transaction.
+    """
+    def relire():
+        return db.query(SequenceRecu).filter(SequenceRecu.annee == annee).with_for_update().first()
+
+    sequence = relire()
+    if not sequence:
+        # Première numérotation de l'année : on repart des reçus déjà numérotés
+        # (numéros sur 6 chiffres : l'ordre alphabétique est l'ordre numérique)
+        dernier = db.query(func.max(Recu.numero)).filter(Recu.numero.like(f"R-{annee}-%")).scalar()
+        correspondance = _RE_NUMERO.match(dernier or "")
+        sequence, _ = inserer_ou_relire(
+            db, SequenceRecu, {"annee": annee, "dernier_numero": int(correspondance.group(2)) if correspondance else 0},
+            relire
+        )
+
+    debut = (sequence.dernier_numero or 0) + 1
+    sequence.dernier_numero = debut + nombre - 1
+    db.flush()
+    return range(debut, debut + nombre)
+
+
+def _instant(valeur) -> Optional[datetime]:
+    # Les écritures datées au jour (offrande, salaire) sont émises à minuit
+    if valeur is None or isinstance(valeur, datetime):
+        return valeur
+    if isinstance(valeur, date):
+        return datetime(valeur.year, valeur.month, valeur.day)
+    return valeur
+
+
+def _description(source: str, reference_id: int) -> str:
+    return f"Reçu automatique pour {source} n°{reference_id}"
+
+
+def creer_recus(db: Session, recus: Iterable[dict], utilisateur_id: int) -> List[Recu]:
+    """
+    Crée des reçus en lot. Chaque élément porte montant, source (intitulé :
+    "Don", "Offrande", "Quête"... ; absent pour un reçu manuel), reference_id
+    et, au besoin, date_emission et description. Un bloc de numéros est
+    réservé par année d'émission. Aucun commit.
+    """
+    maintenant = datetime.utcnow()
+    par_annee = defaultdict(list)
+    for recu in recus:
+        emission = _instant(recu.get("date_emission")) or maintenant
+        par_annee[emission.year].append((emission, recu))
+
+    crees, cles = [], {}
+    for annee in sorted(par_annee):
+        lot = par_annee[annee]
+        for rang, (emission, recu) in zip(allouer_numeros(db, annee, len(lot)), lot):
+            source = recu.get("source")
+            if source and source not in cles:
+                cles[source] = cle_intitule(source)
+            crees.append(Recu(
+                numero=numero_recu(annee, rang),
+                source_type=cles.get(source),
+                source_id=recu.get("reference_id"),
+                montant=recu["montant"],
+                date_emission=emission,
+                description=recu.get("description") or (_description(source, recu["reference_id"]) if source else None),
+                utilisateur_id=utilisateur_id,
+            ))
+
+    db.add_all(crees)
+    db.flush()
+    return crees
+
+
+def generate_recu(
+    db: Session,
+    montant: float,
+    source: str,
+    reference_id: int,
+    utilisateur_id: int,
+    date_emission: Optional[date] = None,
+    description: Optional[str] = None
+):
+    # Pas de commit : le reçu est validé avec l'écriture qui le génère.
+    # date_emission est la date de l'écriture : elle fixe l'année du numéro.
+    return creer_recus(db, [{
+        "montant": montant,
+        "source": source,
+        "reference_id": reference_id,
+        "date_emission": date_emission,
+        "description": description,
+    }], utilisateur_id)[0]
+
+
+def recu_de_source(db: Session, source_type: str, source_id: int, include_deleted: bool = False):
+    """Reçu d'une écriture (ex. ("don", 42)), servi par l'index ix_recu_source."""
+    query = db.query(Recu).filter(Recu.source_type == cle_intitule(source_type), Recu.source_id == source_id)
+    if not include_deleted:
+        query = query.filter(Recu.deleted_at == None)
+    return query.order_by(Recu.recu_id.desc()).first()
+
+
+# --- REPRISE DE L'EXISTANT ---
+
+_RE_DESCRIPTION = re.compile(r"^Reçu automatique pour (\w+) n°(\d+)$")
+
+
+def numeroter_recus_existants(db: Session) -> int:
+    """
+    Numérote les reçus antérieurs au service (dans l'ordre d'émission) et
+    retrouve leur source depuis la description automatique. Commit unique.
+    """
+    anciens = db.query(Recu).filter(Recu.numero == None).order_by(Recu.date_emission, Recu.recu_id).all()
+    if not anciens:
+        return 0
+
+    par_annee = defaultdict(list)
+    for recu in anciens:
+        par_annee[(recu.date_emission or recu.created_at or datetime.utcnow()).year].append(recu)
+
+    for annee in sorted(par_annee):
+        lot = par_annee[annee]
+        for rang, recu in zip(allouer_numeros(db, annee, len(lot)), lot):
+            recu.numero = numero_recu(annee, rang)
+            correspondance = _RE_DESCRIPTION.match(recu.description or "")
+            if correspondance and recu.source_type is None:
+                recu.source_type = cle_intitule(correspondance.group(1))
+                recu.source_id = int(correspondance.group(2))
 
-def generate_recu(db: Session, montant: float, source: str, reference_id: int, utilisateur_id: int):
-    nouveau_recu = Recu(
-        montant=montant,
-        date_emission=datetime.utcnow(),  # ✅ nom correct du champ dans le modèle
-        description=f"Reçu automatique pour {source} n°{reference_id}",  # ✅ pas de champ 'source' ou 'reference_id', donc on les met dans description
-        utilisateur_id=utilisateur_id
-    )
-    db.add(nouveau_recu)
     db.commit()
-    db.refresh(nouveau_recu)
-    return nouveau_recu
+    return len(anciens)
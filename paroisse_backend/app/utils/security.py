@@ -1,3 +1,7 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
@@ -7,6 +11,7 @@ from enum import Enum
 from passlib.context import CryptContext
 from app.database import get_db
 from app.models.utilisateur import Utilisateur, RoleEnum
+from app.utils.cache import CacheLRU
 
 from typing import List, Callable
 
@@ -15,16 +20,39 @@ from typing import List, Callable
 SECRET_KEY = "ton_secret_ultra_confidentiel"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24h
+UTILISATEUR_CACHE_TTL = 60  # secondes
+# Coût bcrypt (2^rounds itérations) et nombre de hachages exécutés en parallèle
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(os.cpu_count() or 2)))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 # --- GESTION MOT DE PASSE ---
+# bcrypt est volontairement lent (~250 ms au coût 12) : tous les calculs passent
+# par un pool dédié et borné, ce qui limite la charge CPU lors des pics de
+# connexion et évite de bloquer la boucle d'événements dans les routes async.
+_executeur_bcrypt = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return _executeur_bcrypt.submit(pwd_context.hash, password).result()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return _executeur_bcrypt.submit(pwd_context.verify, plain_password, hashed_password).result()
+
+async def hash_password_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executeur_bcrypt, pwd_context.hash, password)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str):
+    """
+    Retourne (valide, nouveau_hash). nouveau_hash est renseigné quand le hash
+    stocké a été calculé avec un autre coût que BCRYPT_ROUNDS.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _executeur_bcrypt, pwd_context.verify_and_update, plain_password, hashed_password
+    )
 
 # --- GESTION JWT ---
 def create_access_token(data: dict, expires_delta: timedelta = None):
@@ -40,29 +68,58 @@ def decode_access_token(token: str):
         return None
 
 # --- UTILISATEUR COURANT (via JWT) ---
+@dataclass(frozen=True)
+class UtilisateurCourant:
+    """Identité légère de l'utilisateur authentifié, gardée en cache entre les requêtes."""
+    utilisateur_id: int
+    role: RoleEnum
+    supprime: bool
+
+
+# sub du token -> UtilisateurCourant. La durée de vie borne le délai de prise en
+# compte d'une modification faite hors de crud/utilisateur (ou par un autre processus).
+_cache_utilisateurs = CacheLRU(maxsize=1024, ttl=UTILISATEUR_CACHE_TTL)
+
+
+def invalider_utilisateur_courant(utilisateur_id: int):
+    _cache_utilisateurs.invalider(str(utilisateur_id))
+
+
 def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
-) -> Utilisateur:
+) -> UtilisateurCourant:
     payload = decode_access_token(token)
-    print("Payload du token :", payload)  # ← TEMPORAIRE
 
     if not payload or "sub" not in payload:
         raise HTTPException(status_code=401, detail="Token invalide")
 
-    user = db.query(Utilisateur).filter(
-        Utilisateur.utilisateur_id == int(payload["sub"]),
-        Utilisateur.deleted_at.is_(None)
-    ).first()
+    sujet = str(payload["sub"])
+    user = _cache_utilisateurs.get(sujet)
+
+    if user is None:
+        ligne = db.query(
+            Utilisateur.utilisateur_id,
+            Utilisateur.role,
+            Utilisateur.deleted_at
+        ).filter(Utilisateur.utilisateur_id == int(sujet)).first()
+
+        if ligne:
+            user = UtilisateurCourant(
+                utilisateur_id=ligne.utilisateur_id,
+                role=ligne.role,
+                supprime=ligne.deleted_at is not None
+            )
+            _cache_utilisateurs.set(sujet, user)
 
-    if not user:
+    if not user or user.supprime:
         raise HTTPException(status_code=401, detail="Utilisateur non trouvé ou supprimé")
 
     return user
 
 # --- RESTRICTION PAR RÔLE ---
 def role_required(allowed_roles: List[str]) -> Callable:
-    def wrapper(current_user: Utilisateur = Depends(get_current_user)):
+    def wrapper(current_user: UtilisateurCourant = Depends(get_current_user)):
         if current_user.role not in allowed_roles:
             raise HTTPException(
                 status_code=403,
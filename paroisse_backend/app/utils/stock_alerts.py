@@ -1,39 +1,196 @@
+import logging
+import threading
+import time
+from typing import Iterable, Optional
+from sqlalchemy import case, func, insert
 from sqlalchemy.orm import Session
-from app.crud import stock_materiel as crud_stock
-from app.crud import materiel as crud_materiel
+from app.config import ALERTES_STOCK_FENETRE_SECONDES
+from app.database import SessionLocal
+from app.models.materiel import Materiel
+from app.models.stock_courant import StockCourant
+from app.models.stock_materiel import StockMateriel, TypeMouvementStockEnum
 from app.models.notification import Notification, TypeNotificationEnum
 from app.models.utilisateur import Utilisateur
 from app.permissions.stock_materiel import ALLOWED_ROLES_STOCK
 
-def verifier_alertes_stock(db: Session):
-    materiels = crud_materiel.get_materiels(db)
-    utilisateurs_autorises = db.query(Utilisateur).filter(Utilisateur.role.in_(ALLOWED_ROLES_STOCK)).all()
-
-    notifications_creees = []
-    for materiel in materiels:
-        quantite_dispo = crud_stock.get_stock_actuel_par_materiel(db, materiel.materiel_id)
-
-        if quantite_dispo <= materiel.seuil_min:
-            for user in utilisateurs_autorises:
-                notif_existante = db.query(Notification).filter(
-                    Notification.titre == f"Stock faible: {materiel.nom}",
-                    Notification.utilisateur_id == user.utilisateur_id,
-                    Notification.type == TypeNotificationEnum.warning,
-                    Notification.est_lue == False
-                ).first()
-
-                if not notif_existante:
-                    notif = Notification(
-                        titre=f"Stock faible: {materiel.nom}",
-                        message=f"Le stock du matériel '{materiel.nom}' est faible ({quantite_dispo} unité(s) disponible(s)).",
-                        type=TypeNotificationEnum.warning,
-                        utilisateur_id=user.utilisateur_id,
-                        est_lue=False
-                    )
-                    db.add(notif)
-                    notifications_creees.append(notif)
+logger = logging.getLogger(__name__)
+
+
+def titre_alerte_stock(nom_materiel: str) -> str:
+    return f"Stock faible: {nom_materiel}"
+
+
+def materiels_sous_seuil(db: Session, materiel_ids: Optional[Iterable[int]] = None):
+    """
+    Matériels actifs dont le stock est <= seuil_min, en une requête :
+    [(materiel_id, nom, quantité)]. Le stock vient de StockCourant ; pour un
+    matériel sans ligne (historique antérieur), il est recalculé depuis les mouvements.
+    """
+    historique = db.query(
+        StockMateriel.materiel_id.label("materiel_id"),
+        func.sum(case(
+            (StockMateriel.type_mouvement == TypeMouvementStockEnum.entree, StockMateriel.quantite),
+            else_=-StockMateriel.quantite
+        )).label("quantite")
+    ).filter(
+        ~StockMateriel.materiel_id.in_(db.query(StockCourant.materiel_id))
+    ).group_by(StockMateriel.materiel_id).subquery()
+
+    quantite = func.coalesce(StockCourant.quantite, historique.c.quantite, 0)
+
+    query = db.query(Materiel.materiel_id, Materiel.nom, quantite)\
+        .outerjoin(StockCourant, StockCourant.materiel_id == Materiel.materiel_id)\
+        .outerjoin(historique, historique.c.materiel_id == Materiel.materiel_id)\
+        .filter(Materiel.deleted_at.is_(None), quantite <= Materiel.seuil_min)
+
+    if materiel_ids is not None:
+        query = query.filter(Materiel.materiel_id.in_(list(materiel_ids)))
+
+    return query.all()
+
+
+def verifier_alertes_stock(db: Session, materiel_ids: Optional[Iterable[int]] = None):
+    """
+    Crée une alerte « Stock faible » pour chaque matériel sous son seuil et
+    chaque utilisateur autorisé qui n'en a pas déjà une non lue. Trois requêtes
+    quel que soit le nombre de matériels et d'utilisateurs ; `materiel_ids`
+    limite la vérification aux matériels concernés par un mouvement.
+    """
+    sous_seuil = materiels_sous_seuil(db, materiel_ids)
+    if not sous_seuil:
+        return []
+
+    utilisateurs_ids = [
+        u_id for (u_id,) in db.query(Utilisateur.utilisateur_id).filter(Utilisateur.role.in_(ALLOWED_ROLES_STOCK))
+    ]
+    if not utilisateurs_ids:
+        return []
+
+    titres = {materiel_id: titre_alerte_stock(nom) for materiel_id, nom, _ in sous_seuil}
+    deja_alertes = set(db.query(Notification.titre, Notification.utilisateur_id).filter(
+        Notification.titre.in_(set(titres.values())),
+        Notification.utilisateur_id.in_(utilisateurs_ids),
+        Notification.type == TypeNotificationEnum.warning,
+        Notification.est_lue == False
+    ).all())
+
+    notifications_creees = [
+        {
+            "titre": titres[materiel_id],
+            "message": f"Le stock du matériel '{nom}' est faible ({quantite_dispo} unité(s) disponible(s)).",
+            "type": TypeNotificationEnum.warning,
+            "utilisateur_id": utilisateur_id,
+            "est_lue": False,
+        }
+        for materiel_id, nom, quantite_dispo in sous_seuil
+        for utilisateur_id in utilisateurs_ids
+        if (titres[materiel_id], utilisateur_id) not in deja_alertes
+    ]
 
     if notifications_creees:
+        # Insertion en lot (executemany), sans charger les objets dans la session
+        db.execute(insert(Notification), notifications_creees)
         db.commit()
 
     return notifications_creees
+
+
+# --- ÉVALUATION DIFFÉRÉE ---
+#
+# Un mouvement de stock ne vérifie plus les alertes lui-même : il signale le
+# matériel modifié et rend la main. Un thread de fond attend une fenêtre de
+# regroupement puis évalue en une fois tous les matériels signalés (50 chaises
+# prêtées pour un mariage = une seule évaluation pour ce matériel).
+
+class FileAlertesStock:
+    # session_factory : fabrique des sessions du thread d'évaluation (SessionLocal
+    # pour l'application, la base de test dans les tests)
+    def __init__(self, fenetre: float, session_factory):
+        self.fenetre = fenetre
+        self.session_factory = session_factory
+        self._condition = threading.Condition()
+        self._en_attente = {}  # materiel_id -> instant du premier signal non traité
+        self._thread = None
+        self._signaux = 0
+        self._regroupes = 0
+        self._evaluations = 0
+        self._materiels_evalues = 0
+        self._echecs = 0
+        self._latence_derniere = None
+        self._latence_max = 0.0
+        self._latence_totale = 0.0
+
+    def signaler(self, materiel_id: int):
+        """Appelé après le commit d'un mouvement : ne bloque jamais sur l'évaluation."""
+        with self._condition:
+            self._signaux += 1
+            if materiel_id in self._en_attente:
+                self._regroupes += 1
+            else:
+                self._en_attente[materiel_id] = time.monotonic()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._boucle, name="alertes-stock", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def _boucle(self):
+        while True:
+            with self._condition:
+                while not self._en_attente:
+                    self._condition.wait()
+            # Fenêtre de regroupement : les signaux suivants rejoignent ce lot
+            time.sleep(self.fenetre)
+            self.vider()
+
+    def vider(self):
+        """Évalue immédiatement les matériels en attente (aussi utilisé à l'arrêt)."""
+        with self._condition:
+            lot, self._en_attente = self._en_attente, {}
+        if not lot:
+            return
+
+        db = self.session_factory()
+        try:
+            verifier_alertes_stock(db, materiel_ids=lot.keys())
+        except Exception:
+            db.rollback()
+            logger.exception("Échec de l'évaluation des alertes de stock pour %s", sorted(lot))
+            with self._condition:
+                self._echecs += 1
+            return
+        finally:
+            db.close()
+
+        fin = time.monotonic()
+        latences = [fin - debut for debut in lot.values()]
+        with self._condition:
+            self._evaluations += 1
+            self._materiels_evalues += len(lot)
+            self._latence_derniere = max(latences)
+            self._latence_max = max(self._latence_max, self._latence_derniere)
+            self._latence_totale += sum(latences)
+
+    def metriques(self) -> dict:
+        with self._condition:
+            return {
+                "profondeur": len(self._en_attente),
+                "fenetre_secondes": self.fenetre,
+                "signaux": self._signaux,
+                "signaux_regroupes": self._regroupes,
+                "evaluations": self._evaluations,
+                "materiels_evalues": self._materiels_evalues,
+                "echecs": self._echecs,
+                # Délai entre le signal d'un mouvement et la fin de son évaluation
+                "latence_derniere_secondes": self._latence_derniere,
+                "latence_max_secondes": self._latence_max,
+                "latence_moyenne_secondes": (
+                    self._latence_totale / self._materiels_evalues if self._materiels_evalues else None
+                ),
+            }
+
+
+file_alertes_stock = FileAlertesStock(fenetre=ALERTES_STOCK_FENETRE_SECONDES, session_factory=SessionLocal)
+
+
+def signaler_stock_modifie(materiel_id: int):
+    file_alertes_stock.signaler(materiel_id)
@@ -0,0 +1,121 @@
+import threading
+from collections import defaultdict
+from typing import Optional
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from app.models.don import Don
+from app.models.offrande import Offrande
+from app.models.quete import Quete
+from app.models.facture import Facture
+from app.models.achat import Achat
+from app.models.salaire import Salaire
+from app.models.recu import Recu
+from app.utils.cache import CacheLRU
+from app.utils.periode import filtre_annee
+
+# Totaux agrégés (SUM(montant)) par entité : global, par utilisateur ou par année.
+# Ils étaient recalculés sur toute la table à chaque liste/détail ; ils sont
+# désormais gardés en cache et invalidés dès qu'une transaction modifiant
+# l'entité est validée (quelle que soit la route ou le CRUD à l'origine de
+# l'écriture). La durée de vie borne l'écart entre plusieurs processus.
+#
+# Un lecteur peut calculer une somme sur un instantané antérieur à un commit
+# concurrent, puis la mettre en cache après l'invalidation de ce commit. Chaque
+# entité a donc un numéro de génération, incrémenté à chaque invalidation et
+# relevé à l'ouverture de la transaction du lecteur : si la génération a
+# changé entre-temps, le total est renvoyé sans être mis en cache.
+
+EN_TETE_TOTAL = "X-Montant-Total"
+TTL_TOTAUX = 300  # secondes
+
+# entité -> (modèle, colonne date)
+ENTITES = {
+    "don": (Don, Don.date_don),
+    "offrande": (Offrande, Offrande.date),
+    "quete": (Quete, Quete.date_quete),
+    "facture": (Facture, Facture.date_facture),
+    "achat": (Achat, Achat.date_achat),
+    "salaire": (Salaire, Salaire.date_paiement),
+    "recu": (Recu, Recu.date_emission),
+}
+_ENTITE_PAR_MODELE = {modele: entite for entite, (modele, _) in ENTITES.items()}
+
+_cache_totaux = CacheLRU(maxsize=1024, ttl=TTL_TOTAUX)
+_generations = defaultdict(int)  # entité -> nombre d'invalidations
+_verrou_generations = threading.Lock()
+
+
+def total_montant(
+    db: Session,
+    entite: str,
+    utilisateur_id: Optional[int] = None,
+    annee: Optional[int] = None,
+    include_deleted: bool = False
+) -> float:
+    cle = (entite, utilisateur_id, annee, include_deleted)
+    total = _cache_totaux.get(cle)
+    if total is not None:
+        return total
+
+    # Génération vue au début de la transaction (donc avant son instantané)
+    generation = db.info.get("generations_totaux", {}).get(entite)
+    if generation is None:
+        generation = _generations[entite]
+
+    modele, colonne_date = ENTITES[entite]
+    query = db.query(func.coalesce(func.sum(modele.montant), 0))
+    if not include_deleted:
+        query = query.filter(modele.deleted_at == None)
+    if utilisateur_id is not None:
+        query = query.filter(modele.utilisateur_id == utilisateur_id)
+    if annee is not None:
+        query = query.filter(filtre_annee(colonne_date, annee))
+
+    total = float(query.scalar() or 0)
+    with _verrou_generations:
+        if _generations[entite] == generation:
+            _cache_totaux.set(cle, total)
+    return total
+
+
+def invalider_totaux(*entites):
+    entites = set(entites)
+    with _verrou_generations:
+        for entite in entites:
+            _generations[entite] += 1
+        _cache_totaux.invalider_si(lambda cle: cle[0] in entites)
+
+
+def exposer_total(response, total: float):
+    response.headers[EN_TETE_TOTAL] = str(total)
+
+
+# --- INVALIDATION SUR COMMIT ---
+
+@event.listens_for(Session, "after_begin")
+def _relever_generations(session, transaction, connection):
+    with _verrou_generations:
+        session.info["generations_totaux"] = dict(_generations)
+
+
+@event.listens_for(Session, "after_flush")
+def _noter_entites_modifiees(session, flush_context):
+    modifiees = session.info.setdefault("totaux_modifies", set())
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        entite = _ENTITE_PAR_MODELE.get(type(instance))
+        if entite:
+            modifiees.add(entite)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalider_apres_commit(session):
+    modifiees = session.info.pop("totaux_modifies", None)
+    if modifiees:
+        invalider_totaux(*modifiees)
+
+
+@event.listens_for(Session, "after_rollback")
+def _oublier_apres_rollback(session):
+    session.info.pop("totaux_modifies", None)
@@ -0,0 +1,108 @@
+"""
+Connexions concurrentes sur POST /api/auth/login.
+
+    python bench/bench_connexion.py --connexions 40 --utilisateurs 20
+
+Les connexions sont lancées simultanément sur l'application ASGI (httpx,
+sans serveur réseau) pendant qu'une sonde interroge GET / en boucle : le
+script affiche le débit des connexions et la latence de la sonde, qui doit
+rester de l'ordre de la milliseconde si bcrypt ne bloque pas la boucle
+d'événements. BCRYPT_ROUNDS et BCRYPT_WORKERS sont lus dans l'environnement,
+comme en production.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+os.chdir(RACINE)
+
+MOT_DE_PASSE = "motdepasse"
+
+
+def preparer(utilisateurs: int):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    from app.database import Base, get_db
+    from app.main import app
+    from app.models import RoleEnum, Utilisateur
+    from app.utils.security import hash_password
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    fabrique = sessionmaker(bind=engine, autoflush=False)
+
+    db = fabrique()
+    hash_commun = hash_password(MOT_DE_PASSE)
+    db.add_all([
+        Utilisateur(nom=f"Fidèle {i}", email=f"u{i}@paroisse.cm", mot_de_passe=hash_commun, role=RoleEnum.Fidele)
+        for i in range(utilisateurs)
+    ])
+    db.commit()
+    db.close()
+
+    def get_db_bench():
+        session = fabrique()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = get_db_bench
+    return app
+
+
+async def mesurer(app, connexions: int, utilisateurs: int):
+    import httpx
+
+    latences = []
+    termine = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def sonde():
+            while not termine.is_set():
+                debut = time.perf_counter()
+                await client.get("/")
+                latences.append((time.perf_counter() - debut) * 1000)
+                await asyncio.sleep(0.01)
+
+        tache_sonde = asyncio.create_task(sonde())
+        debut = time.perf_counter()
+        reponses = await asyncio.gather(*[
+            client.post("/api/auth/login", data={"username": f"u{i % utilisateurs}@paroisse.cm", "password": MOT_DE_PASSE})
+            for i in range(connexions)
+        ])
+        duree = time.perf_counter() - debut
+        termine.set()
+        await tache_sonde
+
+    codes = sorted({r.status_code for r in reponses})
+    print(f"{connexions} connexions en {duree:.2f} s ({connexions / duree:.1f}/s), codes HTTP {codes}")
+    if latences:
+        latences.sort()
+        print(
+            f"Sonde GET / pendant la rafale : {len(latences)} requêtes, "
+            f"médiane {statistics.median(latences):.1f} ms, max {latences[-1]:.1f} ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connexions", type=int, default=40)
+    parser.add_argument("--utilisateurs", type=int, default=20)
+    args = parser.parse_args()
+
+    from app.utils.security import BCRYPT_ROUNDS, BCRYPT_WORKERS
+    print(f"bcrypt : coût {BCRYPT_ROUNDS}, {BCRYPT_WORKERS} worker(s), {os.cpu_count()} CPU")
+    app = preparer(args.utilisateurs)
+    asyncio.run(mesurer(app, args.connexions, args.utilisateurs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Mémoire de pointe de l'export Excel du grand livre.
+
+    python bench/bench_export_excel.py --lignes 100000
+
+Une base SQLite temporaire est remplie de dons, puis l'export
+GET /api/rapports/rapport/grand-livre/export-excel est téléchargé par morceaux dans
+un processus séparé, pour que la mémoire de remplissage ne compte pas. Le
+script affiche le RSS de pointe avant et après l'export, sa durée et la taille
+du fichier produit.
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+os.chdir(RACINE)
+
+ANNEE = 2024
+TAILLE_LOT = 10000
+
+
+def _rss_mo():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def remplir(chemin: str, lignes: int):
+    from sqlalchemy import create_engine, insert
+    from sqlalchemy.orm import sessionmaker
+
+    import app.utils.recherche  # noqa: F401 (index plein texte SQLite)
+    from app.database import Base
+    from app.models import Don, RoleEnum, Utilisateur
+
+    engine = create_engine(f"sqlite:///{chemin}")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add(Utilisateur(nom="Bench", email="bench@paroisse.cm", mot_de_passe="x", role=RoleEnum.Administrateur))
+    db.commit()
+    for debut in range(0, lignes, TAILLE_LOT):
+        db.execute(insert(Don), [
+            {
+                "donateur": f"Donateur {i}",
+                "montant": 1000 + i % 5000,
+                "type": "mobile",
+                "date_don": datetime(ANNEE, 1 + i % 12, 1 + i % 28),
+                "commentaire": "Don enregistré pour le banc d'essai de l'export Excel",
+                "utilisateur_id": 1,
+            }
+            for i in range(debut, min(debut + TAILLE_LOT, lignes))
+        ])
+        db.commit()
+    db.close()
+
+    # Les dons sont insérés sans passer par l'ORM : l'index de recherche SQLite
+    # est reconstruit ici, au premier begin d'une session, et non pendant la mesure
+    db = sessionmaker(bind=create_engine(f"sqlite:///{chemin}"))()
+    db.connection()
+    db.commit()
+    db.close()
+    engine.dispose()
+
+
+def mesurer(chemin: str):
+    from fastapi.testclient import TestClient
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.database import get_db
+    from app.main import app
+    from app.utils.security import create_access_token
+
+    fabrique = sessionmaker(bind=create_engine(f"sqlite:///{chemin}"), autoflush=False)
+
+    def get_db_bench():
+        db = fabrique()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = get_db_bench
+    client = TestClient(app)
+    entetes = {"Authorization": "Bearer " + create_access_token({"sub": "1"})}
+
+    avant = _rss_mo()
+    debut = time.perf_counter()
+    taille = 0
+    with client.stream("GET", f"/api/rapports/rapport/grand-livre/export-excel?annee_debut={ANNEE}", headers=entetes) as reponse:
+        reponse.raise_for_status()
+        for morceau in reponse.iter_bytes():
+            taille += len(morceau)
+    duree = time.perf_counter() - debut
+
+    print(f"RSS de pointe avant export : {avant:.0f} Mo")
+    print(f"RSS de pointe après export : {_rss_mo():.0f} Mo (+{_rss_mo() - avant:.0f} Mo)")
+    print(f"Durée : {duree:.1f} s, fichier : {taille / 1024 / 1024:.1f} Mo")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lignes", type=int, default=100000)
+    parser.add_argument("--mesurer", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mesurer:
+        mesurer(args.mesurer)
+        return
+
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "bench.db")
+        debut = time.perf_counter()
+        remplir(chemin, args.lignes)
+        print(f"{args.lignes} dons insérés en {time.perf_counter() - debut:.1f} s")
+        subprocess.run([sys.executable, os.path.abspath(__file__), "--mesurer", chemin], check=True)
+
+
+if __name__ == "__main__":
+    main()
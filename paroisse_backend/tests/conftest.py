@@ -0,0 +1,131 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Les tests se lancent depuis paroisse_backend (python -m pytest) ; l'application
+# monte le dossier photos/ relatif au répertoire courant.
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+os.chdir(RACINE)
+
+from app.database import Base, get_db  # noqa: E402
+from app.models import RoleEnum, Utilisateur  # noqa: E402
+
+# Base SQLite en mémoire partagée par toutes les connexions d'un test :
+# l'application tourne sur MySQL, mais les requêtes et index testés ici
+# sont portables.
+
+
+@pytest.fixture
+def engine():
+    e = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(e)
+    yield e
+    e.dispose()
+
+
+@pytest.fixture
+def fabrique_session(engine):
+    return sessionmaker(bind=engine, autoflush=False)
+
+
+@pytest.fixture
+def db(fabrique_session):
+    session = fabrique_session()
+    yield session
+    session.close()
+
+
+@pytest.fixture(autouse=True)
+def caches_vides():
+    # Caches mémoire de processus : chaque test part d'une base neuve
+    from app.crud.rapport import _cache_rapport_financier
+    from app.utils.disponibilite import _arbres
+    from app.utils.security import _cache_utilisateurs
+    from app.utils.totaux import _cache_totaux
+
+    caches = (_cache_totaux, _cache_utilisateurs, _cache_rapport_financier, _arbres)
+    for cache in caches:
+        cache.vider()
+    yield
+    for cache in caches:
+        cache.vider()
+
+
+@pytest.fixture
+def utilisateur(db):
+    admin = Utilisateur(nom="Admin", prenom="Test", email="admin@paroisse.cm", mot_de_passe="x",
+                        role=RoleEnum.Administrateur)
+    db.add(admin)
+    db.commit()
+    return admin
+
+
+@pytest.fixture
+def app(fabrique_session, monkeypatch):
+    from app.main import app as application
+    from app.utils.stock_alerts import file_alertes_stock
+
+    # Alertes de stock évaluées sur la base de test, jamais sur SessionLocal
+    monkeypatch.setattr(file_alertes_stock, "session_factory", fabrique_session)
+
+    def get_db_test():
+        session = fabrique_session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    application.dependency_overrides[get_db] = get_db_test
+    yield application
+    application.dependency_overrides.pop(get_db, None)
+    file_alertes_stock.vider()
+
+
+@pytest.fixture
+def client(app, utilisateur):
+    from fastapi.testclient import TestClient
+    return TestClient(app)
+
+
+@pytest.fixture
+def entetes(utilisateur):
+    from app.utils.security import create_access_token
+    return {"Authorization": "Bearer " + create_access_token({"sub": str(utilisateur.utilisateur_id)})}
+
+
+class Compteur:
+    """Requêtes SQL émises et commits validés depuis la dernière remise à zéro."""
+
+    def __init__(self):
+        self.requetes = []
+        self.commits = 0
+
+    def remettre_a_zero(self):
+        self.requetes = []
+        self.commits = 0
+
+    @property
+    def nb_requetes(self):
+        return len(self.requetes)
+
+
+@pytest.fixture
+def compteur(engine):
+    compteur = Compteur()
+
+    def sur_requete(conn, cursor, statement, parameters, context, executemany):
+        compteur.requetes.append(statement)
+
+    def sur_commit(session):
+        compteur.commits += 1
+
+    event.listen(engine, "before_cursor_execute", sur_requete)
+    event.listen(Session, "after_commit", sur_commit)
+    yield compteur
+    event.remove(engine, "before_cursor_execute", sur_requete)
+    event.remove(Session, "after_commit", sur_commit)
@@ -0,0 +1,13 @@
+from app.models import Facture
+
+
+def test_facture_imprimee_en_pdf(client, entetes, db, utilisateur):
+    facture = Facture(numero="F-7", montant=1500, utilisateur_id=utilisateur.utilisateur_id)
+    db.add(facture)
+    db.commit()
+
+    reponse = client.get(f"/api/factures/{facture.facture_id}/pdf", headers=entetes)
+
+    assert reponse.status_code == 200, reponse.text
+    assert reponse.headers["content-type"] == "application/pdf"
+    assert reponse.content.startswith(b"%PDF")
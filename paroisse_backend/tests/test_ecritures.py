@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import pytest
+
+from app.models import Don, Employe, Recu
+
+# Une écriture de recette (don, offrande, quête) est enregistrée en une seule
+# unité de travail : l'écriture, son reçu, le budget et la notification.
+
+ECRITURES = {
+    "don": ("/api/dons/", "don_id", lambda uid: {
+        "donateur": "Famille Ngono", "montant": 5000, "type": "mobile", "date_don": "2024-03-10T10:00:00",
+        "utilisateur_id": uid,
+    }),
+    "offrande": ("/api/offrandes/", "offrande_id", lambda uid: {
+        "date": "2024-03-10", "montant": 3000, "type": "culte", "utilisateur_id": uid,
+    }),
+    "quete": ("/api/quetes/", "quete_id", lambda uid: {
+        "libelle": "Quête du dimanche", "montant": 2000, "date_quete": "2024-03-10T10:00:00", "utilisateur_id": uid,
+    }),
+}
+
+
+@pytest.mark.parametrize("source", sorted(ECRITURES))
+def test_ecriture_en_un_commit_et_un_recu(client, entetes, db, utilisateur, compteur, source):
+    url, cle_id, corps = ECRITURES[source]
+    compteur.remettre_a_zero()
+
+    reponse = client.post(url, headers=entetes, json=corps(utilisateur.utilisateur_id))
+
+    assert reponse.status_code == 200, reponse.text
+    assert compteur.commits == 1
+    recus = db.query(Recu).filter(Recu.source_type == source).all()
+    assert [r.source_id for r in recus] == [reponse.json()[cle_id]]
+
+
+# Les créations qui enchaînent plusieurs écritures (facture, budget, reçu)
+# ne valident qu'une fois : un seul after_commit par requête.
+
+CREATIONS = {
+    "achat": ("/api/achats/", lambda uid, employe_id: {
+        "libelle": "Chaises", "montant": 20000, "date_achat": "2024-03-12",
+    }),
+    "don": ("/api/dons/", lambda uid, employe_id: {
+        "donateur": "Famille Ngono", "montant": 5000, "type": "mobile", "date_don": "2024-03-12T10:00:00",
+        "utilisateur_id": uid,
+    }),
+    "salaire": ("/api/salaires/", lambda uid, employe_id: {
+        "employe_id": employe_id, "montant": 30000, "date_paiement": "2024-03-12",
+    }),
+}
+
+
+@pytest.mark.parametrize("entite", sorted(CREATIONS))
+def test_creation_en_un_seul_after_commit(client, entetes, db, utilisateur, compteur, entite):
+    url, corps = CREATIONS[entite]
+    # Recettes de l'année : l'achat passe la vérification du solde
+    employe = Employe(nom="Sacristain", salaire=30000)
+    db.add_all([
+        employe,
+        Don(donateur="Fonds", montant=100000, type="mobile", date_don=datetime(2024, 1, 5),
+            utilisateur_id=utilisateur.utilisateur_id),
+    ])
+    db.commit()
+    compteur.remettre_a_zero()
+
+    reponse = client.post(url, headers=entetes, json=corps(utilisateur.utilisateur_id, employe.employe_id))
+
+    assert reponse.status_code == 200, reponse.text
+    assert compteur.commits == 1
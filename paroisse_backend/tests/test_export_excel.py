@@ -0,0 +1,33 @@
+from datetime import datetime
+from io import BytesIO
+
+from openpyxl import load_workbook
+
+from app.models import Don
+from app.utils import flux
+
+
+def test_grand_livre_exporte_via_un_fichier_temporaire(client, entetes, db, utilisateur, monkeypatch):
+    db.add_all([
+        Don(donateur=f"Donateur {i}", montant=100 + i, type="mobile", date_don=datetime(2024, 1, 1 + i),
+            utilisateur_id=utilisateur.utilisateur_id)
+        for i in range(20)
+    ])
+    db.commit()
+
+    # Seuil abaissé : le classeur passe sur disque comme un gros export
+    fichiers = []
+    creer = flux.fichier_temporaire
+    monkeypatch.setattr(flux, "SEUIL_MEMOIRE", 1024)
+    monkeypatch.setattr("app.utils.rapport_excel.fichier_temporaire", lambda: fichiers.append(creer()) or fichiers[-1])
+
+    reponse = client.get("/api/rapports/rapport/grand-livre/export-excel?annee_debut=2024", headers=entetes)
+
+    assert reponse.status_code == 200
+    assert reponse.headers["content-disposition"] == 'attachment; filename="grand_livre_2024.xlsx"'
+    assert len(fichiers) == 1 and fichiers[0].closed
+
+    wb = load_workbook(BytesIO(reponse.content), read_only=True)
+    lignes = list(wb["Dons"].iter_rows(values_only=True))
+    assert len(lignes) == 21
+    assert lignes[1][2] == "Donateur 0"
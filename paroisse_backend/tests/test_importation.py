@@ -0,0 +1,90 @@
+from io import BytesIO
+
+import pytest
+from openpyxl import Workbook
+from sqlalchemy import event
+
+from app.models import Don, Offrande, Recu
+from app.models.registre_budget import RegistreBudget
+
+
+def _csv(lignes):
+    return ("\n".join(";".join(l) for l in lignes)).encode("utf-8")
+
+
+def _xlsx(lignes):
+    wb = Workbook()
+    for ligne in lignes:
+        wb.active.append(ligne)
+    tampon = BytesIO()
+    wb.save(tampon)
+    return tampon.getvalue()
+
+
+def _importer(client, entetes, entite, nom, contenu):
+    return client.post(f"/api/import/{entite}", headers=entetes, files={"fichier": (nom, contenu)})
+
+
+DONS = [
+    ["donateur", "montant", "type", "date_don"],
+    ["Famille Mbarga", "1 500,50", "mobile", "12/03/2023"],
+    ["Famille Atangana", "2000", "espèce", "05/01/2024"],
+    ["Famille Essomba", "3000", "chèque", "06/01/2024"],
+]
+
+OFFRANDES = [
+    ["date", "montant", "type", "description"],
+    ["2023-12-24", 5000, "culte", "Noël"],
+    ["2024-03-31", 7000, "culte", "Pâques"],
+]
+
+
+@pytest.mark.parametrize("entite, modele, nom, lignes, fabriquer", [
+    ("don", Don, "dons.csv", DONS, _csv),
+    ("offrande", Offrande, "offrandes.xlsx", OFFRANDES, _xlsx),
+])
+def test_import_valide(client, entetes, db, engine, entite, modele, nom, lignes, fabriquer):
+    # Lignes du registre budgétaire écrites par instruction
+    registre = []
+
+    def relever(conn, cursor, statement, parameters, context, executemany):
+        if "RegistreBudget" in statement.split(" WHERE")[0] and statement.startswith(("INSERT", "UPDATE")):
+            registre.append(len(parameters) if executemany else 1)
+
+    event.listen(engine, "before_cursor_execute", relever)
+    reponse = _importer(client, entetes, entite, nom, fabriquer(lignes))
+    event.remove(engine, "before_cursor_execute", relever)
+
+    assert reponse.status_code == 200, reponse.text
+    resultat = reponse.json()
+    nb_lignes = db.query(modele).count()
+    assert resultat["enregistre"] is True
+    assert resultat["importees"] == resultat["recus"] == nb_lignes == len(lignes) - 1
+    assert resultat["annees_budget"] == [2023, 2024]
+    # Un reçu par ligne, une écriture au registre par année
+    assert db.query(Recu).count() == nb_lignes
+    assert sum(registre) == 2
+    assert {r.annee for r in db.query(RegistreBudget)} == {2023, 2024}
+
+
+@pytest.mark.parametrize("nom, fabriquer", [("dons.csv", _csv), ("dons.xlsx", _xlsx)])
+def test_import_refuse_en_entier_si_une_ligne_est_invalide(client, entetes, db, nom, fabriquer):
+    lignes = DONS + [
+        ["Famille Owona", "-10", "mobile", "07/01/2024"],
+        ["Famille Ndzana", "1000", "virement", "08/01/2024"],
+    ]
+
+    reponse = _importer(client, entetes, "don", nom, fabriquer(lignes))
+
+    assert reponse.status_code == 400
+    detail = reponse.json()["detail"]
+    assert detail["enregistre"] is False
+    assert (detail["lignes_lues"], detail["importees"], detail["nb_erreurs"]) == (5, 0, 2)
+    assert [e["ligne"] for e in detail["erreurs"]] == [5, 6]
+    assert "strictement positif" in detail["erreurs"][0]["message"]
+    assert detail["erreurs"][1]["message"].startswith("type")
+    assert db.query(Don).count() == db.query(Recu).count() == db.query(RegistreBudget).count() == 0
+
+
+def test_import_entite_inconnue(client, entetes):
+    assert _importer(client, entetes, "salaire", "salaires.csv", _csv(DONS)).status_code == 422
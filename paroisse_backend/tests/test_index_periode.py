@@ -0,0 +1,102 @@
+import os
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.chatbot.chatbot_engine import repondre_question
+from app.database import Base
+from app.utils.budget import SOURCES_BUDGET, total_source
+
+# Les filtres d'année et de mois doivent rester des intervalles [début, fin)
+# servis par les index composites (deleted_at, date) : on relance chaque
+# requête émise sous EXPLAIN et on vérifie l'index choisi.
+
+# source -> (index attendu, colonne date parcourue par intervalle)
+INDEX_PAR_SOURCE = {
+    "don": ("ix_don_deleted_at_date_don", "date_don"),
+    "offrande": ("ix_offrande_deleted_at_date", "date"),
+    "quete": ("ix_quete_deleted_at_date_quete", "date_quete"),
+    "achat": ("ix_achat_deleted_at_date_achat", "date_achat"),
+    "salaire": ("ix_salaire_deleted_at_date_paiement", "date_paiement"),
+}
+
+MYSQL_URL = os.getenv("PAROISSE_TEST_MYSQL_URL")  # ex. mysql+pymysql://root:@localhost/paroisse_test
+
+
+def _requetes_emises(engine, session, fonction):
+    # La transaction est ouverte avant l'écoute : seules les requêtes de la
+    # fonction sont relevées (pas la préparation de l'index plein texte)
+    session.connection()
+    emises = []
+
+    def noter(conn, cursor, statement, parameters, context, executemany):
+        emises.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", noter)
+    try:
+        fonction()
+    finally:
+        event.remove(engine, "before_cursor_execute", noter)
+    return emises
+
+
+def _verifier_plan(engine, statement, parameters, source):
+    index, colonne = INDEX_PAR_SOURCE[source]
+    with engine.connect() as conn:
+        curseur = conn.connection.cursor()
+        if engine.dialect.name == "sqlite":
+            curseur.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+            plan = " ".join(ligne[-1] for ligne in curseur.fetchall())
+            # Un extract()/strftime() sur la date n'utiliserait que le préfixe deleted_at
+            assert f"USING INDEX {index} (deleted_at=? AND {colonne}>? AND {colonne}<?)" in plan \
+                or f"USING COVERING INDEX {index} (deleted_at=? AND {colonne}>? AND {colonne}<?)" in plan, plan
+        else:
+            curseur.execute("EXPLAIN " + statement, parameters)
+            colonnes = [c[0] for c in curseur.description]
+            lignes = [dict(zip(colonnes, ligne)) for ligne in curseur.fetchall()]
+            assert any(ligne["key"] == index and ligne["type"] == "range" for ligne in lignes), lignes
+
+
+def _moteurs():
+    yield pytest.param("sqlite", id="sqlite")
+    yield pytest.param(
+        "mysql", id="mysql",
+        marks=pytest.mark.skipif(not MYSQL_URL, reason="PAROISSE_TEST_MYSQL_URL non défini")
+    )
+
+
+@pytest.fixture(params=list(_moteurs()))
+def moteur(request, engine):
+    if request.param == "sqlite":
+        yield engine
+        return
+    e = create_engine(MYSQL_URL)
+    Base.metadata.create_all(e)
+    yield e
+    e.dispose()
+
+
+@pytest.mark.parametrize("cle", sorted(SOURCES_BUDGET))
+def test_total_source_utilise_l_index_de_periode(moteur, cle):
+    session = sessionmaker(bind=moteur)()
+    try:
+        emises = _requetes_emises(moteur, session, lambda: total_source(session, cle, 2024))
+    finally:
+        session.close()
+
+    assert len(emises) == 1
+    _verifier_plan(moteur, *emises[0], cle)
+
+
+def test_filtre_du_mois_du_chatbot_utilise_l_index(moteur):
+    session = sessionmaker(bind=moteur)()
+    try:
+        emises = _requetes_emises(moteur, session, lambda: repondre_question("Combien de quêtes ce mois ?", session))
+    finally:
+        session.close()
+
+    requetes_quete = [(s, p) for s, p in emises if "quete" in s.lower()]
+    assert requetes_quete
+    for statement, parameters in requetes_quete:
+        _verifier_plan(moteur, statement, parameters, "quete")
@@ -0,0 +1,99 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import update
+
+from app.models import Don, Facture, Offrande, Quete, Recu
+from app.utils.pagination import EN_TETE_CURSEUR, paginer
+
+
+def _parcourir(client, url, entetes, limite):
+    vus, curseur, pages = [], None, 0
+    while True:
+        params = {"limit": limite}
+        if curseur:
+            params["cursor"] = curseur
+        reponse = client.get(url, params=params, headers=entetes)
+        assert reponse.status_code == 200, reponse.text
+        vus.extend(reponse.json())
+        pages += 1
+        curseur = reponse.headers.get(EN_TETE_CURSEUR)
+        if not curseur:
+            return vus, pages
+
+
+@pytest.mark.parametrize("url, modele, colonnes, cle_id", [
+    ("/api/dons/", Don, lambda i, quand: {"donateur": f"D{i}", "type": "mobile", "date_don": quand}, "don_id"),
+    ("/api/offrandes/", Offrande, lambda i, quand: {"type": "culte", "date": quand.date()}, "offrande_id"),
+    ("/api/quetes/", Quete, lambda i, quand: {"libelle": f"Q{i}", "date_quete": quand}, "quete_id"),
+])
+def test_listes_paginees_par_curseur(client, entetes, db, utilisateur, url, modele, colonnes, cle_id):
+    # Plusieurs écritures le même jour : le tri départage par identifiant
+    db.add_all([
+        modele(montant=100 + i, utilisateur_id=utilisateur.utilisateur_id, **colonnes(i, datetime(2024, 1, 1 + i // 4)))
+        for i in range(25)
+    ])
+    db.commit()
+
+    lignes, pages = _parcourir(client, url, entetes, limite=10)
+
+    identifiants = [ligne[cle_id] for ligne in lignes]
+    assert pages == 3
+    assert sorted(identifiants, reverse=True) == identifiants
+    assert set(identifiants) == set(range(1, 26))
+
+
+def test_curseur_invalide_refuse(client, entetes):
+    assert client.get("/api/dons/", params={"cursor": "pas-un-curseur"}, headers=entetes).status_code == 400
+
+
+def test_lignes_sans_date_atteintes_en_fin_de_liste(db, utilisateur):
+    db.add_all([
+        Recu(montant=10 * i, date_emission=datetime(2024, 3, 1 + i), utilisateur_id=utilisateur.utilisateur_id)
+        for i in range(5)
+    ])
+    db.commit()
+    db.execute(update(Recu).where(Recu.recu_id.in_([2, 4, 5])).values(date_emission=None))
+    db.commit()
+
+    vus, curseur = [], None
+    while True:
+        lignes, curseur = paginer(db.query(Recu), Recu.date_emission, Recu.recu_id, curseur, limite=2)
+        vus.extend(r.recu_id for r in lignes)
+        if not curseur:
+            break
+
+    assert vus == [3, 1, 5, 4, 2]
+
+
+def test_skip_herite_sans_curseur(client, entetes, db, utilisateur):
+    # Les anciens clients paginent encore par ?skip= : la deuxième page doit
+    # bien être la deuxième, puis le curseur renvoyé prend le relais.
+    db.add_all([
+        Don(donateur=f"D{i}", type="mobile", montant=100 + i, date_don=datetime(2024, 1, 1 + i),
+            utilisateur_id=utilisateur.utilisateur_id)
+        for i in range(25)
+    ])
+    db.commit()
+
+    reponse = client.get("/api/dons/", params={"skip": 10, "limit": 10}, headers=entetes)
+    assert reponse.status_code == 200, reponse.text
+    assert [d["don_id"] for d in reponse.json()] == list(range(15, 5, -1))
+
+    suite = client.get("/api/dons/", params={"cursor": reponse.headers[EN_TETE_CURSEUR], "limit": 10}, headers=entetes)
+    assert [d["don_id"] for d in suite.json()] == list(range(5, 0, -1))
+    assert EN_TETE_CURSEUR not in suite.headers
+
+
+def test_factures_paginees_par_curseur(client, entetes, db, utilisateur):
+    db.add_all([
+        Facture(numero=f"F{i}", montant=10, date_facture=datetime(2024, 2, 1 + i // 3),
+                utilisateur_id=utilisateur.utilisateur_id)
+        for i in range(12)
+    ])
+    db.commit()
+
+    lignes, pages = _parcourir(client, "/api/factures/", entetes, limite=5)
+
+    assert pages == 3
+    assert sorted(f["facture_id"] for f in lignes) == list(range(1, 13))
@@ -0,0 +1,116 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app.crud.pret import sortir_prets_commences
+from app.crud.rapport import generer_rapport_materiel
+from app.crud.stock_materiel import get_stock_actuel_par_materiel
+from app.models import Materiel, Pret, StockMateriel
+from app.models.stock_materiel import TypeMouvementStockEnum
+
+AUJOURD_HUI = date.today()
+
+
+def _jour(decalage):
+    return (AUJOURD_HUI + timedelta(days=decalage)).isoformat()
+
+
+@pytest.fixture
+def chaises(db, utilisateur):
+    materiel = Materiel(nom="Chaises", date_acquisition=date(2020, 1, 1), utilisateur_id=utilisateur.utilisateur_id)
+    db.add(materiel)
+    db.flush()
+    db.add(StockMateriel(materiel_id=materiel.materiel_id, quantite=50,
+                         type_mouvement=TypeMouvementStockEnum.entree, description="Achat"))
+    db.commit()
+    return materiel
+
+
+def _preter(client, entetes, materiel_id, quantite, debut, fin):
+    return client.post("/api/pret/prets/", headers=entetes, json={
+        "beneficiaire": "Chorale", "numero_cni": "CNI-1", "email": "chorale@paroisse.cm", "telephone": "600000000",
+        "date_pret": debut, "date_retour_prevue": fin,
+        "lignes": [{"materiel_id": materiel_id, "quantite": quantite}],
+    })
+
+
+def test_pret_futur_reserve_sans_sortir_le_stock(client, entetes, db, chaises):
+    m_id = chaises.materiel_id
+    assert _preter(client, entetes, m_id, 40, _jour(10), _jour(12)).status_code == 200
+    # Période disjointe : les mêmes chaises sont de nouveau disponibles
+    assert _preter(client, entetes, m_id, 40, _jour(20), _jour(22)).status_code == 200
+    assert get_stock_actuel_par_materiel(db, m_id) == 50
+
+    # Chevauche les deux réservations : 10 chaises libres seulement
+    refus = _preter(client, entetes, m_id, 20, _jour(11), _jour(21))
+    assert refus.status_code == 400
+    assert "quantité disponible (10)" in refus.json()["detail"]
+
+    calendrier = client.get(
+        "/api/pret/prets/disponibilite", headers=entetes,
+        params={"materiel_id": m_id, "debut": _jour(9), "fin": _jour(13)}
+    ).json()
+    assert calendrier["stock"] == 50
+    assert [o["quantite"] for o in calendrier["occupations"]] == [40]
+    assert [(l["debut"], l["fin"], l["quantite"]) for l in calendrier["libres"]] == [
+        (_jour(9), _jour(9), 50), (_jour(10), _jour(12), 10), (_jour(13), _jour(13), 50),
+    ]
+
+    # Le stock sort au début du prêt
+    assert sortir_prets_commences(db, AUJOURD_HUI + timedelta(days=10)) == 1
+    assert get_stock_actuel_par_materiel(db, m_id) == 10
+    assert sortir_prets_commences(db, AUJOURD_HUI + timedelta(days=10)) == 0
+
+
+def test_pret_annule_avant_son_debut_ne_rentre_rien(client, entetes, db, chaises):
+    pret_id = _preter(client, entetes, chaises.materiel_id, 40, _jour(10), _jour(12)).json()["pret_id"]
+
+    reponse = client.put(f"/api/pret/prets/{pret_id}", headers=entetes,
+                         json={"date_retour_effective": AUJOURD_HUI.isoformat(), "etat_retour": "annulé"})
+
+    assert reponse.status_code == 200, reponse.text
+    assert get_stock_actuel_par_materiel(db, chaises.materiel_id) == 50
+
+
+def test_materiel_sans_stock_initial(client, entetes, db, utilisateur):
+    # Matériel antérieur aux quantités : aucune entrée de stock
+    materiel = Materiel(nom="Vidéoprojecteur", date_acquisition=date(2020, 1, 1),
+                        utilisateur_id=utilisateur.utilisateur_id)
+    db.add(materiel)
+    db.commit()
+
+    refus = _preter(client, entetes, materiel.materiel_id, 1, _jour(0), _jour(1))
+    assert refus.status_code == 400
+    assert "quantité disponible (0)" in refus.json()["detail"]
+
+    # Migration : un exemplaire par matériel sans parc
+    reponse = client.post("/api/stock/stock/initialiser", headers=entetes)
+    assert reponse.json()["entrees"] == [{"materiel_id": materiel.materiel_id, "quantite": 1}]
+    assert client.post("/api/stock/stock/initialiser", headers=entetes).json()["entrees"] == []
+
+    assert _preter(client, entetes, materiel.materiel_id, 1, _jour(0), _jour(1)).status_code == 200
+    assert get_stock_actuel_par_materiel(db, materiel.materiel_id) == 0
+
+
+def test_rapport_materiel_une_ligne_par_materiel_prete(client, entetes, db, chaises, utilisateur):
+    tables = Materiel(nom="Tables", date_acquisition=date(2020, 1, 1), utilisateur_id=utilisateur.utilisateur_id)
+    db.add(tables)
+    db.flush()
+    db.add(StockMateriel(materiel_id=tables.materiel_id, quantite=5,
+                         type_mouvement=TypeMouvementStockEnum.entree, description="Achat"))
+    # Prêt antérieur aux lignes : un exemplaire de materiel_id
+    db.add(Pret(beneficiaire="Jeunesse", numero_cni="CNI-2", email="j@paroisse.cm", telephone="1",
+                date_pret=AUJOURD_HUI, date_retour_prevue=AUJOURD_HUI, materiel_id=chaises.materiel_id))
+    db.commit()
+    reponse = client.post("/api/pret/prets/", headers=entetes, json={
+        "beneficiaire": "Chorale", "numero_cni": "CNI-1", "email": "chorale@paroisse.cm", "telephone": "600000000",
+        "date_pret": _jour(0), "date_retour_prevue": _jour(1),
+        "lignes": [{"materiel_id": chaises.materiel_id, "quantite": 30}, {"materiel_id": tables.materiel_id, "quantite": 2}],
+    })
+    assert reponse.status_code == 200, reponse.text
+
+    lignes = generer_rapport_materiel(db)["materiels"]["pret"]
+
+    assert sorted((l["materiel"], l["quantite"], l["beneficiaire"]) for l in lignes) == [
+        ("Chaises", 1, "Jeunesse"), ("Chaises", 30, "Chorale"), ("Tables", 2, "Chorale"),
+    ]
@@ -0,0 +1,86 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils import rapport_jobs
+
+
+@pytest.fixture
+def rendus(tmp_path, monkeypatch, fabrique_session):
+    # Pool remplacé par une exécution immédiate, sur la base de test
+    monkeypatch.setattr(rapport_jobs, "RAPPORTS_DIR", str(tmp_path))
+    monkeypatch.setattr(rapport_jobs, "SessionLocal", fabrique_session)
+    monkeypatch.setattr(rapport_jobs, "_executeur", SimpleNamespace(submit=lambda f, *args: f(*args)))
+
+    appels = []
+    rendre = rapport_jobs._rendre
+
+    def compter(type_rapport, format, params, db):
+        appels.append(type_rapport)
+        return rendre(type_rapport, format, params, db)
+
+    monkeypatch.setattr(rapport_jobs, "_rendre", compter)
+    return appels
+
+
+def _demander(client, entetes):
+    return client.post("/api/rapports/rapport/jobs", headers=entetes, json={"type": "materiel", "format": "xlsx"})
+
+
+def test_registre_des_taches_sur_disque(client, entetes, rendus, tmp_path):
+    reponse = _demander(client, entetes)
+    assert reponse.status_code == 202, reponse.text
+    job_id = reponse.json()["job_id"]
+
+    # Aucun état en mémoire : le fichier du registre suffit à tout processus
+    assert os.path.exists(tmp_path / "jobs" / f"{job_id}.json")
+    job = client.get(f"/api/rapports/rapport/jobs/{job_id}", headers=entetes).json()
+    assert job["statut"] == rapport_jobs.TERMINE
+    assert job["telechargement"].endswith(f"/jobs/{job_id}/telechargement")
+    assert client.get(job["telechargement"], headers=entetes).status_code == 200
+
+    # Demande identique dans la fenêtre de fraîcheur : même tâche, pas de rendu
+    assert _demander(client, entetes).json()["job_id"] == job_id
+    assert rendus == ["materiel"]
+
+
+def test_identifiant_de_tache_invalide(client, entetes, rendus):
+    assert client.get("/api/rapports/rapport/jobs/..%2F..%2Fetc", headers=entetes).status_code == 404
+    assert client.get(f"/api/rapports/rapport/jobs/{'0' * 32}", headers=entetes).status_code == 404
+
+
+def _vieillir(chemin, heures):
+    instant = os.path.getmtime(chemin) - heures * 3600
+    os.utime(chemin, (instant, instant))
+
+
+def test_purge_epargne_les_artefacts_reutilises(tmp_path, monkeypatch):
+    monkeypatch.setattr(rapport_jobs, "RAPPORTS_DIR", str(tmp_path))
+
+    _, chemin = rapport_jobs._enregistrer(b"rapport", "pdf")
+    _vieillir(chemin, 30)
+    # Une nouvelle tâche rend le même contenu : le fichier existant est réutilisé
+    assert rapport_jobs._enregistrer(b"rapport", "pdf")[1] == chemin
+
+    assert rapport_jobs.purger_rapports_generes() == 0
+    assert os.path.exists(chemin)
+
+
+def test_purge_suit_le_registre(tmp_path, monkeypatch):
+    monkeypatch.setattr(rapport_jobs, "RAPPORTS_DIR", str(tmp_path))
+    _, reference = rapport_jobs._enregistrer(b"reference", "pdf")
+    _, orphelin = rapport_jobs._enregistrer(b"orphelin", "pdf")
+    job_id = "a" * 32
+    rapport_jobs._ecrire_json(rapport_jobs._chemin_job(job_id), {"job_id": job_id, "chemin": reference})
+    ancien_id = "b" * 32
+    rapport_jobs._ecrire_json(rapport_jobs._chemin_job(ancien_id), {"job_id": ancien_id, "chemin": orphelin})
+    for chemin in (reference, orphelin, rapport_jobs._chemin_job(ancien_id)):
+        _vieillir(chemin, 30)
+
+    # Fichier ancien mais encore référencé par une tâche vivante : conservé
+    assert rapport_jobs.purger_rapports_generes() == 1
+    assert os.path.exists(reference)
+    assert not os.path.exists(orphelin)
+    assert rapport_jobs.get_job(ancien_id) is None
+    assert rapport_jobs.get_job(job_id)["chemin"] == reference
@@ -0,0 +1,92 @@
+import os
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import Don, RoleEnum, Utilisateur
+from app.utils import recherche
+
+MYSQL_URL = os.getenv("PAROISSE_TEST_MYSQL_URL")  # ex. mysql+pymysql://root:@localhost/paroisse_test
+
+
+@pytest.mark.skipif(not MYSQL_URL, reason="PAROISSE_TEST_MYSQL_URL non défini")
+def test_recherche_sans_index_fulltext_repasse_par_ilike():
+    moteur = create_engine(MYSQL_URL)
+    Base.metadata.drop_all(moteur)
+    Base.metadata.create_all(moteur)
+    # Base créée avant la déclaration de l'index
+    with moteur.begin() as connection:
+        connection.execute(text("DROP INDEX ft_don_texte ON don"))
+    recherche._tables_fulltext.clear()
+
+    db = sessionmaker(bind=moteur)()
+    try:
+        utilisateur = Utilisateur(nom="Admin", email="admin@paroisse.cm", mot_de_passe="x",
+                                  role=RoleEnum.Administrateur)
+        db.add(utilisateur)
+        db.flush()
+        db.add(Don(donateur="Famille Mbarga", montant=5000, type="mobile", date_don=datetime(2024, 1, 1),
+                   utilisateur_id=utilisateur.utilisateur_id))
+        db.commit()
+
+        query, score = recherche.requete_recherche(db, "don", "mbarga")
+        assert score is None
+        assert [d.donateur for d in query.all()] == ["Famille Mbarga"]
+
+        with moteur.begin() as connection:
+            recherche.assurer_index_fulltext(connection)
+        db.commit()
+
+        query, score = recherche.requete_recherche(db, "don", "mbarga")
+        assert score is not None
+        assert [d.donateur for d in query.all()] == ["Famille Mbarga"]
+    finally:
+        db.close()
+        Base.metadata.drop_all(moteur)
+        moteur.dispose()
+        recherche._tables_fulltext.clear()
+
+
+def test_index_fts_tenu_par_rowid(db, utilisateur, compteur):
+    don = Don(donateur="Famille Mbarga", montant=5000, type="mobile", date_don=datetime(2024, 1, 1),
+              utilisateur_id=utilisateur.utilisateur_id)
+    db.add(don)
+    db.commit()
+
+    compteur.remettre_a_zero()
+    don.donateur = "Famille Atangana"
+    db.commit()
+
+    # Réindexation par la clé de la table FTS5, sans balayage
+    ecritures = [r for r in compteur.requetes if "recherche_fts" in r]
+    assert len(ecritures) == 1 and ecritures[0].startswith("INSERT OR REPLACE INTO recherche_fts (rowid,")
+    plan = db.execute(text("EXPLAIN QUERY PLAN " + str(recherche._SUPPRESSION_FTS)), {"rowid": 1}).all()
+    assert plan[0][-1].endswith("INDEX 0:=")
+
+    trouves = lambda q: [d.donateur for d in recherche.requete_recherche(db, "don", q)[0].all()]
+    assert trouves("atangana") == ["Famille Atangana"]
+    assert trouves("mbarga") == []
+
+    db.delete(don)
+    db.commit()
+    assert db.execute(text("SELECT count(*) FROM recherche_fts")).scalar() == 0
+
+
+def test_index_fts_ancien_format_reconstruit(engine, db, utilisateur):
+    db.add(Don(donateur="Famille Mbarga", montant=5000, type="mobile", date_don=datetime(2024, 1, 1),
+               utilisateur_id=utilisateur.utilisateur_id))
+    db.commit()
+    # Table créée avec des rowids séquentiels, avant les rowids dérivés
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM recherche_fts"))
+        connection.execute(text("INSERT INTO recherche_fts (entite, entite_id, texte) VALUES ('don', 1, 'Famille Mbarga')"))
+    recherche._moteurs_fts_prets.clear()
+
+    with engine.begin() as connection:
+        recherche.assurer_index_fts(connection)
+        lignes = connection.execute(text("SELECT rowid, entite, entite_id FROM recherche_fts")).all()
+
+    assert lignes == [(recherche._rowid_fts("don", 1), "don", 1)]
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert
+
+from app.models import Don, Recu, RegistreBudget, SequenceRecu
+from app.utils.amorcage import inserer_ou_relire
+from app.utils.budget import update_budget_reel
+from app.utils.recu import allouer_numeros
+
+
+@pytest.mark.parametrize("url, corps", [
+    ("/api/dons/", {"donateur": "Famille Ngono", "montant": 5000, "type": "mobile", "date_don": "2024-12-28T10:00:00"}),
+    ("/api/offrandes/", {"date": "2024-12-28", "montant": 3000, "type": "culte"}),
+])
+def test_recu_numerote_a_l_annee_de_l_ecriture(client, entetes, db, utilisateur, url, corps):
+    # Écriture de décembre saisie plus tard : même règle que l'import
+    reponse = client.post(url, headers=entetes, json={**corps, "utilisateur_id": utilisateur.utilisateur_id})
+    assert reponse.status_code == 200, reponse.text
+
+    recu = db.query(Recu).one()
+    assert recu.numero == "R-2024-000001"
+    assert recu.date_emission == datetime(2024, 12, 28, 10 if "date_don" in corps else 0)
+
+
+def test_amorcage_concurrent_relit_la_ligne_existante(db, utilisateur):
+    db.add(Don(donateur="X", montant=10, type="mobile", date_don=datetime(2024, 1, 1),
+               utilisateur_id=utilisateur.utilisateur_id))
+    db.flush()
+    # Ligne créée par une autre transaction après notre lecture
+    db.execute(insert(SequenceRecu).values(annee=2024, dernier_numero=7))
+
+    sequence, creee = inserer_ou_relire(
+        db, SequenceRecu, {"annee": 2024, "dernier_numero": 0},
+        lambda: db.query(SequenceRecu).filter(SequenceRecu.annee == 2024).one()
+    )
+
+    assert (sequence.dernier_numero, creee) == (7, False)
+    assert list(allouer_numeros(db, 2024)) == [8]
+    # Le conflit n'annule que le savepoint : la transaction et son suivi continuent
+    assert "don" in db.info["totaux_modifies"]
+    db.commit()
+    assert db.query(Don).count() == 1
+
+
+def test_registre_cree_concurremment_recoit_le_delta(db, utilisateur, monkeypatch):
+    db.execute(insert(RegistreBudget).values(annee=2024, intitule="don", montant=100, version=3))
+    lectures = []
+    requete = db.query
+
+    def query(*entites):
+        # Première lecture : le registre n'existe pas encore pour cette transaction
+        if entites[0] is RegistreBudget and not lectures:
+            lectures.append(entites)
+            return requete(RegistreBudget).filter(RegistreBudget.registre_id == -1)
+        return requete(*entites)
+
+    monkeypatch.setattr(db, "query", query)
+    update_budget_reel(db, 2024, "Don", utilisateur.utilisateur_id, delta=25)
+
+    registre = requete(RegistreBudget).one()
+    assert (registre.montant, registre.version) == (125, 4)
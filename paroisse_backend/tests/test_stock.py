@@ -0,0 +1,213 @@
+from datetime import date
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from app.crud import stock_materiel as crud_stock
+from app.models import Materiel, Notification, RoleEnum, StockMateriel, Utilisateur
+from app.models.stock_courant import StockCourant
+from app.models.stock_materiel import TypeMouvementStockEnum
+from app.schemas.stock_materiel import StockMaterielCreate
+from app.utils.stock_alerts import FileAlertesStock, materiels_sous_seuil, titre_alerte_stock, verifier_alertes_stock
+
+
+@pytest.fixture(autouse=True)
+def signaux(monkeypatch):
+    # Les alertes sont évaluées en arrière-plan : on relève seulement les signaux
+    recus = []
+    monkeypatch.setattr(crud_stock, "signaler_stock_modifie", recus.append)
+    return recus
+
+
+@pytest.fixture
+def bancs(db, utilisateur):
+    materiel = Materiel(nom="Bancs", date_acquisition=date(2020, 1, 1), utilisateur_id=utilisateur.utilisateur_id)
+    db.add(materiel)
+    db.commit()
+    crud_stock.create_mouvement_stock(db, StockMaterielCreate(
+        materiel_id=materiel.materiel_id, quantite=5, type_mouvement=TypeMouvementStockEnum.entree, description="Achat"
+    ))
+    return materiel
+
+
+def _sortie(materiel_id, quantite):
+    return StockMaterielCreate(materiel_id=materiel_id, quantite=quantite,
+                               type_mouvement=TypeMouvementStockEnum.sortie, description="Fête paroissiale")
+
+
+def test_sortie_controlee_sur_le_stock_verrouille(db, bancs, signaux):
+    m_id = bancs.materiel_id
+    crud_stock.create_mouvement_stock(db, _sortie(m_id, 3))
+
+    with pytest.raises(HTTPException) as refus:
+        crud_stock.create_mouvement_stock(db, _sortie(m_id, 3))
+
+    assert refus.value.status_code == 400
+    assert "quantité en stock (2)" in refus.value.detail
+    # Rien n'a été écrit par la sortie refusée
+    assert db.query(StockMateriel).count() == 2
+    assert db.get(StockCourant, m_id).quantite == 2
+    assert signaux == [m_id, m_id]
+
+
+def test_sortie_refusee_par_l_api(client, entetes, db, bancs):
+    reponse = client.post("/api/stock/stock/", headers=entetes, json={
+        "materiel_id": bancs.materiel_id, "quantite": 6, "type_mouvement": "sortie", "description": None
+    })
+
+    assert reponse.status_code == 400
+    assert "quantité en stock (5)" in reponse.json()["detail"]
+    assert crud_stock.get_stock_actuel_par_materiel(db, bancs.materiel_id) == 5
+
+
+def _parc(db, utilisateur, quantites, courant):
+    """Un matériel par quantité (seuil 10) ; `courant` : stock tenu dans StockCourant ou seulement l'historique."""
+    materiels = [
+        Materiel(nom=f"Matériel {i}", date_acquisition=date(2020, 1, 1), seuil_min=10,
+                 utilisateur_id=utilisateur.utilisateur_id)
+        for i in range(len(quantites))
+    ]
+    db.add_all(materiels)
+    db.flush()
+    for materiel, quantite, suivi in zip(materiels, quantites, courant):
+        db.add(StockMateriel(materiel_id=materiel.materiel_id, quantite=quantite,
+                             type_mouvement=TypeMouvementStockEnum.entree, description="Inventaire"))
+        if suivi:
+            db.add(StockCourant(materiel_id=materiel.materiel_id, quantite=quantite))
+    db.commit()
+    return materiels
+
+
+@pytest.mark.parametrize("taille", [4, 12])
+def test_balayage_alertes_en_requetes_constantes(db, utilisateur, compteur, taille):
+    db.add(Utilisateur(nom="Fidèle", email="fidele@paroisse.cm", mot_de_passe="x", role=RoleEnum.Fidele))
+    # Un matériel sur deux sous le seuil, stocks courants et historiques mêlés
+    quantites = [3 if i % 2 == 0 else 30 for i in range(taille)]
+    materiels = _parc(db, utilisateur, quantites, [i % 4 < 2 for i in range(taille)])
+    sous_seuil = {m.materiel_id for m, q in zip(materiels, quantites) if q <= 10}
+
+    assert {m_id for m_id, _, _ in materiels_sous_seuil(db)} == sous_seuil
+
+    compteur.remettre_a_zero()
+    creees = verifier_alertes_stock(db)
+    # Sous-seuil, utilisateurs, alertes déjà ouvertes, insertion en lot
+    assert compteur.nb_requetes == 4
+    assert compteur.commits == 1
+
+    alertes = db.query(Notification.titre, Notification.utilisateur_id).all()
+    assert len(creees) == len(alertes) == len(sous_seuil)
+    assert {titre for titre, _ in alertes} == {titre_alerte_stock(m.nom) for m in materiels if m.materiel_id in sous_seuil}
+    assert {u_id for _, u_id in alertes} == {utilisateur.utilisateur_id}
+
+    # Second passage : alertes non lues déjà présentes, aucun doublon
+    compteur.remettre_a_zero()
+    assert verifier_alertes_stock(db) == []
+    assert compteur.commits == 0
+    assert db.query(Notification).count() == len(sous_seuil)
+
+
+def test_file_alertes_regroupe_les_signaux(db, utilisateur, fabrique_session, monkeypatch):
+    (materiel,) = _parc(db, utilisateur, [2], [True])
+    sessions, evaluations = [], []
+
+    def fabrique():
+        sessions.append(fabrique_session())
+        return sessions[-1]
+
+    verifier = verifier_alertes_stock
+
+    def evaluer(session, materiel_ids=None):
+        evaluations.append(sorted(materiel_ids))
+        return verifier(session, materiel_ids=materiel_ids)
+
+    monkeypatch.setattr("app.utils.stock_alerts.verifier_alertes_stock", evaluer)
+    # Fenêtre longue : le thread de fond n'évalue rien pendant le test
+    file = FileAlertesStock(fenetre=3600, session_factory=fabrique)
+
+    for _ in range(5):
+        file.signaler(materiel.materiel_id)
+    file.vider()
+
+    assert evaluations == [[materiel.materiel_id]]
+    assert len(sessions) == 1
+    assert db.query(Notification).count() == 1
+    metriques = file.metriques()
+    assert (metriques["signaux"], metriques["signaux_regroupes"], metriques["evaluations"]) == (5, 4, 1)
+    assert metriques["profondeur"] == 0
+
+    # File vide : aucune session ouverte
+    file.vider()
+    assert len(sessions) == 1
+
+
+@pytest.fixture
+def chaises(db, utilisateur):
+    materiel = Materiel(nom="Chaises", date_acquisition=date(2020, 1, 1), utilisateur_id=utilisateur.utilisateur_id)
+    db.add(materiel)
+    db.commit()
+    crud_stock.create_mouvement_stock(db, StockMaterielCreate(
+        materiel_id=materiel.materiel_id, quantite=20, type_mouvement=TypeMouvementStockEnum.entree, description="Achat"
+    ))
+    return materiel
+
+
+def _ligne(materiel, quantite, type_mouvement):
+    return {"materiel_id": materiel.materiel_id, "quantite": quantite, "type_mouvement": type_mouvement, "description": None}
+
+
+def test_lot_refuse_en_entier_si_une_ligne_est_invalide(client, entetes, db, bancs, chaises, signaux):
+    signaux.clear()
+    reponse = client.post("/api/stock/stock/batch", headers=entetes, json=[
+        _ligne(bancs, 2, "entrée"),
+        _ligne(chaises, 1, "sortie"),
+        # 5 + 2 bancs en stock à ce point du lot
+        _ligne(bancs, 10, "sortie"),
+        _ligne(chaises, 0, "entrée"),
+    ])
+
+    assert reponse.status_code == 400
+    detail = reponse.json()["detail"]
+    assert detail["enregistre"] is False
+    assert [l["statut"] for l in detail["lignes"]] == ["annule", "annule", "erreur", "erreur"]
+    assert detail["lignes"][2]["erreur"] == "La quantité sortie (10) ne peut pas dépasser la quantité en stock (7)."
+    assert detail["lignes"][3]["erreur"] == "La quantité doit être positive."
+
+    db.expire_all()
+    assert db.query(StockMateriel).count() == 2
+    assert {s.materiel_id: s.quantite for s in db.query(StockCourant)} == {bancs.materiel_id: 5, chaises.materiel_id: 20}
+    assert signaux == []
+
+
+def test_lot_valide_une_ecriture_par_materiel(engine, db, bancs, chaises, signaux, compteur):
+    signaux.clear()
+    # Lignes écrites par instruction : l'ORM regroupe les UPDATE en executemany
+    ecritures = []
+
+    def relever(conn, cursor, statement, parameters, context, executemany):
+        ecritures.append((statement.split(" SET")[0].split(" (")[0], len(parameters) if executemany else 1))
+
+    event.listen(engine, "before_cursor_execute", relever)
+    lot = [
+        StockMaterielCreate(**_ligne(materiel, quantite, type_mouvement))
+        for materiel, quantite, type_mouvement in [
+            (bancs, 3, "entrée"), (chaises, 4, "sortie"), (bancs, 8, "sortie"),
+            (chaises, 10, "entrée"), (bancs, 1, "entrée"), (chaises, 2, "sortie"),
+        ]
+    ]
+
+    compteur.remettre_a_zero()
+    lignes, succes = crud_stock.create_mouvements_stock_batch(db, lot)
+
+    assert succes
+    assert [l["stock_apres"] for l in lignes] == [8, 16, 0, 26, 1, 24]
+    event.remove(engine, "before_cursor_execute", relever)
+
+    # Un INSERT de 6 lignes, une ligne de stock courant mise à jour par matériel
+    assert [e for e in ecritures if e[0] == 'INSERT INTO "StockMateriel"'] == [('INSERT INTO "StockMateriel"', 6)]
+    assert sum(n for instruction, n in ecritures if instruction == 'UPDATE "StockCourant"') == 2
+    assert compteur.commits == 1
+
+    assert db.query(StockMateriel).count() == 8
+    assert {s.materiel_id: s.quantite for s in db.query(StockCourant)} == {bancs.materiel_id: 1, chaises.materiel_id: 24}
+    assert sorted(signaux) == sorted([bancs.materiel_id, chaises.materiel_id])
@@ -0,0 +1,79 @@
+from datetime import date, datetime
+
+import pytest
+
+from app.models import Achat, Don, Employe, Facture, Offrande, Quete, Recu, Salaire
+from app.utils.totaux import EN_TETE_TOTAL, _cache_totaux, total_montant
+
+
+@pytest.fixture
+def ecritures(db, utilisateur):
+    uid = utilisateur.utilisateur_id
+    employes = [Employe(nom=f"Employé {i}", salaire=1) for i in range(3)]
+    facture = Facture(numero="F-1", montant=50, utilisateur_id=uid)
+    db.add_all([*employes, facture])
+    db.flush()
+    for i in range(6):
+        quand = datetime(2024, 1, 1 + i)
+        db.add_all([
+            Don(donateur=f"D{i}", montant=10, type="mobile", date_don=quand, utilisateur_id=uid),
+            Offrande(montant=10, type="culte", date=quand.date(), utilisateur_id=uid),
+            Quete(libelle=f"Q{i}", montant=10, date_quete=quand, utilisateur_id=uid),
+            Achat(libelle=f"A{i}", montant=10, date_achat=quand.date(), facture_id=facture.facture_id, utilisateur_id=uid),
+            Salaire(montant=10, date_paiement=date(2024, 1, 1 + i), employe_id=employes[i % 3].employe_id, utilisateur_id=uid),
+            Recu(montant=10, date_emission=quand, utilisateur_id=uid),
+        ])
+    db.commit()
+
+
+@pytest.mark.parametrize("url, avec_total", [
+    ("/api/dons/", True),
+    ("/api/offrandes/", True),
+    ("/api/quetes/", True),
+    ("/api/factures/", True),
+    ("/api/achats/", True),
+    ("/api/salaires/", True),
+    ("/api/recus/", False),
+])
+def test_liste_en_une_seule_requete(client, entetes, ecritures, compteur, url, avec_total):
+    # Premier appel : utilisateur courant et total mis en cache
+    assert client.get(url, headers=entetes).status_code == 200
+    compteur.remettre_a_zero()
+
+    reponse = client.get(url, headers=entetes)
+
+    assert reponse.status_code == 200
+    assert (EN_TETE_TOTAL in reponse.headers) == avec_total
+    assert compteur.nb_requetes == 1, compteur.requetes
+
+
+def test_total_invalide_apres_commit(client, entetes, ecritures, utilisateur):
+    assert client.get("/api/quetes/", headers=entetes).headers[EN_TETE_TOTAL] == "60.0"
+
+    reponse = client.post("/api/quetes/", headers=entetes, json={
+        "libelle": "Culte", "montant": 40, "date_quete": "2024-02-04", "utilisateur_id": utilisateur.utilisateur_id,
+    })
+    assert reponse.status_code == 200, reponse.text
+
+    assert client.get("/api/quetes/", headers=entetes).headers[EN_TETE_TOTAL] == "100.0"
+
+
+def test_total_calcule_avant_un_commit_concurrent_non_mis_en_cache(fabrique_session, ecritures, utilisateur):
+    lecteur = fabrique_session()
+    lecteur.connection()  # transaction (et instantané MySQL) ouverte avant l'écriture
+
+    ecrivain = fabrique_session()
+    ecrivain.add(Don(donateur="X", montant=5, type="mobile", date_don=datetime(2024, 5, 1),
+                     utilisateur_id=utilisateur.utilisateur_id))
+    ecrivain.commit()  # invalidation des totaux "don"
+    ecrivain.close()
+
+    total_montant(lecteur, "don")
+    # Ce total a pu être lu sur un instantané antérieur au commit : pas de mise en cache
+    assert _cache_totaux.get(("don", None, None, False)) is None
+    lecteur.close()
+
+    lecteur = fabrique_session()
+    assert total_montant(lecteur, "don") == 65
+    assert _cache_totaux.get(("don", None, None, False)) == 65
+    lecteur.close()
@@ -0,0 +1,71 @@
+from datetime import date, datetime
+
+from app.models import Achat, Budget, Don, Employe, Facture, Offrande, Quete, Salaire
+from app.models.registre_budget import RegistreBudget
+from app.utils.budget import (
+    calculer_tresorerie, reconcilier_registre_budget, update_budget_reel, verifier_solde_disponible
+)
+
+
+def _ecritures(db, utilisateur_id):
+    employe = Employe(nom="Ngono", salaire=1)
+    facture = Facture(numero="F-1", montant=400, utilisateur_id=utilisateur_id)
+    db.add_all([employe, facture])
+    db.flush()
+    db.add_all([
+        Don(donateur="A", montant=1000, type="mobile", date_don=datetime(2024, 3, 1), utilisateur_id=utilisateur_id),
+        Don(donateur="B", montant=500, type="mobile", date_don=datetime(2024, 4, 1), utilisateur_id=utilisateur_id,
+            deleted_at=datetime(2024, 5, 1)),
+        Don(donateur="C", montant=9999, type="mobile", date_don=datetime(2023, 12, 31), utilisateur_id=utilisateur_id),
+        Offrande(montant=300, type="culte", date=date(2024, 6, 1), utilisateur_id=utilisateur_id),
+        Quete(libelle="Q", montant=200, date_quete=datetime(2024, 1, 7), utilisateur_id=utilisateur_id),
+        Achat(libelle="Chaises", montant=400, date_achat=date(2024, 2, 1), facture_id=facture.facture_id,
+              utilisateur_id=utilisateur_id),
+        Salaire(montant=100, date_paiement=date(2024, 2, 28), employe_id=employe.employe_id, utilisateur_id=utilisateur_id),
+    ])
+    db.commit()
+
+
+def test_tresorerie_en_un_seul_aller_retour(db, utilisateur, compteur):
+    _ecritures(db, utilisateur.utilisateur_id)
+    compteur.remettre_a_zero()
+
+    tresorerie = calculer_tresorerie(db, 2024)
+
+    assert compteur.nb_requetes == 1
+    assert tresorerie["recettes"] == 1500
+    assert tresorerie["depenses"] == 500
+    assert tresorerie["solde"] == 1000
+
+
+def test_verifier_solde_disponible(db, utilisateur, compteur):
+    _ecritures(db, utilisateur.utilisateur_id)
+    compteur.remettre_a_zero()
+
+    assert verifier_solde_disponible(db, 2024, 1000)
+    assert not verifier_solde_disponible(db, 2024, 1001)
+    assert compteur.nb_requetes == 2
+
+
+def test_reconcilier_registre_budget(db, utilisateur):
+    _ecritures(db, utilisateur.utilisateur_id)
+    # Registre aligné sur les tables sources, budget « Don » 2024 créé
+    reconcilier_registre_budget(db)
+    update_budget_reel(db, 2024, "Don", utilisateur.utilisateur_id, delta=0)
+    db.commit()
+
+    registre = db.query(RegistreBudget).filter_by(annee=2024, intitule="don").one()
+    budget = db.query(Budget).filter_by(annee=2024, intitule="Don").one()
+    assert registre.montant == budget.montantTotal == 1000
+    registre.montant = budget.montantTotal = 1234
+    db.commit()
+
+    attendu = [{"annee": 2024, "intitule": "Don", "registre": 1234.0, "reel": 1000.0, "ecart": -234.0}]
+    assert reconcilier_registre_budget(db, corriger=False) == attendu
+    db.expire_all()
+    assert registre.montant == budget.montantTotal == 1234
+
+    assert reconcilier_registre_budget(db, annee=2024, corriger=True) == attendu
+    db.expire_all()
+    assert registre.montant == budget.montantTotal == 1000
+    assert reconcilier_registre_budget(db, corriger=False) == []